@@ -0,0 +1,96 @@
+"""
+Import-time guard for the memory modules, based on `python -X importtime`.
+
+Imports each module in a fresh interpreter several times and reports the median
+cumulative import time and the heaviest dependencies it pulled in. Fails (exit
+status 1) if a module exceeds the time budget or eagerly imports a package that
+must only be loaded on first use (Chroma, LangChain, langsmith, the Gemini client).
+Example:
+
+    python benchmarks/bench_import_time.py --runs 5 --budget-ms 400 --json import_time.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SRC_DIRECTORY = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+DEFAULT_MODULES = ["memory_tool", "embedders", "migrate_partitions"]
+# Packages that are only needed once a vector store, tool or LLM is actually used.
+LAZY_PACKAGES = ["chromadb", "langchain", "langchain_community", "langchain_google_genai", "langsmith",
+                 "google.generativeai", "google.ai"]
+
+
+def import_profile(module: str) -> list:
+    """Imports module in a fresh interpreter and returns (cumulative_us, self_us, name) for each import it caused."""
+    env = dict(os.environ, PYTHONPATH=SRC_DIRECTORY + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=SRC_DIRECTORY,
+                            env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # The header line.
+        entries.append((int(cumulative_us), int(self_us), name.strip()))
+    # Everything up to and including "site" is interpreter start-up, not the module's own imports.
+    site = next((i for i, (_, _, name) in enumerate(entries) if name == "site"), -1)
+    return entries[site + 1:]
+
+
+def eager_lazy_packages(entries: list, packages: list) -> list:
+    names = {name for _, _, name in entries}
+    return sorted(package for package in packages
+                  if any(name == package or name.startswith(package + ".") for name in names))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=400.0,
+                        help="Maximum median cumulative import time per module.")
+    parser.add_argument("--top", type=int, default=10, help="Number of heaviest imports to show per module.")
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    results, failures = [], []
+    for module in args.modules:
+        runs = [import_profile(module) for _ in range(args.runs)]
+        totals = [next(cumulative for cumulative, _, name in entries if name == module) for entries in runs]
+        median_ms = statistics.median(totals) / 1000
+        eager = eager_lazy_packages(runs[-1], LAZY_PACKAGES)
+        heaviest = sorted((entry for entry in runs[-1] if entry[2] != module), reverse=True)[:args.top]
+        results.append({
+            "module": module,
+            "median_ms": round(median_ms, 1),
+            "min_ms": round(min(totals) / 1000, 1),
+            "eager_lazy_packages": eager,
+            "heaviest": [{"name": name, "cumulative_ms": round(cumulative / 1000, 1)} for cumulative, _, name in heaviest],
+        })
+        print(f"{module}: median {median_ms:.1f} ms over {args.runs} runs (min {min(totals) / 1000:.1f} ms)")
+        for cumulative, _, name in heaviest:
+            print(f"    {cumulative / 1000:8.1f} ms  {name}")
+        if median_ms > args.budget_ms:
+            failures.append(f"{module} takes {median_ms:.1f} ms to import (budget {args.budget_ms:.0f} ms)")
+        if eager:
+            failures.append(f"{module} eagerly imports {', '.join(eager)}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+    print(f"All modules within {args.budget_ms:.0f} ms and free of eager heavy imports.")
+
+
+if __name__ == "__main__":
+    main()
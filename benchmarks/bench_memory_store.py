@@ -0,0 +1,215 @@
+"""
+Throughput and latency of the MemoryStore hot paths, fully offline.
+
+Drives save_memory, retrieve_memories, get_all_memories and clear_user_memories
+against a throwaway Chroma directory using the deterministic local hashing
+embedder, for every combination of corpus size and user count. Each operation
+reports throughput and p50/p95/p99 latency; results can be written to JSON and
+compared against an earlier run. Examples:
+
+    python benchmarks/bench_memory_store.py --json before.json
+    python benchmarks/bench_memory_store.py --json after.json --compare before.json --threshold 0.15
+    python benchmarks/bench_memory_store.py --full   # 1k/10k/100k memories x 1/100/10k users
+
+The comparison exits with status 1 if any operation's p95 latency grew, or its
+throughput fell, by more than the threshold.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_DIRECTORY)
+
+DEFAULT_MEMORIES = [1_000, 10_000]
+DEFAULT_USERS = [1, 100]
+FULL_MEMORIES = [1_000, 10_000, 100_000]
+FULL_USERS = [1, 100, 10_000]
+LOAD_BATCH_SIZE = 2_000
+_WORDS = [f"{prefix}{suffix}" for prefix in ("alpha", "bravo", "coffee", "dog", "echo", "film", "garden", "hiking",
+                                               "india", "jazz", "kayak", "lemon", "music", "novel", "opera", "piano")
+          for suffix in ("", "s", "er", "ing", "ed", "ly", "ist", "ism")]
+
+
+def sentence(rng: random.Random) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(rng.randint(5, 14)))
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def summarise(scenario: str, operation: str, latencies: list, elapsed: float) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "scenario": scenario,
+        "operation": operation,
+        "ops": len(ordered),
+        "throughput_ops_s": round(len(ordered) / elapsed, 2) if elapsed > 0 else None,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+    }
+
+
+def timed(calls: list) -> tuple:
+    """Runs each zero-argument call once and returns (latencies, total elapsed seconds)."""
+    latencies = []
+    start = time.perf_counter()
+    for call in calls:
+        began = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - began)
+    return latencies, time.perf_counter() - start
+
+
+def run_scenario(memories: int, users: int, args: argparse.Namespace) -> list:
+    import memory_tool
+    from memory_tool import MemoryStore, clear_user_memories
+
+    rng = random.Random(args.seed)
+    collection_name = f"bench_{memories}_{users}"
+    scenario = f"{memories}x{users}"
+    user_ids = [f"bench-user-{i}" for i in range(users)]
+    stores = {}
+
+    def store(user_id: str) -> MemoryStore:
+        if user_id not in stores:
+            stores[user_id] = MemoryStore(user_id, collection_name=collection_name, use_query_cache=False,
+                                          use_hot_tier=args.hot_tier)
+        return stores[user_id]
+
+    results = []
+    # Bulk load, spreading memories evenly over users, in batches the embedder handles well.
+    per_user = {user_id: memories // users + (1 if i < memories % users else 0) for i, user_id in enumerate(user_ids)}
+    batches = []
+    for user_id, count in per_user.items():
+        for start in range(0, count, LOAD_BATCH_SIZE):
+            size = min(LOAD_BATCH_SIZE, count - start)
+            batches.append((user_id, [(sentence(rng), "benchmark") for _ in range(size)]))
+    latencies, elapsed = timed([lambda u=user_id, b=batch: store(u).save_memories(b) for user_id, batch in batches])
+    load = summarise(scenario, "save_memories (bulk load)", latencies, elapsed)
+    load["throughput_ops_s"] = round(memories / elapsed, 2)  # memories per second rather than batches
+    results.append(load)
+
+    def sampled() -> str:
+        return rng.choice(user_ids)
+
+    calls = [lambda u=sampled(), c=sentence(rng): store(u).save_memory(c, "benchmark") for _ in range(args.ops)]
+    results.append(summarise(scenario, "save_memory", *timed(calls)))
+
+    calls = [lambda u=sampled(), q=sentence(rng): store(u).retrieve_memories(q, k=args.k) for _ in range(args.ops)]
+    results.append(summarise(scenario, "retrieve_memories", *timed(calls)))
+
+    calls = [lambda u=sampled(): store(u).get_all_memories() for _ in range(args.scan_ops)]
+    results.append(summarise(scenario, "get_all_memories", *timed(calls)))
+
+    cleared = rng.sample(user_ids, min(args.clear_ops, users))
+    calls = [lambda u=user_id: clear_user_memories(u, collection_name) for user_id in cleared]
+    results.append(summarise(scenario, "clear_user_memories", *timed(calls)))
+
+    for memory_store in stores.values():
+        memory_store.close()
+    # Drop the collection so large scenarios do not accumulate on disk, with any access times
+    # still waiting to be written to it.
+    memory_tool.access_log.discard(collection_name)
+    memory_tool.get_vector_store(collection_name).delete_collection()
+    memory_tool.vector_store_registry.discard(memory_tool.vector_store_key(collection_name))
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results: list, baseline_path: str, threshold: float) -> list:
+    """Returns a description of every operation that regressed beyond threshold versus the baseline."""
+    with open(baseline_path) as f:
+        baseline = {(row["scenario"], row["operation"]): row for row in json.load(f)["results"]}
+    regressions = []
+    for row in results:
+        before = baseline.get((row["scenario"], row["operation"]))
+        if before is None:
+            continue
+        name = f"{row['scenario']} {row['operation']}"
+        if before["p95_ms"] and row["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {before['p95_ms']} ms -> {row['p95_ms']} ms")
+        if before["throughput_ops_s"] and row["throughput_ops_s"] < before["throughput_ops_s"] * (1 - threshold):
+            regressions.append(f"{name}: throughput {before['throughput_ops_s']} -> {row['throughput_ops_s']} ops/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--memories", type=int, nargs="+", default=DEFAULT_MEMORIES)
+    parser.add_argument("--users", type=int, nargs="+", default=DEFAULT_USERS)
+    parser.add_argument("--full", action="store_true", help="Run the full 1k/10k/100k x 1/100/10k matrix.")
+    parser.add_argument("--ops", type=int, default=200, help="Timed save_memory and retrieve_memories calls.")
+    parser.add_argument("--scan-ops", type=int, default=20, help="Timed get_all_memories calls.")
+    parser.add_argument("--clear-ops", type=int, default=20, help="Users cleared with clear_user_memories.")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--hot-tier", action="store_true", help="Serve searches from the in-process hot tier.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="A previous --json file to check for regressions against.")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Allowed relative p95 increase or throughput drop before failing (default 0.10).")
+    args = parser.parse_args()
+    if args.full:
+        args.memories, args.users = FULL_MEMORIES, FULL_USERS
+    json_path = os.path.abspath(args.json) if args.json else None
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+
+    # The local backend is deterministic and offline; the persist directory is relative, so run in a scratch dir.
+    os.environ["MEMORY_EMBEDDING_BACKEND"] = "local"
+    os.environ.pop("MEMORY_EMBEDDING_MODEL", None)
+    workdir = tempfile.mkdtemp(prefix="memory-bench-")
+    os.chdir(workdir)
+    results = []
+    try:
+        for memories in args.memories:
+            for users in args.users:
+                if users > memories:
+                    continue
+                print(f"Running {memories} memories x {users} users...", file=sys.stderr)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    results.extend(run_scenario(memories, users, args))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'scenario':<14} {'operation':<26} {'ops':>5} {'ops/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for row in results:
+        print(f"{row['scenario']:<14} {row['operation']:<26} {row['ops']:>5} {row['throughput_ops_s']:>10} "
+              f"{row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9}")
+    if args.json:
+        config = {key: value for key, value in vars(args).items() if key not in ("json", "compare")}
+        metadata = {"commit": git_commit(), "python": platform.python_version(), "platform": platform.platform(),
+                    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z")}
+        with open(json_path, "w") as f:
+            json.dump({"metadata": metadata, "config": config, "results": results}, f, indent=2)
+    if args.compare:
+        regressions = compare(results, compare_path, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.compare}.")
+
+
+if __name__ == "__main__":
+    main()
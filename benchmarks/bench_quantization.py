@@ -0,0 +1,105 @@
+"""
+Recall and memory cost of quantized hot-tier storage versus float32.
+
+Runs fully offline on synthetic embeddings: either clustered Gaussian vectors
+(dense, like text-embedding-004) or the local hashing embedder over synthetic
+sentences. Example:
+
+    python benchmarks/bench_quantization.py --vectors 5000 --queries 200 --k 3
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from hot_tier import DTYPES, UserVectors, rescore  # noqa: E402
+
+RESCORE_FACTOR = 4
+
+
+def clustered_vectors(count: int, dimensions: int, rng: np.random.Generator) -> np.ndarray:
+    centers = rng.standard_normal((max(count // 20, 1), dimensions)).astype(np.float32)
+    assignments = rng.integers(0, len(centers), size=count)
+    return centers[assignments] + 0.35 * rng.standard_normal((count, dimensions)).astype(np.float32)
+
+
+def hashed_vectors(count: int, dimensions: int, rng: np.random.Generator) -> np.ndarray:
+    from local_embedder import HashingEmbeddings
+
+    words = [f"word{i}" for i in range(2000)]
+    sentences = [" ".join(rng.choice(words, size=rng.integers(4, 16))) for _ in range(count)]
+    return HashingEmbeddings(dimensions=dimensions).embed_array(sentences)
+
+
+def recall_at_k(expected: list, actual: list) -> float:
+    return len(set(expected) & set(actual)) / len(expected)
+
+
+def run(vectors: int, queries: int, dimensions: int, k: int, source: str, seed: int) -> list:
+    rng = np.random.default_rng(seed)
+    make = clustered_vectors if source == "random" else hashed_vectors
+    data = make(vectors + queries, dimensions, rng)
+    corpus, query_vectors = data[:vectors], data[vectors:]
+    ids = [str(i) for i in range(vectors)]
+    payloads = [{}] * vectors
+
+    stores = {}
+    for dtype in DTYPES:
+        store = UserVectors(dimensions=dimensions, capacity=vectors, dtype=dtype)
+        store.add(ids, corpus, payloads)
+        stores[dtype] = store
+    exact = [[doc_id for doc_id, _ in stores["float32"].search(q, k)] for q in query_vectors]
+
+    results = []
+    variants = [(dtype, False) for dtype in DTYPES] + [(dtype, True) for dtype in DTYPES if dtype != "float32"]
+    for dtype, with_rescore in variants:
+        store = stores[dtype]
+        recalls, latencies = [], []
+        for query, expected in zip(query_vectors, exact):
+            start = time.perf_counter()
+            if with_rescore:
+                candidates = [doc_id for doc_id, _ in store.search(query, k * RESCORE_FACTOR)]
+                hits = rescore(query, candidates, corpus[[int(c) for c in candidates]], k)
+            else:
+                hits = store.search(query, k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            recalls.append(recall_at_k(expected, [doc_id for doc_id, _ in hits]))
+        results.append({
+            "dtype": dtype,
+            "rescore": with_rescore,
+            f"recall@{k}": round(statistics.mean(recalls), 4),
+            "bytes_per_vector": store.nbytes / vectors,
+            "p50_ms": round(statistics.median(latencies), 4),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dimensions", type=int, default=768)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--source", choices=["random", "hashing"], default="random")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    results = run(args.vectors, args.queries, args.dimensions, args.k, args.source, args.seed)
+    print(f"{'dtype':<8} {'rescore':<8} {'recall@' + str(args.k):<10} {'bytes/vector':<13} {'p50 ms':<8}")
+    for row in results:
+        print(f"{row['dtype']:<8} {str(row['rescore']):<8} {row[f'recall@{args.k}']:<10} "
+              f"{row['bytes_per_vector']:<13.1f} {row['p50_ms']:<8}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
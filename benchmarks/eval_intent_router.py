@@ -0,0 +1,123 @@
+"""
+Accuracy and latency of the local intent router against a labeled set.
+
+Trains the router on the labeled examples, routes every line of the evaluation set
+and reports how many turns it decides locally (coverage), how accurate those local
+decisions are, per-intent precision/recall, a confusion matrix of its best guesses,
+and per-turn routing latency. Several confidence thresholds can be compared in one
+run. Exits with status 1 if local accuracy at the router's threshold falls below
+--min-accuracy. Example:
+
+    python benchmarks/eval_intent_router.py --thresholds 0.6 0.7 0.8 0.9 --json intent_router.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")))
+
+from intent_router import (DEFAULT_CONFIDENCE_THRESHOLD, DEFAULT_EXAMPLES_PATH, INTENTS, IntentRouter,  # noqa: E402
+                           load_examples)
+
+DEFAULT_EVAL_PATH = os.path.join(os.path.dirname(DEFAULT_EXAMPLES_PATH), "intent_eval.jsonl")
+
+
+def percentile(values: list, quantile: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+
+
+def evaluate(router: IntentRouter, labeled: list, repeats: int) -> dict:
+    decisions, latencies = [], []
+    for text, _ in labeled:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            decision = router.route(text)
+            latencies.append(time.perf_counter() - start)
+        decisions.append(decision)
+
+    local = [(decision, label) for decision, (_, label) in zip(decisions, labeled) if decision.confident]
+    confusion = {label: {predicted: 0 for predicted in INTENTS} for label in INTENTS}
+    for decision, (_, label) in zip(decisions, labeled):
+        confusion[label][decision.intent] += 1
+    per_intent = {}
+    for intent in INTENTS:
+        true_positive = confusion[intent][intent]
+        predicted = sum(row[intent] for row in confusion.values())
+        actual = sum(confusion[intent].values())
+        per_intent[intent] = {
+            "precision": true_positive / predicted if predicted else 0.0,
+            "recall": true_positive / actual if actual else 0.0,
+        }
+    return {
+        "threshold": router.threshold,
+        "examples": len(labeled),
+        "coverage": len(local) / len(labeled),
+        "local_accuracy": sum(decision.intent == label for decision, label in local) / len(local) if local else 0.0,
+        "overall_accuracy": sum(d.intent == label for d, (_, label) in zip(decisions, labeled)) / len(labeled),
+        "llm_fallbacks": len(labeled) - len(local),
+        "by_source": {source: sum(d.source == source for d in decisions) for source in ("rule", "classifier")},
+        "per_intent": per_intent,
+        "confusion": confusion,
+        "latency_us": {
+            "mean": statistics.mean(latencies) * 1e6,
+            "p50": percentile(latencies, 0.50) * 1e6,
+            "p95": percentile(latencies, 0.95) * 1e6,
+            "p99": percentile(latencies, 0.99) * 1e6,
+        },
+        "errors": [{"text": text, "label": label, "predicted": d.intent, "confidence": round(d.confidence, 3),
+                    "source": d.source, "confident": d.confident}
+                   for d, (text, label) in zip(decisions, labeled) if d.intent != label],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--train", default=DEFAULT_EXAMPLES_PATH, help="JSONL of labeled training examples.")
+    parser.add_argument("--eval", default=DEFAULT_EVAL_PATH, help="JSONL of labeled evaluation examples.")
+    parser.add_argument("--thresholds", nargs="+", type=float, default=[DEFAULT_CONFIDENCE_THRESHOLD])
+    parser.add_argument("--repeats", type=int, default=20, help="Timed routing calls per example.")
+    parser.add_argument("--min-accuracy", type=float, default=0.0,
+                        help="Fail if local accuracy at the default threshold is below this.")
+    parser.add_argument("--show-errors", action="store_true", help="List misrouted examples.")
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    training, labeled = load_examples(args.train), load_examples(args.eval)
+    results = [evaluate(IntentRouter(training, threshold=threshold), labeled, args.repeats)
+               for threshold in args.thresholds]
+
+    print(f"{len(training)} training examples, {len(labeled)} evaluation examples")
+    print(f"{'threshold':>9} {'coverage':>9} {'local acc':>9} {'overall':>8} {'to LLM':>7} "
+          f"{'p50 us':>8} {'p95 us':>8} {'p99 us':>8}")
+    for result in results:
+        latency = result["latency_us"]
+        print(f"{result['threshold']:>9.2f} {result['coverage']:>9.1%} {result['local_accuracy']:>9.1%} "
+              f"{result['overall_accuracy']:>8.1%} {result['llm_fallbacks']:>7} "
+              f"{latency['p50']:>8.1f} {latency['p95']:>8.1f} {latency['p99']:>8.1f}")
+
+    reference = next((r for r in results if r["threshold"] == DEFAULT_CONFIDENCE_THRESHOLD), results[0])
+    print(f"\nAt threshold {reference['threshold']:.2f} (rows: label, columns: best guess):")
+    print(f"{'':>10}" + "".join(f"{intent:>10}" for intent in INTENTS) + f"{'precision':>11}{'recall':>8}")
+    for label in INTENTS:
+        scores = reference["per_intent"][label]
+        print(f"{label:>10}" + "".join(f"{reference['confusion'][label][p]:>10}" for p in INTENTS)
+              + f"{scores['precision']:>11.1%}{scores['recall']:>8.1%}")
+    if args.show_errors:
+        for error in reference["errors"]:
+            print(f"  {error['label']:>8} -> {error['predicted']:<8} {error['confidence']:.2f} "
+                  f"{error['source']:<10} {'local' if error['confident'] else 'LLM':<5} {error['text']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+    if reference["local_accuracy"] < args.min_accuracy:
+        print(f"FAIL local accuracy {reference['local_accuracy']:.1%} is below {args.min_accuracy:.1%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from lexical_index import tokenize
+from memory_tool import DEFAULT_PAGE_SIZE, MemoryStore
+from metrics import ITEMS_TOTAL, OPERATION_SECONDS, metrics
+from structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+# Memories at least this similar to a cluster's seed are merged into it. Lower than the
+# save-time dedup threshold because merging keeps every member's distinct details.
+DEFAULT_CONSOLIDATION_THRESHOLD = 0.9
+# Largest number of memories merged into one.
+DEFAULT_MAX_CLUSTER_SIZE = 8
+# Background pacing: seconds between passes, merges per second and users per pass.
+DEFAULT_INTERVAL_S = 60.0
+DEFAULT_MAX_MERGES_PER_SECOND = 5.0
+DEFAULT_MAX_USERS_PER_PASS = 50
+# A member is appended to the merged text only if more than this share of its terms is new;
+# one with fewer (but some) new terms likely restates a fact with a different value.
+_NEW_TERMS_RATIO = 0.5
+# "colour", "favourite": British spellings compared as their American variants.
+_BRITISH_SPELLING = re.compile(r"(?<=[a-z]{2})our(?=(ite|ed|ing|s)?$)")
+# Ways of stating a preference ("I like blue", "blue is my favorite"), as normalised stems.
+_PREFERENCE_STEMS = {stem: "favorit" for stem in ("lik", "lov", "prefer", "enjoy", "favorit")}
+
+# Turns a cluster's memory texts (newest first) into one canonical text, or returns None
+# to leave the cluster unmerged.
+Summarizer = Callable[[List[str]], Optional[str]]
+
+
+def _normalize_term(term: str) -> str:
+    """Folds British spellings, simple inflections and preference verbs onto one form."""
+    term = _BRITISH_SPELLING.sub("or", term)
+    for suffix in ("ing", "ed", "es", "s"):
+        if term.endswith(suffix) and not term.endswith("ss") and len(term) - len(suffix) >= 3:
+            term = term[:-len(suffix)]
+            break
+    if len(term) > 3 and term.endswith("e"):
+        term = term[:-1]
+    return _PREFERENCE_STEMS.get(term, term)
+
+
+def _terms(content: str) -> Set[str]:
+    return {_normalize_term(term) for term in tokenize(content)}
+
+
+def merge_distinct(contents: List[str]) -> Optional[str]:
+    """
+    Local, non-LLM summarizer: compares normalised terms (case, punctuation, spelling
+    variants and simple inflections ignored), drops members whose terms another member
+    already contains, lets a member that contains all of the merged text (a more detailed
+    restatement) take its place, and appends members that mostly add new terms, so
+    rephrasings collapse into one memory while genuinely new details survive. A member that
+    swaps a few terms for others ("... is blue" against the newer "... is red") may be a
+    correction or a separate fact, so the cluster is left unmerged (None) rather than
+    silently losing either.
+    """
+    terms = [_terms(content) for content in contents]
+    # A member restated by another one adds nothing; of two equal ones, keep the newer.
+    kept = [i for i in range(len(contents))
+            if not any(terms[i] < terms[j] or (terms[i] == terms[j] and j < i)
+                       for j in range(len(contents)) if j != i)]
+    merged = [contents[kept[0]]]
+    seen = set(terms[kept[0]])
+    for i in kept[1:]:
+        new_terms = terms[i] - seen
+        if not new_terms:
+            continue
+        if terms[i] >= seen:
+            merged, seen = [contents[i]], set(terms[i])
+        elif len(new_terms) / len(terms[i]) > _NEW_TERMS_RATIO:
+            merged.append(contents[i])
+            seen |= terms[i]
+        else:
+            return None
+    return "; ".join(merged)
+
+
+class ConsolidationResult:
+    """What one consolidation pass did to one user's memory bank."""
+    __slots__ = ("user_id", "memories_before", "clusters_merged", "memories_removed", "clusters_skipped",
+                 "conflicts")
+
+    def __init__(self, user_id: str, memories_before: int = 0, clusters_merged: int = 0,
+                 memories_removed: int = 0, clusters_skipped: int = 0, conflicts: int = 0):
+        self.user_id = user_id
+        self.memories_before = memories_before
+        self.clusters_merged = clusters_merged
+        self.memories_removed = memories_removed
+        self.clusters_skipped = clusters_skipped
+        self.conflicts = conflicts
+
+    def __repr__(self) -> str:
+        return (f"ConsolidationResult(user_id={self.user_id!r}, memories_before={self.memories_before}, "
+                f"clusters_merged={self.clusters_merged}, memories_removed={self.memories_removed}, "
+                f"clusters_skipped={self.clusters_skipped}, conflicts={self.conflicts})")
+
+
+def _load_bank(store: MemoryStore, page_size: int = DEFAULT_PAGE_SIZE):
+    """Returns the user's ids, contents, contexts, creation times and embeddings, paging through the collection."""
+    collection = store.vector_store._collection
+    ids, contents, contexts, created, embeddings = [], [], [], [], []
+    offset = 0
+    while True:
+        page = collection.get(where={"user_id": store.user_id}, limit=page_size, offset=offset,
+                              include=["documents", "metadatas", "embeddings"])
+        if not page["ids"]:
+            break
+        ids.extend(page["ids"])
+        contents.extend(page["documents"])
+        contexts.extend((metadata or {}).get("context", "") for metadata in page["metadatas"])
+        # Memories saved before creation times were recorded sort as oldest.
+        created.extend(float((metadata or {}).get("created_at", 0.0)) for metadata in page["metadatas"])
+        embeddings.extend(page["embeddings"])
+        offset += len(page["ids"])
+    return ids, contents, contexts, created, embeddings
+
+
+def find_clusters(ids: List[str], embeddings: List[List[float]], threshold: float = DEFAULT_CONSOLIDATION_THRESHOLD,
+                  settled: Optional[Set[str]] = None,
+                  max_cluster_size: int = DEFAULT_MAX_CLUSTER_SIZE) -> List[List[int]]:
+    """
+    Groups near-duplicate memories, returning clusters of two or more row indexes.
+
+    Each cluster is seeded by a candidate memory and holds the unassigned memories at
+    least threshold-similar to that seed, so every member is close to the seed itself
+    rather than linked through a chain of neighbours. Settled memories (those already
+    compared with each other by an earlier pass) never seed a cluster, which makes
+    consolidation incremental; they can still join one seeded by a newer memory.
+    """
+    if len(ids) < 2:
+        return []
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = matrix / np.where(norms == 0, 1, norms)
+    seeds = [i for i, doc_id in enumerate(ids) if not settled or doc_id not in settled]
+    assigned = np.zeros(len(ids), dtype=bool)
+    clusters = []
+    for start in range(0, len(seeds), 256):
+        block = seeds[start:start + 256]
+        similarities = matrix[block] @ matrix.T
+        for row, seed in zip(similarities, block):
+            if assigned[seed]:
+                continue
+            neighbours = np.flatnonzero((row >= threshold) & ~assigned)
+            neighbours = neighbours[neighbours != seed]
+            if not len(neighbours):
+                continue
+            neighbours = neighbours[np.argsort(-row[neighbours])][:max_cluster_size - 1]
+            cluster = [seed] + neighbours.tolist()
+            assigned[cluster] = True
+            clusters.append(cluster)
+    return clusters
+
+
+def consolidate_memories(store: MemoryStore, threshold: float = DEFAULT_CONSOLIDATION_THRESHOLD,
+                         summarizer: Summarizer = merge_distinct, settled: Optional[Set[str]] = None,
+                         max_cluster_size: int = DEFAULT_MAX_CLUSTER_SIZE,
+                         throttle: Optional[Callable[[], bool]] = None) -> Tuple[ConsolidationResult, Set[str]]:
+    """
+    Merges each cluster of a user's near-duplicate memories into one canonical memory.
+    Each merge is a MemoryStore.replace_memories call, which is not atomic: it rewrites one
+    member and then deletes the others, so a crash in between leaves a redundant duplicate
+    (never a lost memory) for the next pass to merge.
+    Args:
+        store (MemoryStore): The user's store.
+        threshold (float): Cosine similarity at or above which memories are merged.
+        summarizer (Summarizer): Builds the canonical text from the cluster's texts, newest first,
+                                 or returns None to leave the cluster as it is.
+        settled (Set[str]): Ids of memories already compared with each other; they do not seed clusters.
+        max_cluster_size (int): Largest number of memories merged into one.
+        throttle (Callable[[], bool]): Called before each merge; returning False stops the pass early.
+    Returns:
+        The pass's ConsolidationResult and the ids that are settled afterwards: every remaining
+        memory except the merged ones, whose new text has not been compared with the rest yet.
+    """
+    with metrics.timer(OPERATION_SECONDS, operation="consolidate", **store.metric_labels):
+        ids, contents, contexts, created, embeddings = _load_bank(store)
+        result = ConsolidationResult(store.user_id, memories_before=len(ids))
+        unsettled: Set[str] = set()
+        finished = True
+        for cluster in find_clusters(ids, embeddings, threshold, settled, max_cluster_size):
+            if throttle is not None and not throttle():
+                finished = False
+                break
+            # Newest first, so a later statement of a fact wins over the one it corrects.
+            cluster.sort(key=lambda i: created[i], reverse=True)
+            content = summarizer([contents[i] for i in cluster])
+            if content is None:
+                result.clusters_skipped += 1
+                continue
+            context = "; ".join(dict.fromkeys(contexts[i] for i in cluster if contexts[i]))
+            # A summary identical to a member keeps that member's embedding; anything else is embedded.
+            same = next((i for i in cluster if contents[i] == content), None)
+            if same is not None:
+                cluster.remove(same)
+                cluster.insert(0, same)
+            cluster_ids = [ids[i] for i in cluster]
+            kept = store.replace_memories(cluster_ids, content, context,
+                                          embedding=embeddings[same] if same is not None else None)
+            if kept is None:
+                result.conflicts += 1
+                unsettled.update(cluster_ids)
+                continue
+            result.clusters_merged += 1
+            result.memories_removed += len(cluster_ids) - 1
+            unsettled.update(cluster_ids)
+    metrics.inc(ITEMS_TOTAL, result.memories_removed, stage="consolidate", **store.metric_labels)
+    if result.clusters_merged:
+        logger.info("Consolidated memories", extra={"user_id": store.user_id, "collection": store.collection_name,
+                                                    "before": result.memories_before,
+                                                    "clusters": result.clusters_merged,
+                                                    "removed": result.memories_removed})
+    # A pass cut short leaves its unmerged clusters' seeds unsettled for the next one.
+    now_settled = set(ids) if finished else set(settled or ())
+    return result, {doc_id for doc_id in ids if doc_id in now_settled and doc_id not in unsettled}
+
+
+class ConsolidationJob:
+    """
+    Consolidates users' memory banks on a background thread, a little at a time.
+
+    Stores are scheduled (e.g. after a save) and consolidated on the next pass. A user
+    whose memories have not changed since their last pass is skipped, and only memories
+    added since then seed new clusters. Merges are paced to max_merges_per_second and
+    each pass handles at most max_users_per_pass users, leaving the rest for the next.
+    """
+    def __init__(self, threshold: float = DEFAULT_CONSOLIDATION_THRESHOLD, summarizer: Summarizer = merge_distinct,
+                 interval_s: float = DEFAULT_INTERVAL_S, max_merges_per_second: float = DEFAULT_MAX_MERGES_PER_SECOND,
+                 max_users_per_pass: int = DEFAULT_MAX_USERS_PER_PASS,
+                 max_cluster_size: int = DEFAULT_MAX_CLUSTER_SIZE):
+        """
+        Args:
+            threshold (float): Cosine similarity at or above which memories are merged.
+            summarizer (Summarizer): Builds a cluster's canonical text; e.g. an LLM call instead of merge_distinct.
+            interval_s (float): Seconds between background passes.
+            max_merges_per_second (float): Upper bound on merges, so consolidation never competes with chat traffic.
+            max_users_per_pass (int): Users consolidated per pass.
+            max_cluster_size (int): Largest number of memories merged into one.
+        """
+        self.threshold = threshold
+        self.summarizer = summarizer
+        self.interval_s = interval_s
+        self.max_merges_per_second = max_merges_per_second
+        self.max_users_per_pass = max_users_per_pass
+        self.max_cluster_size = max_cluster_size
+        self._pending: "OrderedDict[Hashable, MemoryStore]" = OrderedDict()
+        # Per user: the write generation last consolidated (None after a pass that merged)
+        # and the ids settled by that pass.
+        self._settled: Dict[Hashable, Tuple[Optional[int], Set[str]]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._last_merge = 0.0
+        self._worker: Optional[threading.Thread] = None
+
+    def schedule(self, store: MemoryStore) -> None:
+        """Queues a user's store for the next pass, starting the background thread on first use."""
+        with self._lock:
+            self._pending[store._cache_scope] = store
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="memory-consolidation", daemon=True)
+                self._worker.start()
+
+    def run_pending(self) -> List[ConsolidationResult]:
+        """Runs one pass over the scheduled users now, on the calling thread."""
+        with self._lock:
+            batch = [self._pending.popitem(last=False) for _ in range(min(len(self._pending), self.max_users_per_pass))]
+        results = []
+        for scope, store in batch:
+            if self._stop.is_set():
+                break
+            try:
+                result = self._consolidate(scope, store)
+            except Exception:
+                logger.exception("Consolidation failed", extra={"user_id": store.user_id,
+                                                                "collection": store.collection_name})
+                continue
+            if result is not None:
+                results.append(result)
+        return results
+
+    def close(self) -> None:
+        """Stops the background thread after the merge in progress."""
+        self._stop.set()
+        self._wake.set()
+        if self._worker is not None:
+            self._worker.join()
+
+    def _consolidate(self, scope: Hashable, store: MemoryStore) -> Optional[ConsolidationResult]:
+        generation = store.generation
+        settled_generation, settled_ids = self._settled.get(scope, (None, None))
+        if settled_generation is not None and settled_generation == generation:
+            return None
+        result, settled_ids = consolidate_memories(store, self.threshold, self.summarizer, settled_ids,
+                                                   self.max_cluster_size, throttle=self._throttle)
+        # Merges move the generation themselves, so after one the next pass looks again;
+        # only the merged memories are unsettled, so it is cheap.
+        self._settled[scope] = (None if result.clusters_merged else generation, settled_ids)
+        return result
+
+    def _throttle(self) -> bool:
+        """Sleeps as needed to stay under max_merges_per_second; False once the job is closing."""
+        wait = self._last_merge + 1.0 / self.max_merges_per_second - time.monotonic()
+        if wait > 0 and self._stop.wait(wait):
+            return False
+        self._last_merge = time.monotonic()
+        return not self._stop.is_set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.run_pending()
+            self._wake.wait(self.interval_s)
+            self._wake.clear()
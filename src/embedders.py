@@ -0,0 +1,60 @@
+import os
+from typing import Callable, Dict, Optional, TYPE_CHECKING
+
+# Embedder implementations (and LangChain's Embeddings base class, which pulls in
+# langsmith) are imported by the backend factories, not when this module loads.
+if TYPE_CHECKING:
+    from langchain_core.embeddings import Embeddings
+
+BACKEND_GOOGLE = "google"
+BACKEND_LOCAL = "local"
+DEFAULT_MODELS = {
+    BACKEND_GOOGLE: "text-embedding-004",
+    BACKEND_LOCAL: "hashing-768",
+}
+
+
+def _create_google_embeddings(model: str) -> "Embeddings":
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        raise ValueError("GOOGLE_API_KEY not found in environment variables. Please set it in a .env file.")
+    return GoogleGenerativeAIEmbeddings(model=model, google_api_key=api_key)
+
+
+def _create_local_embeddings(model: str) -> "Embeddings":
+    from local_embedder import HashingEmbeddings
+
+    dimensions = int(model.rsplit("-", 1)[-1]) if model.startswith("hashing-") else 768
+    return HashingEmbeddings(dimensions=dimensions)
+
+
+_BACKENDS: Dict[str, Callable[[str], "Embeddings"]] = {
+    BACKEND_GOOGLE: _create_google_embeddings,
+    BACKEND_LOCAL: _create_local_embeddings,
+}
+
+
+def register_backend(name: str, factory: Callable[[str], "Embeddings"], default_model: str) -> None:
+    """
+    Makes a new embedding backend selectable by name.
+    Args:
+        name (str): The backend name, as used in MEMORY_EMBEDDING_BACKEND.
+        factory (Callable[[str], Embeddings]): Builds the embedder for a model name.
+        default_model (str): The model used when none is configured.
+    """
+    _BACKENDS[name] = factory
+    DEFAULT_MODELS[name] = default_model
+
+
+def create_embeddings(backend: str, model: Optional[str] = None) -> "Embeddings":
+    """
+    Builds an embedder for a registered backend.
+    Args:
+        backend (str): "google", "local" or a name passed to register_backend.
+        model (str): The model name. Defaults to the backend's default model.
+    """
+    if backend not in _BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}'. Expected one of {tuple(_BACKENDS)}.")
+    return _BACKENDS[backend](model or DEFAULT_MODELS[backend])
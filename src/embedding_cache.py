@@ -0,0 +1,218 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+# Memory-tier hits are recorded and their disk last_used refreshed in batches of this many keys.
+TOUCH_BATCH_SIZE = 256
+# Disk eviction removes this fraction of max_disk_entries beyond the overflow, so it runs rarely.
+EVICTION_SLACK = 0.01
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embedding model with a two-level, content-addressed cache.
+
+    Level 1 is an in-process LRU; level 2 is a SQLite file shared across
+    processes and restarts. Entries are keyed by the model name, the embedding
+    kind (query or document) and a SHA-256 of the text, so switching models
+    never returns stale vectors.
+    """
+    def __init__(self, embeddings: Embeddings, cache_path: Optional[str] = None,
+                 max_memory_entries: int = 10_000, max_disk_entries: int = 1_000_000):
+        """
+        Args:
+            embeddings (Embeddings): The underlying embedding model to call on a miss.
+            cache_path (str): Path of the SQLite cache file. None disables the disk tier.
+            max_memory_entries (int): Maximum number of vectors kept in the in-process LRU.
+            max_disk_entries (int): Maximum number of vectors kept on disk before the
+                                    least recently used ones are evicted.
+        """
+        self.embeddings = embeddings
+        self.model_name = str(getattr(embeddings, "model", type(embeddings).__name__))
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        # Keys served from memory whose disk last_used has not been refreshed yet.
+        self._touched: Dict[str, float] = {}
+        self._disk_count = 0
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {
+            "memory_hits": 0, "disk_hits": 0, "misses": 0,
+            "memory_evictions": 0, "disk_evictions": 0,
+        }
+
+        self._db = None
+        if cache_path:
+            os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+            self._db = sqlite3.connect(cache_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+            self._db.commit()
+            # Kept up to date on insert and eviction rather than counted on every write; other
+            # processes sharing the file make it approximate, so each eviction recounts.
+            (self._disk_count,) = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+
+    def _key(self, text: str, kind: str) -> str:
+        # Some providers embed queries and documents differently, so the kind is part of the key.
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{self.model_name}:{kind}:{digest}"
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.stats["memory_evictions"] += 1
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Returns cached vectors for the given keys, promoting disk hits into memory."""
+        found: Dict[str, List[float]] = {}
+        missing = []
+        now = time.time()
+        for key in keys:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                found[key] = self._memory[key]
+                self.stats["memory_hits"] += 1
+                if self._db is not None:
+                    self._touched[key] = now
+            else:
+                missing.append(key)
+        if len(self._touched) >= TOUCH_BATCH_SIZE:
+            self._flush_touched()
+
+        if self._db is not None and missing:
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f", blob).tolist()
+                    found[key] = vector
+                    self._remember(key, vector)
+                    self.stats["disk_hits"] += 1
+                if rows:
+                    self._db.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                        [(now, key) for key, _ in rows],
+                    )
+            self._db.commit()
+        return found
+
+    def _flush_touched(self) -> None:
+        """Writes the last_used time of memory-tier hits to disk, so the disk LRU keeps hot keys."""
+        if self._db is None or not self._touched:
+            return
+        touched, self._touched = self._touched, {}
+        self._db.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?",
+                             [(used, key) for key, used in touched.items()])
+        self._db.commit()
+
+    def _store(self, entries: Dict[str, List[float]]) -> None:
+        for key, vector in entries.items():
+            self._remember(key, vector)
+        if self._db is None or not entries:
+            return
+        now = time.time()
+        # Vectors are content-addressed, so an existing row already holds the same vector.
+        inserted = self._db.executemany(
+            "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+            [(key, array("f", vector).tobytes(), now) for key, vector in entries.items()],
+        ).rowcount
+        self._disk_count += inserted
+        overflow = self._disk_count - self.max_disk_entries
+        if overflow > 0:
+            deleted = self._db.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                (overflow + int(self.max_disk_entries * EVICTION_SLACK),),
+            ).rowcount
+            self.stats["disk_evictions"] += deleted
+            (self._disk_count,) = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        self._db.commit()
+
+    def _partition(self, texts: List[str]) -> Tuple[List[str], Dict[str, List[float]], Dict[str, str]]:
+        """Splits texts into cached vectors and the (deduplicated) texts that still need embedding."""
+        keys = [self._key(text, "document") for text in texts]
+        with self._lock:
+            found = self._lookup(list(dict.fromkeys(keys)))
+        to_embed: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in to_embed:
+                to_embed[key] = text
+        return keys, found, to_embed
+
+    def _add_fresh(self, found: Dict[str, List[float]], to_embed: Dict[str, str],
+                   vectors: List[List[float]]) -> None:
+        fresh = dict(zip(to_embed.keys(), vectors))
+        with self._lock:
+            self.stats["misses"] += len(fresh)
+            self._store(fresh)
+        found.update(fresh)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embeds a list of texts, only calling the underlying model for cache misses."""
+        keys, found, to_embed = self._partition(texts)
+        if to_embed:
+            self._add_fresh(found, to_embed, self.embeddings.embed_documents(list(to_embed.values())))
+        return [found[key] for key in keys]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Async version of embed_documents. Cache reads and writes run on the loop's default executor."""
+        loop = asyncio.get_running_loop()
+        keys, found, to_embed = await loop.run_in_executor(None, self._partition, texts)
+        if to_embed:
+            vectors = await self.embeddings.aembed_documents(list(to_embed.values()))
+            await loop.run_in_executor(None, self._add_fresh, found, to_embed, vectors)
+        return [found[key] for key in keys]
+
+    def _cached_query(self, text: str) -> Tuple[str, Optional[List[float]]]:
+        key = self._key(text, "query")
+        with self._lock:
+            return key, self._lookup([key]).get(key)
+
+    def _add_query(self, key: str, vector: List[float]) -> None:
+        with self._lock:
+            self.stats["misses"] += 1
+            self._store({key: vector})
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embeds a single query, only calling the underlying model on a cache miss."""
+        key, vector = self._cached_query(text)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self._add_query(key, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Async version of embed_query. Cache reads and writes run on the loop's default executor."""
+        loop = asyncio.get_running_loop()
+        key, vector = await loop.run_in_executor(None, self._cached_query, text)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            await loop.run_in_executor(None, self._add_query, key, vector)
+        return vector
+
+    def clear(self) -> None:
+        """Drops every cached vector from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM embeddings")
+                self._db.commit()
+                self._disk_count = 0
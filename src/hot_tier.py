@@ -0,0 +1,257 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from query_cache import DEFAULT_TTL_S
+
+# Storage formats for hot-tier vectors: full precision, half precision, or scalar int8
+# with one float32 scale per vector (about a quarter of the float32 size).
+DTYPE_FLOAT32 = "float32"
+DTYPE_FLOAT16 = "float16"
+DTYPE_INT8 = "int8"
+DTYPES = (DTYPE_FLOAT32, DTYPE_FLOAT16, DTYPE_INT8)
+_NUMPY_DTYPES = {DTYPE_FLOAT32: np.float32, DTYPE_FLOAT16: np.float16, DTYPE_INT8: np.int8}
+# Quantized rows are scored in blocks of this many rows to bound the float32 temporaries.
+_SCORE_BLOCK_ROWS = 4096
+
+
+class UserVectors:
+    """
+    One user's embeddings as a contiguous matrix, answered by exact brute-force search.
+
+    Rows are L2-normalised on insert so top-k by cosine similarity is a single
+    matrix-vector product followed by argpartition. Capacity grows geometrically
+    so appends are amortised O(1). Rows can be stored as float16 or int8 to save
+    memory, in which case scores are approximate and callers may rescore the top
+    candidates at full precision.
+    """
+    def __init__(self, dimensions: int, capacity: int = 64, dtype: str = DTYPE_FLOAT32):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown vector dtype '{dtype}'. Expected one of {DTYPES}.")
+        self.dtype = dtype
+        capacity = max(capacity, 1)
+        self._matrix = np.empty((capacity, dimensions), dtype=_NUMPY_DTYPES[dtype])
+        self._scales = np.ones(capacity, dtype=np.float32) if dtype == DTYPE_INT8 else None
+        self.ids: List[str] = []
+        self.payloads: List[Dict[str, str]] = []
+        self._positions: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def quantized(self) -> bool:
+        return self.dtype != DTYPE_FLOAT32
+
+    @property
+    def nbytes(self) -> int:
+        return self._matrix.nbytes + (self._scales.nbytes if self._scales is not None else 0)
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """The live rows as stored (a view, not a copy)."""
+        return self._matrix[:len(self.ids)]
+
+    def _set_row(self, position: int, vector: np.ndarray) -> None:
+        if self._scales is not None:
+            scale = float(np.abs(vector).max()) / 127.0 or 1.0
+            self._scales[position] = scale
+            self._matrix[position] = np.round(vector / scale).astype(np.int8)
+        else:
+            self._matrix[position] = vector
+
+    def _grow(self) -> None:
+        size = self._matrix.shape[0]
+        grown = np.empty((size * 2, self._matrix.shape[1]), dtype=self._matrix.dtype)
+        grown[:size] = self._matrix
+        self._matrix = grown
+        if self._scales is not None:
+            scales = np.ones(size * 2, dtype=np.float32)
+            scales[:size] = self._scales
+            self._scales = scales
+
+    @staticmethod
+    def _normalise(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+    def add(self, ids: Sequence[str], vectors: Sequence[Sequence[float]], payloads: Sequence[Dict[str, str]]) -> None:
+        """Appends vectors, replacing rows whose id is already present."""
+        vectors = self._normalise(np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1))
+        for doc_id, vector, payload in zip(ids, vectors, payloads):
+            position = self._positions.get(doc_id)
+            if position is not None:
+                self._set_row(position, vector)
+                self.payloads[position] = payload
+                continue
+            position = len(self.ids)
+            if position == self._matrix.shape[0]:
+                self._grow()
+            # Fill the row before publishing the id so concurrent searches never see an unset row.
+            self._set_row(position, vector)
+            self.payloads.append(payload)
+            self._positions[doc_id] = position
+            self.ids.append(doc_id)
+
+    def payload(self, doc_id: str) -> Dict[str, str]:
+        return self.payloads[self._positions[doc_id]]
+
+    def _scores(self, query: np.ndarray, size: int) -> np.ndarray:
+        if not self.quantized:
+            return self._matrix[:size] @ query
+        scores = np.empty(size, dtype=np.float32)
+        for start in range(0, size, _SCORE_BLOCK_ROWS):
+            end = min(start + _SCORE_BLOCK_ROWS, size)
+            scores[start:end] = self._matrix[start:end].astype(np.float32) @ query
+        if self._scales is not None:
+            scores *= self._scales[:size]
+        return scores
+
+    def search(self, query: Sequence[float], k: int) -> List[Tuple[str, float]]:
+        """Returns up to k (id, cosine similarity) pairs, best first. Approximate when quantized."""
+        size = len(self.ids)
+        if not size:
+            return []
+        query = np.asarray(query, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+        scores = self._scores(query, size)
+        k = min(k, size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.ids[i], float(scores[i])) for i in top]
+
+
+def rescore(query: Sequence[float], ids: Sequence[str], vectors: Sequence[Sequence[float]],
+            k: int) -> List[Tuple[str, float]]:
+    """
+    Re-ranks candidates by exact cosine similarity against their full-precision vectors.
+    Args:
+        query (Sequence[float]): The query embedding.
+        ids (Sequence[str]): Candidate ids, typically the top few multiples of k from a quantized search.
+        vectors (Sequence[Sequence[float]]): Full-precision vectors for ids, in the same order.
+        k (int): Number of results to return.
+    """
+    if not len(ids):
+        return []
+    matrix = np.asarray(vectors, dtype=np.float32)
+    query = np.asarray(query, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+    scores = np.divide(matrix @ query, norms, out=np.zeros(len(ids), dtype=np.float32), where=norms > 0)
+    order = np.argsort(-scores)[:k]
+    return [(ids[i], float(scores[i])) for i in order]
+
+
+class HotTier:
+    """
+    Keeps active users' vectors in process memory, evicting least recently used users
+    once the total matrix size exceeds max_bytes.
+
+    Writes made by this process are applied in place, but writes made by other processes
+    are not seen, so a user's vectors are dropped ttl_s after they were loaded and the
+    next search reloads them.
+    """
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, max_vectors_per_user: int = 5000,
+                 dtype: str = DTYPE_FLOAT32, ttl_s: Optional[float] = DEFAULT_TTL_S):
+        """
+        Args:
+            max_bytes (int): Total bytes of vector matrices kept across all users.
+            max_vectors_per_user (int): Users with more memories than this stay in the vector store.
+            dtype (str): How vectors are stored: "float32", "float16" or "int8".
+            ttl_s (float): Seconds a user's vectors are served after loading. None keeps them until evicted.
+        """
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown vector dtype '{dtype}'. Expected one of {DTYPES}.")
+        self.dtype = dtype
+        self.max_bytes = max_bytes
+        self.max_vectors_per_user = max_vectors_per_user
+        self.ttl_s = ttl_s
+        self._users: "OrderedDict[Hashable, UserVectors]" = OrderedDict()
+        self._loaded_at: Dict[Hashable, float] = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "loads": 0, "evictions": 0, "expired": 0}
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def get(self, scope: Hashable) -> Optional[UserVectors]:
+        with self._lock:
+            vectors = self._users.get(scope)
+            if vectors is not None and self.ttl_s is not None \
+                    and time.monotonic() - self._loaded_at[scope] > self.ttl_s:
+                self._drop(scope)
+                self.stats["expired"] += 1
+                vectors = None
+            if vectors is None:
+                self.stats["misses"] += 1
+                return None
+            self._users.move_to_end(scope)
+            self.stats["hits"] += 1
+            return vectors
+
+    def load(self, scope: Hashable, ids: Sequence[str], vectors: Sequence[Sequence[float]],
+             payloads: Sequence[Dict[str, str]]) -> Optional[UserVectors]:
+        """Registers a user's full vector set. Returns None if the user is too large to keep hot."""
+        if not ids or len(ids) > self.max_vectors_per_user:
+            return None
+        user_vectors = UserVectors(dimensions=len(vectors[0]), capacity=len(ids), dtype=self.dtype)
+        user_vectors.add(ids, vectors, payloads)
+        with self._lock:
+            self._replace(scope, user_vectors)
+            self.stats["loads"] += 1
+            self._evict()
+        return user_vectors
+
+    def add(self, scope: Hashable, ids: Sequence[str], vectors: Sequence[Sequence[float]],
+            payloads: Sequence[Dict[str, str]]) -> None:
+        """Adds or replaces vectors for a user that is already hot; other users are left cold."""
+        with self._lock:
+            user_vectors = self._users.get(scope)
+            if user_vectors is None:
+                return
+            before = user_vectors.nbytes
+            user_vectors.add(ids, vectors, payloads)
+            self._total_bytes += user_vectors.nbytes - before
+            if len(user_vectors) > self.max_vectors_per_user:
+                self._drop(scope)
+            self._evict()
+
+    def discard(self, scope: Hashable) -> None:
+        with self._lock:
+            self._drop(scope)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._users.clear()
+            self._loaded_at.clear()
+            self._total_bytes = 0
+
+    def _replace(self, scope: Hashable, user_vectors: UserVectors) -> None:
+        self._drop(scope)
+        self._users[scope] = user_vectors
+        self._loaded_at[scope] = time.monotonic()
+        self._total_bytes += user_vectors.nbytes
+
+    def _drop(self, scope: Hashable) -> None:
+        user_vectors = self._users.pop(scope, None)
+        self._loaded_at.pop(scope, None)
+        if user_vectors is not None:
+            self._total_bytes -= user_vectors.nbytes
+
+    def _evict(self) -> None:
+        while self._total_bytes > self.max_bytes and len(self._users) > 1:
+            scope, user_vectors = self._users.popitem(last=False)
+            self._loaded_at.pop(scope, None)
+            self._total_bytes -= user_vectors.nbytes
+            self.stats["evictions"] += 1
+
+
+# Shared by every MemoryStore in the process.
+hot_tier = HotTier(dtype=os.getenv("MEMORY_HOT_TIER_DTYPE", DTYPE_FLOAT32))
@@ -0,0 +1,167 @@
+import json
+import math
+import os
+import re
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from metrics import metrics
+
+# What a user turn asks the agent to do.
+INTENT_SAVE = "save"
+INTENT_RETRIEVE = "retrieve"
+INTENT_CHAT = "chat"
+INTENTS = (INTENT_SAVE, INTENT_RETRIEVE, INTENT_CHAT)
+# Decisions below this confidence are left to the LLM.
+DEFAULT_CONFIDENCE_THRESHOLD = 0.8
+# Labeled examples the classifier is trained on, one {"text": ..., "intent": ...} object per line.
+DEFAULT_EXAMPLES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "intent_examples.jsonl")
+ROUTE_SECONDS = "intent_route_seconds"
+ROUTES_TOTAL = "intent_routes_total"
+metrics.describe(ROUTE_SECONDS, "Latency of local intent routing, by deciding stage (rule or classifier).")
+metrics.describe(ROUTES_TOTAL, "Routed turns by stage, intent and whether the decision skipped the LLM.")
+
+_RULE_CONFIDENCE = 0.97
+_WORD_PATTERN = re.compile(r"[a-z0-9']+")
+_SELF_WORDS = frozenset({"i", "i'm", "i've", "i'd", "me", "my", "mine", "myself", "we", "our", "us"})
+_QUESTION_START = re.compile(r"^(what|who|where|when|which|how|do|does|did|am|is|are|was|were|have|has|can|could|would|should|will)\b")
+# Checked in order; the first match wins.
+_RULES: List[Tuple[str, "re.Pattern"]] = [
+    (INTENT_CHAT, re.compile(r"^(hi|hello|hey|yo|good (morning|afternoon|evening|night)|thanks|thank you|thx|bye|goodbye|"
+                             r"see you|ok|okay|cool|great|nice|lol)( there| so much| again)?[\s!.,]*$")),
+    (INTENT_RETRIEVE, re.compile(r"\b(what|who|where|when|which)('s|\s+is|\s+was|\s+are|\s+were)\s+my\b")),
+    (INTENT_RETRIEVE, re.compile(r"\bdo you (still )?(remember|know|recall)\b")),
+    (INTENT_RETRIEVE, re.compile(r"\b(did|have) i (ever )?(tell|told|mention|mentioned|say|said|share|shared)\b")),
+    (INTENT_RETRIEVE, re.compile(r"\b(who am i|remind me)\b")),
+    (INTENT_RETRIEVE, re.compile(r"^(do|did|am|was|have) i\b.*\?$")),
+    (INTENT_SAVE, re.compile(r"^(please )?(remember|note|keep in mind|don't forget|do not forget)( that)?\b(?!.*\?$)")),
+    (INTENT_SAVE, re.compile(r"^((hi|hello|hey)[,!.]?\s+)?(my name is|my name's|call me|i'm called|i am called)\b")),
+]
+_SAVE_STATEMENT = re.compile(r"^((hi|hello|hey)[,!.]?\s+)?(i|i'm|i am|my|we|our)\b")
+
+
+class RouteDecision:
+    """The router's verdict for one user turn."""
+    __slots__ = ("intent", "confidence", "source", "confident")
+
+    def __init__(self, intent: str, confidence: float, source: str, confident: bool):
+        self.intent = intent
+        self.confidence = confidence
+        self.source = source
+        self.confident = confident
+
+    def __repr__(self) -> str:
+        return (f"RouteDecision(intent={self.intent!r}, confidence={self.confidence:.2f}, "
+                f"source={self.source!r}, confident={self.confident})")
+
+
+def features(text: str) -> List[str]:
+    """Word unigrams and bigrams plus a few shape features (question mark, first word, no first-person words)."""
+    text = text.lower().strip()
+    words = _WORD_PATTERN.findall(text)
+    result = words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+    if text.endswith("?"):
+        result.append("__question__")
+    if words:
+        result.append(f"__first__{words[0]}")
+    if _SELF_WORDS.isdisjoint(words):
+        result.append("__not_about_user__")
+    return result
+
+
+class NaiveBayesClassifier:
+    """Multinomial naive Bayes with add-one smoothing; trains and predicts in microseconds on one CPU core."""
+    def __init__(self):
+        self._log_priors: Dict[str, float] = {}
+        self._log_likelihoods: Dict[str, Dict[str, float]] = {}
+        self._unseen: Dict[str, float] = {}
+
+    def fit(self, examples: Iterable[Tuple[str, str]]) -> "NaiveBayesClassifier":
+        counts: Dict[str, Counter] = {}
+        documents: Counter = Counter()
+        for text, label in examples:
+            counts.setdefault(label, Counter()).update(features(text))
+            documents[label] += 1
+        vocabulary = set().union(*counts.values()) if counts else set()
+        total = sum(documents.values())
+        for label, feature_counts in counts.items():
+            denominator = sum(feature_counts.values()) + len(vocabulary)
+            self._log_priors[label] = math.log(documents[label] / total)
+            self._log_likelihoods[label] = {
+                feature: math.log((count + 1) / denominator) for feature, count in feature_counts.items()
+            }
+            self._unseen[label] = math.log(1 / denominator)
+        return self
+
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        """Returns the posterior probability of each label."""
+        if not self._log_priors:
+            return {}
+        text_features = features(text)
+        scores = {}
+        for label, log_prior in self._log_priors.items():
+            likelihoods, unseen = self._log_likelihoods[label], self._unseen[label]
+            scores[label] = log_prior + sum(likelihoods.get(feature, unseen) for feature in text_features)
+        best = max(scores.values())
+        exponentials = {label: math.exp(score - best) for label, score in scores.items()}
+        total = sum(exponentials.values())
+        return {label: value / total for label, value in exponentials.items()}
+
+
+def load_examples(path: str = DEFAULT_EXAMPLES_PATH) -> List[Tuple[str, str]]:
+    """Reads (text, intent) pairs from a JSONL file."""
+    with open(path, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return [(row["text"], row["intent"]) for row in rows]
+
+
+def intent_from_llm_response(response: str) -> str:
+    """Maps the routing chain's free-text answer to an intent, as the app did before the router existed."""
+    if "save_user_memory" in response:
+        return INTENT_SAVE
+    if "retrieve_user_memories" in response:
+        return INTENT_RETRIEVE
+    return INTENT_CHAT
+
+
+class IntentRouter:
+    """
+    Decides locally whether a turn saves a memory, recalls one, or is plain chat.
+
+    High-precision rules answer the unambiguous phrasings; everything else goes to a
+    naive Bayes classifier trained on labeled examples. Decisions whose confidence is
+    below the threshold are marked not confident, and callers fall back to the LLM.
+    """
+    def __init__(self, examples: Optional[Iterable[Tuple[str, str]]] = None,
+                 threshold: float = DEFAULT_CONFIDENCE_THRESHOLD):
+        """
+        Args:
+            examples (Iterable[Tuple[str, str]]): (text, intent) training pairs. Defaults to DEFAULT_EXAMPLES_PATH.
+            threshold (float): Minimum confidence for a decision to be acted on without the LLM.
+        """
+        self.threshold = threshold
+        self.classifier = NaiveBayesClassifier().fit(load_examples() if examples is None else examples)
+
+    def route(self, text: str) -> RouteDecision:
+        start = time.perf_counter()
+        decision = self._decide(text)
+        metrics.observe(ROUTE_SECONDS, time.perf_counter() - start, source=decision.source)
+        metrics.inc(ROUTES_TOTAL, source=decision.source, intent=decision.intent, confident=str(decision.confident))
+        return decision
+
+    def _decide(self, text: str) -> RouteDecision:
+        normalized = " ".join(text.lower().split())
+        for intent, pattern in _RULES:
+            if pattern.search(normalized):
+                return RouteDecision(intent, _RULE_CONFIDENCE, "rule", _RULE_CONFIDENCE >= self.threshold)
+        probabilities = self.classifier.predict_proba(normalized)
+        if not probabilities:
+            return RouteDecision(INTENT_CHAT, 0.0, "classifier", False)
+        intent = max(probabilities, key=probabilities.get)
+        confidence = probabilities[intent]
+        # A first-person statement the classifier also reads as a save is a safe save.
+        if intent == INTENT_SAVE and _SAVE_STATEMENT.search(normalized) and not normalized.endswith("?") \
+                and not _QUESTION_START.search(normalized):
+            confidence = max(confidence, (confidence + 1) / 2)
+        return RouteDecision(intent, confidence, "classifier", confidence >= self.threshold)
@@ -0,0 +1,112 @@
+import math
+import re
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+_STOPWORDS = frozenset(
+    "a an and are as at be by do does for from has have i in is it its me my of on or "
+    "our so that the their them they this to was we what when where which who will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cases text and splits it into word tokens, dropping common stopwords."""
+    return [token for token in _TOKEN_PATTERN.findall(text.lower()) if token not in _STOPWORDS]
+
+
+class BM25Index:
+    """
+    An incrementally maintained BM25 inverted index over one user's memories.
+
+    Documents can be added, replaced and removed one at a time; scores are
+    computed from the postings of the query terms only, so a lookup never
+    touches documents that share no term with the query.
+    """
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._doc_lengths: Dict[str, int] = {}
+        self._doc_terms: Dict[str, List[str]] = {}
+        self._payloads: Dict[str, Dict[str, str]] = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+        # When the index was created (time.monotonic()), so callers can rebuild it after a while.
+        self.created_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+
+    def add(self, doc_id: str, text: str, payload: Optional[Dict[str, str]] = None) -> None:
+        """Indexes a document, replacing any previous version with the same id."""
+        terms = Counter(tokenize(text))
+        with self._lock:
+            self.remove(doc_id)
+            for term, frequency in terms.items():
+                self._postings.setdefault(term, {})[doc_id] = frequency
+            length = sum(terms.values())
+            self._doc_terms[doc_id] = list(terms)
+            self._doc_lengths[doc_id] = length
+            self._total_length += length
+            self._payloads[doc_id] = payload if payload is not None else {"content": text}
+
+    def add_many(self, documents: Iterable[Tuple[str, str, Dict[str, str]]]) -> None:
+        with self._lock:
+            for doc_id, text, payload in documents:
+                self.add(doc_id, text, payload)
+
+    def remove(self, doc_id: str) -> None:
+        with self._lock:
+            length = self._doc_lengths.pop(doc_id, None)
+            if length is None:
+                return
+            self._total_length -= length
+            self._payloads.pop(doc_id, None)
+            for term in self._doc_terms.pop(doc_id, []):
+                postings = self._postings[term]
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def payload(self, doc_id: str) -> Optional[Dict[str, str]]:
+        return self._payloads.get(doc_id)
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """
+        Returns up to k (doc_id, score) pairs ranked by BM25, best first.
+        Documents sharing no term with the query are never returned.
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            doc_count = len(self._doc_lengths)
+            if not terms or not doc_count:
+                return []
+            average_length = self._total_length / doc_count
+            scores: Dict[str, float] = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, frequency in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / average_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int, constant: int = 60) -> List[str]:
+    """
+    Merges several ranked id lists into one using reciprocal rank fusion.
+    Args:
+        rankings (List[List[str]]): Ranked ids from each retriever, best first.
+        k (int): Number of ids to return.
+        constant (int): Damping constant; 60 is the value from the original RRF paper.
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (constant + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)[:k]
@@ -0,0 +1,98 @@
+import hashlib
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+@lru_cache(maxsize=200_000)
+def _feature_hash(feature: str) -> int:
+    # Python's built-in hash() is salted per process; blake2b keeps vectors stable across runs.
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _features(text: str, char_ngrams: tuple) -> List[str]:
+    words = _TOKEN_PATTERN.findall(text.lower())
+    features = [f"w:{word}" for word in words]
+    features.extend(f"b:{first} {second}" for first, second in zip(words, words[1:]))
+    for word in words:
+        padded = f"<{word}>"
+        for n in char_ngrams:
+            features.extend(f"c:{padded[i:i + n]}" for i in range(len(padded) - n + 1))
+    return features
+
+
+def _embed_batch(texts: List[str], dimensions: int, char_ngrams: tuple) -> np.ndarray:
+    """Embeds texts into an (n, dimensions) float32 matrix of L2-normalised hashed features."""
+    matrix = np.zeros((len(texts), dimensions), dtype=np.float32)
+    for row, text in enumerate(texts):
+        features = _features(text, char_ngrams)
+        if not features:
+            continue
+        hashes = np.fromiter((_feature_hash(f) for f in features), dtype=np.uint64, count=len(features))
+        indices = (hashes % np.uint64(dimensions)).astype(np.intp)
+        # The top hash bit picks a sign so collisions tend to cancel rather than accumulate.
+        signs = np.where(hashes >> np.uint64(63), -1.0, 1.0).astype(np.float32)
+        counts = np.bincount(indices, weights=signs, minlength=dimensions)
+        # Sublinear term frequency keeps repeated words from dominating the vector.
+        matrix[row] = np.sign(counts) * np.log1p(np.abs(counts))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    A fully offline embedder based on hashed word, word-bigram and character n-gram features.
+
+    Vectors are deterministic across processes and machines, so it doubles as a fake
+    embedder for tests and benchmarks. Large batches are split across a process pool.
+    """
+    def __init__(self, dimensions: int = 768, char_ngrams: tuple = (3, 4),
+                 max_workers: Optional[int] = None, parallel_threshold: int = 2048):
+        """
+        Args:
+            dimensions (int): Size of the output vectors.
+            char_ngrams (tuple): Character n-gram lengths hashed for each word.
+            max_workers (int): Size of the process pool used for large batches. Defaults to the CPU count.
+            parallel_threshold (int): Batches at least this large are embedded in parallel.
+        """
+        self.dimensions = dimensions
+        self.char_ngrams = tuple(char_ngrams)
+        self.model = f"hashing-{dimensions}"
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.parallel_threshold = parallel_threshold
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        """Embeds texts and returns them as an (n, dimensions) float32 array."""
+        if len(texts) < self.parallel_threshold or self.max_workers < 2:
+            return _embed_batch(texts, self.dimensions, self.char_ngrams)
+        if self._pool is None:
+            # Spawned, not forked: the parent runs Chroma, write-behind and maintenance threads,
+            # and a child forked while one of them holds a lock can deadlock.
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        chunk_size = -(-len(texts) // self.max_workers)
+        chunks = [texts[start:start + chunk_size] for start in range(0, len(texts), chunk_size)]
+        results = self._pool.map(_embed_batch, chunks, [self.dimensions] * len(chunks),
+                                 [self.char_ngrams] * len(chunks))
+        return np.vstack(list(results))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return _embed_batch([text], self.dimensions, self.char_ngrams)[0].tolist()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_pool"] = None
+        return state
@@ -1,41 +1,353 @@
+import asyncio
+import atexit
+import functools
+import hashlib
+import math
 import os
-from langchain_core.tools import tool
-from langchain_community.vectorstores import Chroma
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_core.documents import Document
-from typing import List, Dict
-from pydantic import BaseModel, Field
-from langchain.tools import StructuredTool, Tool
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, List, Dict, Iterable, Iterator, Optional, Set, Tuple
+import numpy as np
+from embedders import BACKEND_GOOGLE, BACKEND_LOCAL, DEFAULT_MODELS, create_embeddings
+from query_cache import query_cache
+from hot_tier import hot_tier, rescore
+from mmap_store import MappedUserVectors, write_vector_file
+from lexical_index import BM25Index, reciprocal_rank_fusion
+from metrics import ITEMS_TOTAL, OPERATION_SECONDS, PREFETCH_TOTAL, QUERY_CACHE_TOTAL, SEARCH_SOURCE_TOTAL, metrics
+from registry import embedder_registry, lexical_index_registry, vector_file_registry, vector_store_registry
+from write_behind import WriteBehindQueue, DURABILITY_GROUP
+from structured_logging import get_logger
+
+# Chroma (and chromadb behind it), LangChain's Embeddings and tool classes (and langsmith
+# behind them) take over a second to import, so they are imported on first use rather
+# than when this module loads.
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import Chroma
+    from langchain_core.embeddings import Embeddings
 
 # Load environment variables from .env file
 from dotenv import load_dotenv
 load_dotenv()
 
-# Get Google API Key from environment variables
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if not GOOGLE_API_KEY:
-    raise ValueError("GOOGLE_API_KEY not found in environment variables. Please set it in a .env file.")
+logger = get_logger(__name__)
+
+PERSIST_DIRECTORY = "./chroma_db_data"
+# Embedding backend ("google" or "local") and model, selected by configuration.
+# Vectors from different backends are not comparable, so switching backends needs
+# a fresh persist directory or collection.
+EMBEDDING_BACKEND = os.getenv("MEMORY_EMBEDDING_BACKEND", BACKEND_GOOGLE)
+EMBEDDING_MODEL = os.getenv("MEMORY_EMBEDDING_MODEL") or DEFAULT_MODELS.get(EMBEDDING_BACKEND, "")
+EMBEDDING_CACHE_PATH = os.path.join(PERSIST_DIRECTORY, "embedding_cache.sqlite3")
+# Memory-mapped per-user vector files exported for read-mostly serving.
+VECTOR_FILE_DIRECTORY = os.path.join(PERSIST_DIRECTORY, "vectors")
+# The Gemini embedding API accepts at most 100 texts per batch request; the local
+# embedder takes large batches so they can be spread over its process pool.
+EMBEDDING_BATCH_SIZE = 100 if EMBEDDING_BACKEND == BACKEND_GOOGLE else 4096
+# How memories are spread over collections: one shared collection, one collection
+# per user, or a fixed number of hash buckets of users.
+PARTITION_SHARED = "shared"
+PARTITION_USER = "user"
+PARTITION_BUCKET = "bucket"
+PARTITION_MODES = (PARTITION_SHARED, PARTITION_USER, PARTITION_BUCKET)
+DEFAULT_NUM_BUCKETS = 64
+# What to do with a new memory that nearly duplicates an existing one.
+DEDUP_OFF = "off"
+DEDUP_SKIP = "skip"
+DEDUP_UPDATE = "update"
+DEDUP_MERGE = "merge"
+DEDUP_MODES = (DEDUP_OFF, DEDUP_SKIP, DEDUP_UPDATE, DEDUP_MERGE)
+# How retrieve_memories ranks memories: embedding similarity, BM25 over exact terms
+# (no embedding call), or both merged with reciprocal rank fusion.
+RETRIEVAL_VECTOR = "vector"
+RETRIEVAL_LEXICAL = "lexical"
+RETRIEVAL_HYBRID = "hybrid"
+RETRIEVAL_MODES = (RETRIEVAL_VECTOR, RETRIEVAL_LEXICAL, RETRIEVAL_HYBRID)
+# In hybrid mode each retriever contributes this many times k candidates to the fusion.
+HYBRID_CANDIDATE_FACTOR = 4
+# With a quantized hot tier, this many times k candidates are rescored at full precision.
+RESCORE_FACTOR = 4
+# Number of memories fetched per round trip when paging through a user's memories.
+DEFAULT_PAGE_SIZE = 200
+# Fields a MemoryRecord can carry; pass a subset to avoid fetching the rest.
+MEMORY_FIELDS = ("content", "context")
+# Number of documents deleted per round trip when clearing a user's memories.
+CLEAR_BATCH_SIZE = 500
+# Maximum number of blocking Chroma calls run concurrently on behalf of async callers.
+CHROMA_EXECUTOR_WORKERS = 8
+# Maximum number of speculative retrievals (see MemoryStore.prefetch_memories) running at once.
+PREFETCH_WORKERS = 4
+# Outcomes of a speculative retrieval.
+PREFETCH_USED = "used"
+PREFETCH_STALE = "stale"
+PREFETCH_WASTED = "wasted"
+PREFETCH_CANCELLED = "cancelled"
+PREFETCH_FAILED = "failed"
+# Per-user limits applied by MemoryStore.evict_memories; unset (0) means unbounded.
+DEFAULT_MAX_MEMORIES = int(os.getenv("MEMORY_MAX_PER_USER", "0")) or None
+DEFAULT_TTL_S = float(os.getenv("MEMORY_TTL_DAYS", "0")) * 24 * 3600 or None
+# Importance of a memory is in [0, 1]; memories at PINNED_IMPORTANCE are never evicted.
+DEFAULT_IMPORTANCE = 0.5
+PINNED_IMPORTANCE = 1.0
+# Capacity eviction removes memories down to this fraction of the limit, so it does not run on every save.
+EVICTION_TARGET_RATIO = 0.9
+# How often, at most, a store with a TTL checks for expired memories after a write.
+EVICTION_SWEEP_INTERVAL_S = 60.0
+# The recency part of a memory's value halves for every this many seconds it goes unretrieved.
+ACCESS_HALF_LIFE_S = 7 * 24 * 3600
+# Retrieval access times are buffered and written to Chroma in batches of up to this many
+# memories, and at least this often while retrievals keep coming.
+ACCESS_FLUSH_BATCH = 256
+ACCESS_FLUSH_INTERVAL_S = 5.0
+
+def build_embeddings(use_cache: bool = True) -> "Embeddings":
+    """
+    Builds the configured embedding function used by the vector store.
+    Args:
+        use_cache (bool): Whether to put the two-level embedding cache in front of the model.
+                          The local backend is cheaper to run than to cache, so it is never cached.
+    """
+    embeddings = create_embeddings(EMBEDDING_BACKEND, EMBEDDING_MODEL)
+    if not use_cache or EMBEDDING_BACKEND == BACKEND_LOCAL:
+        return embeddings
+    from embedding_cache import CachedEmbeddings
+
+    return CachedEmbeddings(embeddings, cache_path=EMBEDDING_CACHE_PATH)
+
+def get_embeddings(use_cache: bool = True) -> "Embeddings":
+    """Returns the process-wide shared embedding function, building it on first use."""
+    return embedder_registry.get((EMBEDDING_BACKEND, EMBEDDING_MODEL, use_cache), lambda: build_embeddings(use_cache=use_cache))
+
+def get_vector_store(collection_name: str = "user_memories", use_cache: bool = True) -> "Chroma":
+    """
+    Returns the process-wide shared Chroma handle for a collection, opening it on first use.
+    Args:
+        collection_name (str): The name of the ChromaDB collection.
+        use_cache (bool): Whether the handle's embedding function goes through the embedding cache.
+    """
+    def open_vector_store() -> "Chroma":
+        from langchain_community.vectorstores import Chroma
+
+        os.makedirs(PERSIST_DIRECTORY, exist_ok=True)
+        return Chroma(
+            collection_name=collection_name,
+            embedding_function=get_embeddings(use_cache=use_cache),
+            persist_directory=PERSIST_DIRECTORY
+        )
+    return vector_store_registry.get(vector_store_key(collection_name, use_cache), open_vector_store)
+
+def vector_store_key(collection_name: str, use_cache: bool = True) -> Tuple[str, str, str, bool]:
+    """The vector_store_registry key of a collection's shared Chroma handle."""
+    return (PERSIST_DIRECTORY, collection_name, EMBEDDING_MODEL, use_cache)
+
+def warm_up(collection_name: str = "user_memories", background: bool = True) -> Optional[threading.Thread]:
+    """
+    Imports Chroma and opens the shared embedder and vector store before the first request needs them.
+    Args:
+        collection_name (str): The collection to open.
+        background (bool): Whether to warm up on a daemon thread and return immediately.
+    Returns:
+        threading.Thread: The warm-up thread when background is True, otherwise None.
+    """
+    def run() -> None:
+        try:
+            with metrics.timer(OPERATION_SECONDS, operation="warm_up", collection=collection_name):
+                get_vector_store(collection_name)
+        except Exception:
+            logger.exception("Warm-up failed", extra={"collection": collection_name})
+    if not background:
+        run()
+        return None
+    thread = threading.Thread(target=run, name="memory-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+_IMPORTANT_FACT = re.compile(
+    r"\b(name|birthday|born|allerg\w*|address|wife|husband|partner|son|daughter|mother|mom|father|dad|"
+    r"sister|brother|job|work|live|lives|medical|diabetic|pregnant|vegan|vegetarian)\b", re.IGNORECASE)
+_EMPHASIS = re.compile(r"\b(remember|important|never forget|always|never)\b", re.IGNORECASE)
+
+def score_importance(content: str, context: str = "") -> float:
+    """
+    Default importance of a new memory, from its text alone: identity, family, health and
+    home facts outrank passing preferences, and explicit emphasis adds a little more.
+    """
+    score = DEFAULT_IMPORTANCE
+    if _IMPORTANT_FACT.search(content):
+        score += 0.3
+    if _EMPHASIS.search(content) or _EMPHASIS.search(context):
+        score += 0.1
+    return min(score, 0.95)
+
+def memory_value(metadata: Dict[str, object], now: float) -> float:
+    """How much a memory is worth keeping: its importance plus a recency bonus that decays with idle time."""
+    idle = max(0.0, now - float(metadata.get("last_accessed_at") or now))
+    return float(metadata.get("importance", DEFAULT_IMPORTANCE)) + 0.5 ** (idle / ACCESS_HALF_LIFE_S)
+
+def _cosine_similarity(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+def vector_file_path(user_id: str, collection_name: str = "user_memories") -> str:
+    """Returns where a user's memory-mapped vector file lives."""
+    digest = hashlib.sha1(user_id.encode("utf-8")).hexdigest()
+    return os.path.join(VECTOR_FILE_DIRECTORY, f"{collection_name}__{digest}.memvec")
+
+def invalidate_vector_file(user_id: str, collection_name: str = "user_memories") -> None:
+    """Removes a user's exported vector file after a write so it is never served stale."""
+    path = vector_file_path(user_id, collection_name)
+    vector_file_registry.discard(path)
+    if os.path.exists(path):
+        os.remove(path)
+
+def _invalidate_user_caches(user_id: str, collection_name: str) -> None:
+    """Drops this process's cached results, indexes and vectors for a user's memories in a collection."""
+    scope = (collection_name, user_id)
+    query_cache.bump(scope)
+    lexical_index_registry.discard(scope)
+    hot_tier.discard(scope)
+    invalidate_vector_file(user_id, collection_name)
+
+def _fuse(vector_hits: List[Tuple[str, Dict[str, str]]], lexical_hits: List[Tuple[str, Dict[str, str]]],
+          k: int) -> List[Tuple[str, Dict[str, str]]]:
+    """Merges vector and lexical (id, memory) hits with reciprocal rank fusion."""
+    memories = dict(lexical_hits)
+    memories.update(vector_hits)
+    ranking = reciprocal_rank_fusion([[doc_id for doc_id, _ in vector_hits], [doc_id for doc_id, _ in lexical_hits]], k)
+    return [(doc_id, memories[doc_id]) for doc_id in ranking]
+
+class MemoryRecord:
+    """A compact, read-only view of one stored memory."""
+    __slots__ = ("id", "content", "context")
+
+    def __init__(self, id: str, content: Optional[str], context: Optional[str]):
+        self.id = id
+        self.content = content
+        self.context = context
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"content": self.content, "context": self.context}
+
+    def __repr__(self) -> str:
+        return f"MemoryRecord(id={self.id!r}, content={self.content!r}, context={self.context!r})"
+
+def partition_collection_name(user_id: str, collection_name: str = "user_memories",
+                              partitioning: str = PARTITION_SHARED, num_buckets: int = DEFAULT_NUM_BUCKETS) -> str:
+    """
+    Returns the ChromaDB collection that holds a user's memories under a partitioning mode.
+    Args:
+        user_id (str): The unique identifier for the user.
+        collection_name (str): The base collection name.
+        partitioning (str): "shared", "user" or "bucket".
+        num_buckets (int): Number of hash buckets in "bucket" mode.
+    """
+    if partitioning not in PARTITION_MODES:
+        raise ValueError(f"Unknown partitioning mode '{partitioning}'. Expected one of {PARTITION_MODES}.")
+    if partitioning == PARTITION_SHARED:
+        return collection_name
+    # Hash the user id so the name is always a valid Chroma collection name.
+    digest = hashlib.sha1(user_id.encode("utf-8")).hexdigest()
+    if partitioning == PARTITION_USER:
+        return f"{collection_name}_u_{digest[:16]}"
+    return f"{collection_name}_b_{int(digest, 16) % num_buckets:04d}"
 
 class MemoryStore:
     """Manages storing and retrieving memories for the AI agent."""
-    def __init__(self, user_id: str, collection_name: str = "user_memories"):
+    def __init__(self, user_id: str, collection_name: str = "user_memories", use_embedding_cache: bool = True,
+                 write_behind: bool = False, durability: str = DURABILITY_GROUP, flush_interval_ms: int = 50,
+                 partitioning: str = PARTITION_SHARED, num_buckets: int = DEFAULT_NUM_BUCKETS,
+                 use_query_cache: bool = True, dedup: str = DEDUP_OFF, dedup_threshold: float = 0.95,
+                 retrieval_mode: str = RETRIEVAL_VECTOR, use_hot_tier: bool = True,
+                 serve_from_vector_file: bool = False, max_memories: Optional[int] = DEFAULT_MAX_MEMORIES,
+                 ttl_s: Optional[float] = DEFAULT_TTL_S,
+                 importance_fn: Callable[[str, str], float] = score_importance):
         """
         Initializes the MemoryStore for a specific user.
         Args:
             user_id (str): The unique identifier for the user.
             collection_name (str): The name of the ChromaDB collection to use.
                                    This helps organize memories if you have multiple types.
+            use_embedding_cache (bool): Whether to cache embeddings in memory and on disk so
+                                        repeated texts are not sent to the embedding API again.
+            write_behind (bool): Whether saves are queued and written by a background thread
+                                 instead of blocking the caller.
+            durability (str): When queued writes are persisted: "always" (every write),
+                              "group" (every flush_interval_ms) or "shutdown" (on flush/close only).
+            flush_interval_ms (int): How long the background writer coalesces writes into one batch.
+            partitioning (str): "shared" keeps every user in collection_name, "user" gives each user
+                                their own collection and "bucket" spreads users over num_buckets
+                                collections, so searches only scan one user's (or bucket's) vectors.
+            num_buckets (int): Number of hash buckets in "bucket" mode.
+            use_query_cache (bool): Whether repeated retrievals are answered from the shared
+                                    result cache until this user's memories change.
+            dedup (str): What to do when a new memory is a near-duplicate of the user's nearest
+                         existing memory: "off", "skip" it, "update" the existing memory with it,
+                         or "merge" the two.
+            dedup_threshold (float): Cosine similarity at or above which memories are near-duplicates.
+            retrieval_mode (str): Default ranking for retrieve_memories: "vector", "lexical" or "hybrid".
+            use_hot_tier (bool): Whether vector searches for active users with few enough memories
+                                 are answered by exact search over an in-process NumPy matrix.
+            serve_from_vector_file (bool): Whether searches and scans for users outside the hot tier
+                                           are served from their memory-mapped vector file (see
+                                           export_vector_file) when one exists.
+            max_memories (int): Most memories the user may keep. Once exceeded, the lowest-value
+                                memories (see memory_value) are evicted in the background. None is unbounded.
+            ttl_s (float): Memories not retrieved (or saved) for this many seconds are evicted. None keeps them.
+            importance_fn (Callable[[str, str], float]): Scores a new memory's (content, context) in [0, 1].
         """
+        if dedup not in DEDUP_MODES:
+            raise ValueError(f"Unknown dedup mode '{dedup}'. Expected one of {DEDUP_MODES}.")
+        if retrieval_mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode '{retrieval_mode}'. Expected one of {RETRIEVAL_MODES}.")
         self.user_id = user_id
-        self.embeddings = GoogleGenerativeAIEmbeddings(model="text-embedding-004", google_api_key=GOOGLE_API_KEY)
-        self.vector_store = Chroma(
-            collection_name=collection_name,
-            embedding_function=self.embeddings,
-            persist_directory="./chroma_db_data"
-        )
-        os.makedirs("./chroma_db_data", exist_ok=True)
-        print(f"MemoryStore initialized for user: {user_id} using collection: {collection_name}")
+        self.use_query_cache = use_query_cache
+        self.dedup = dedup
+        self.dedup_threshold = dedup_threshold
+        self.retrieval_mode = retrieval_mode
+        self.use_hot_tier = use_hot_tier
+        self.serve_from_vector_file = serve_from_vector_file
+        self.max_memories = max_memories
+        self.ttl_s = ttl_s
+        self.importance_fn = importance_fn
+        self._last_eviction_sweep = 0.0
+        self.partitioning = partitioning
+        self.collection_name = partition_collection_name(user_id, collection_name, partitioning, num_buckets)
+        # Metrics name the base collection: per-user collection names would be an unbounded label.
+        self.metric_labels = {"collection": collection_name, "partitioning": partitioning}
+        # A per-user collection only holds this user's vectors, so searches need no metadata filter.
+        self._search_filter = None if partitioning == PARTITION_USER else {"user_id": user_id}
+        self._cache_scope = (self.collection_name, user_id)
+        self.use_embedding_cache = use_embedding_cache
+        self._writer = None
+        if write_behind:
+            self._writer = WriteBehindQueue(
+                write_fn=lambda contents, contexts: self._write_memories(contents, contexts, persist=False),
+                persist_fn=self._persist,
+                durability=durability,
+                batch_size=EMBEDDING_BATCH_SIZE,
+                flush_interval_ms=flush_interval_ms,
+            )
+        logger.debug("MemoryStore initialized", extra={"user_id": user_id, "collection": self.collection_name})
 
+    @property
+    def embeddings(self) -> "Embeddings":
+        """The shared embedding function, built on first use."""
+        return get_embeddings(use_cache=self.use_embedding_cache)
+
+    @property
+    def vector_store(self) -> "Chroma":
+        """The shared Chroma handle for this store's collection."""
+        return get_vector_store(self.collection_name, use_cache=self.use_embedding_cache)
+
+    @property
+    def generation(self) -> int:
+        """This user's write generation. It changes whenever their memories are saved, updated or cleared."""
+        self._wait_for_writes()
+        return query_cache.generation(self._cache_scope)
 
     def save_memory(self, content: str, context: str = "") -> None:
         """
@@ -44,59 +356,984 @@ class MemoryStore:
             content (str): The main information to be stored.
             context (str): Additional context related to the memory.
         """
-        doc = Document(page_content=content, metadata={"user_id": self.user_id, "context": context})
-        print(f"Saving memory for user {self.user_id}: '{content}' (Context: '{context}')")
-        self.vector_store.add_documents([doc])
-        self.vector_store.persist()
-        print("Memory saved and persisted.")
+        logger.debug("Saving memory", extra={"user_id": self.user_id, "collection": self.collection_name,
+                                             "queued": self._writer is not None})
+        if self._writer is not None:
+            self._writer.enqueue(content, context)
+            return
+        self._write_memories([content], [context])
+
+    def save_memories(self, memories: Iterable[Tuple[str, str]]) -> int:
+        """
+        Saves many memories for the current user with batched embedding and a single persist.
+        Args:
+            memories (Iterable[Tuple[str, str]]): (content, context) pairs to be stored.
+        Returns:
+            int: The number of memories saved.
+        """
+        memories = list(memories)
+        if not memories:
+            return 0
+        logger.debug("Saving memories", extra={"user_id": self.user_id, "collection": self.collection_name,
+                                               "count": len(memories), "queued": self._writer is not None})
+        if self._writer is not None:
+            for content, context in memories:
+                self._writer.enqueue(content, context)
+            return len(memories)
+        return len(self._write_memories([content for content, _ in memories], [context for _, context in memories]))
 
-    def retrieve_memories(self, query: str, k: int = 3) -> List[Dict[str, str]]:
+    def replace_memories(self, ids: List[str], content: str, context: str,
+                         embedding: Optional[List[float]] = None) -> Optional[str]:
+        """
+        Replaces several of the current user's memories with a single one.
+        This is not atomic: the first id is updated in place and the rest are deleted afterwards,
+        so an interrupted replace can leave a redundant original behind but never loses the
+        merged memory, and a reader in between may briefly see both.
+        Args:
+            ids (List[str]): The memories to replace; the first one keeps its id.
+            content (str): The replacement memory's text.
+            context (str): The replacement memory's context.
+            embedding (List[float]): The embedding of content, if already known.
+        Returns:
+            Optional[str]: The id of the replacement memory, or None if any of ids no longer exists
+                           (e.g. it was deleted concurrently), in which case nothing is changed.
+        """
+        if not ids:
+            return None
+        self._wait_for_writes()
+        collection = self.vector_store._collection
+        existing = collection.get(ids=list(ids), include=["metadatas"])
+        if len(existing["ids"]) != len(set(ids)) or \
+                any((metadata or {}).get("user_id") != self.user_id for metadata in existing["metadatas"]):
+            return None
+        if embedding is None:
+            embedding = self._embed_contents([content])[0]
+        metadatas = [metadata or {} for metadata in existing["metadatas"]]
+        keep_metadata = dict(metadatas[existing["ids"].index(ids[0])])
+        # The replacement is as old, as recently used and as important as the most of its originals.
+        for key, combine in (("created_at", min), ("last_accessed_at", max), ("importance", max)):
+            values = [metadata[key] for metadata in metadatas if key in metadata]
+            if values:
+                keep_metadata[key] = combine(values)
+        with metrics.timer(OPERATION_SECONDS, operation="replace", **self.metric_labels):
+            collection.update(ids=[ids[0]], documents=[content], embeddings=[list(embedding)],
+                              metadatas=[{**keep_metadata, "user_id": self.user_id, "context": context}])
+            if len(ids) > 1:
+                access_log.discard(self.collection_name, ids[1:])
+                collection.delete(ids=list(ids[1:]))
+        self._persist()
+        query_cache.bump(self._cache_scope)
+        # The hot tier cannot drop single vectors, so it reloads this user on next use.
+        hot_tier.discard(self._cache_scope)
+        index = lexical_index_registry.peek(self._cache_scope)
+        if index is not None:
+            for doc_id in ids[1:]:
+                index.remove(doc_id)
+            index.add(ids[0], content, {"content": content, "context": context})
+        invalidate_vector_file(self.user_id, self.collection_name)
+        return ids[0]
+
+    def evict_memories(self, now: Optional[float] = None) -> int:
+        """
+        Applies the store's TTL and capacity limits to the current user's memories.
+        Expired memories go first; if the user is still over max_memories, the lowest-value
+        memories (see memory_value) are evicted until EVICTION_TARGET_RATIO of the limit is left.
+        Pinned memories are never evicted. Memories saved before access times were tracked
+        are stamped as new on their first pass.
+        Args:
+            now (float): The current Unix time; defaults to time.time().
+        Returns:
+            int: The number of memories evicted.
+        """
+        now = time.time() if now is None else now
+        self._wait_for_writes()
+        # Pending access times decide what survives, so they are written first.
+        access_log.flush()
+        collection = self.vector_store._collection
+        with metrics.timer(OPERATION_SECONDS, operation="evict", **self.metric_labels):
+            ids, metadatas = [], []
+            while True:
+                page = collection.get(where={"user_id": self.user_id}, limit=DEFAULT_PAGE_SIZE, offset=len(ids),
+                                      include=["metadatas"])
+                if not page["ids"]:
+                    break
+                ids.extend(page["ids"])
+                metadatas.extend(metadata or {} for metadata in page["metadatas"])
+            unstamped = [i for i, metadata in enumerate(metadatas) if "last_accessed_at" not in metadata]
+            stamp = {"created_at": now, "last_accessed_at": now}
+            for start in range(0, len(unstamped), CLEAR_BATCH_SIZE):
+                batch = unstamped[start:start + CLEAR_BATCH_SIZE]
+                collection.update(ids=[ids[i] for i in batch], metadatas=[stamp] * len(batch))
+            for i in unstamped:
+                metadatas[i] = {**metadatas[i], **stamp}
+
+            evictable = [i for i, metadata in enumerate(metadatas)
+                         if float(metadata.get("importance", DEFAULT_IMPORTANCE)) < PINNED_IMPORTANCE]
+            expired = []
+            if self.ttl_s is not None:
+                expired = [i for i in evictable if now - float(metadatas[i]["last_accessed_at"]) > self.ttl_s]
+            over_capacity = []
+            remaining = len(ids) - len(expired)
+            if self.max_memories is not None and remaining > self.max_memories:
+                expired_set = set(expired)
+                candidates = sorted((i for i in evictable if i not in expired_set),
+                                    key=lambda i: memory_value(metadatas[i], now))
+                over_capacity = candidates[:remaining - int(self.max_memories * EVICTION_TARGET_RATIO)]
+            evicted = [ids[i] for i in expired + over_capacity]
+            self._delete_memories(evicted)
+        metrics.inc(ITEMS_TOTAL, len(expired), stage="evict_ttl", **self.metric_labels)
+        metrics.inc(ITEMS_TOTAL, len(over_capacity), stage="evict_capacity", **self.metric_labels)
+        if evicted:
+            logger.info("Evicted memories", extra={"user_id": self.user_id, "collection": self.collection_name,
+                                                   "expired": len(expired), "over_capacity": len(over_capacity),
+                                                   "remaining": len(ids) - len(evicted)})
+        return len(evicted)
+
+    def set_importance(self, ids: List[str], importance: float) -> None:
+        """
+        Sets the importance of some of the current user's memories, e.g. PINNED_IMPORTANCE to exempt them from eviction.
+        Args:
+            ids (List[str]): The memories to update; ids of other users' memories are ignored.
+            importance (float): The new importance, in [0, 1].
+        """
+        collection = self.vector_store._collection
+        existing = collection.get(ids=list(ids), include=["metadatas"])
+        owned = [doc_id for doc_id, metadata in zip(existing["ids"], existing["metadatas"])
+                 if (metadata or {}).get("user_id") == self.user_id]
+        if owned:
+            collection.update(ids=owned, metadatas=[{"importance": float(importance)}] * len(owned))
+            self._persist()
+
+    def _delete_memories(self, ids: List[str]) -> None:
+        """Deletes some of the current user's memories in batches and invalidates every derived copy."""
+        if not ids:
+            return
+        access_log.discard(self.collection_name, ids)
+        collection = self.vector_store._collection
+        with metrics.timer(OPERATION_SECONDS, operation="delete", **self.metric_labels):
+            for start in range(0, len(ids), CLEAR_BATCH_SIZE):
+                collection.delete(ids=ids[start:start + CLEAR_BATCH_SIZE])
+        self._persist()
+        query_cache.bump(self._cache_scope)
+        hot_tier.discard(self._cache_scope)
+        index = lexical_index_registry.peek(self._cache_scope)
+        if index is not None:
+            for doc_id in ids:
+                index.remove(doc_id)
+        invalidate_vector_file(self.user_id, self.collection_name)
+
+    def _schedule_eviction(self) -> None:
+        """After a write, checks the user's limits on the maintenance thread if they may have been exceeded."""
+        if self.max_memories is None and self.ttl_s is None:
+            return
+        sweep = self.ttl_s is not None and time.monotonic() - self._last_eviction_sweep >= EVICTION_SWEEP_INTERVAL_S
+        if self.max_memories is None and not sweep:
+            return
+        with _scheduled_evictions_lock:
+            if self._cache_scope in _scheduled_evictions:
+                return
+            _scheduled_evictions.add(self._cache_scope)
+        if sweep:
+            self._last_eviction_sweep = time.monotonic()
+        _maintenance_executor.submit(self._run_scheduled_eviction, sweep)
+
+    def _run_scheduled_eviction(self, sweep: bool) -> None:
+        with _scheduled_evictions_lock:
+            _scheduled_evictions.discard(self._cache_scope)
+        try:
+            if sweep or self.count_memories() > self.max_memories:
+                self.evict_memories()
+        except Exception:
+            logger.exception("Error evicting memories", extra={"user_id": self.user_id,
+                                                               "collection": self.collection_name})
+
+    def flush(self) -> None:
+        """Blocks until every queued memory has been written and persisted. No-op without write-behind."""
+        if self._writer is not None:
+            self._writer.flush()
+
+    def close(self) -> None:
+        """Writes and persists every queued memory and stops the background writer."""
+        if self._writer is not None:
+            self._writer.close()
+
+    def _wait_for_writes(self) -> None:
+        """Makes this user's queued writes visible to reads (read-your-writes)."""
+        # The writer thread itself reads while writing (e.g. the dedup check); waiting there would deadlock.
+        if self._writer is not None and self._writer.pending and not self._writer.on_worker_thread():
+            self._writer.flush(persist=False)
+
+    def _write_memories(self, contents: List[str], contexts: List[str], persist: bool = True) -> List[str]:
+        """
+        Embeds the given contents in provider-sized batches, writes them to the collection
+        and persists once (unless persist is False).
+        Returns:
+            List[str]: The ids of the stored documents.
+        """
+        return self._store_embedded(contents, contexts, self._embed_contents(contents), persist=persist)
+
+    def _embed_contents(self, contents: List[str]) -> List[List[float]]:
+        """Embeds contents in batches no larger than the provider's limit."""
+        embeddings = []
+        with metrics.timer(OPERATION_SECONDS, operation="embed", **self.metric_labels):
+            for start in range(0, len(contents), EMBEDDING_BATCH_SIZE):
+                embeddings.extend(self.embeddings.embed_documents(contents[start:start + EMBEDDING_BATCH_SIZE]))
+        metrics.inc(ITEMS_TOTAL, len(contents), stage="embed", **self.metric_labels)
+        return embeddings
+
+    def _embed_query(self, query: str) -> List[float]:
+        with metrics.timer(OPERATION_SECONDS, operation="embed_query", **self.metric_labels):
+            return self.embeddings.embed_query(query)
+
+    def _persist(self) -> None:
+        with metrics.timer(OPERATION_SECONDS, operation="persist", **self.metric_labels):
+            self.vector_store.persist()
+
+    def _store_embedded(self, contents: List[str], contexts: List[str], embeddings: List[List[float]],
+                        persist: bool = True) -> List[str]:
+        """
+        Writes already-embedded contents to the collection and optionally persists.
+        Returns:
+            List[str]: The ids of the added (or, when deduplicating, updated) documents.
+        """
+        updated_ids: List[str] = []
+        if self.dedup != DEDUP_OFF:
+            contents, contexts, embeddings, updated_ids = self._suppress_duplicates(contents, contexts, embeddings)
+        ids = [str(uuid.uuid4()) for _ in contents]
+        now = time.time()
+        metadatas = [
+            {"user_id": self.user_id, "context": context, "created_at": now, "last_accessed_at": now,
+             "importance": float(self.importance_fn(content, context))}
+            for content, context in zip(contents, contexts)
+        ]
+        self._add_embedded(ids, contents, embeddings, metadatas)
+        if persist and (ids or updated_ids):
+            self._persist()
+        return updated_ids + ids
+
+    def _suppress_duplicates(self, contents: List[str], contexts: List[str], embeddings: List[List[float]]):
+        """
+        Compares each new memory with the user's nearest existing memory and with the memories
+        kept earlier in the same batch, reusing the embeddings already computed for the save,
+        and skips, updates or merges near-duplicates.
+        Returns:
+            The contents, contexts and embeddings that still need adding, and the ids of updated memories.
+        """
+        if not contents:
+            return contents, contexts, embeddings, []
+        # Queried directly rather than through count_memories: this runs on the write-behind
+        # thread too, and a user without memories just gets no neighbours back.
+        collection = self.vector_store._collection
+        nearest = collection.query(
+            query_embeddings=embeddings, n_results=1, where={"user_id": self.user_id},
+            include=["documents", "metadatas", "embeddings"],
+        )
+        # Unit rows, so similarity to every memory kept so far in the batch is one matrix product.
+        rows = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(rows, axis=1, keepdims=True)
+        rows = np.divide(rows, norms, out=np.zeros_like(rows), where=norms > 0)
+        keep_contents, keep_contexts, keep_embeddings, updated_ids = [], [], [], []
+        keep_rows: List[int] = []  # the batch row each kept memory's embedding came from
+        for i, (content, context, embedding) in enumerate(zip(contents, contexts, embeddings)):
+            if keep_rows:
+                similarities = rows[keep_rows] @ rows[i]
+                j = int(np.argmax(similarities))
+                if similarities[j] >= self.dedup_threshold:
+                    if self.dedup != DEDUP_SKIP:
+                        keep_contents[j], keep_contexts[j], keep_embeddings[j] = self._combine_duplicates(
+                            content, context, embedding, keep_contents[j], keep_contexts[j], keep_embeddings[j])
+                        if keep_embeddings[j] is embedding:
+                            keep_rows[j] = i
+                    continue
+            if not nearest["ids"][i]:
+                keep_contents.append(content)
+                keep_contexts.append(context)
+                keep_embeddings.append(embedding)
+                keep_rows.append(i)
+                continue
+            existing_id = nearest["ids"][i][0]
+            existing_content = nearest["documents"][i][0]
+            existing_metadata = nearest["metadatas"][i][0] or {}
+            existing_embedding = nearest["embeddings"][i][0]
+            if _cosine_similarity(embedding, existing_embedding) < self.dedup_threshold:
+                keep_contents.append(content)
+                keep_contexts.append(context)
+                keep_embeddings.append(embedding)
+                keep_rows.append(i)
+                continue
+
+            logger.debug("Near-duplicate memory", extra={"user_id": self.user_id, "collection": self.collection_name,
+                                                         "existing_id": existing_id, "dedup": self.dedup})
+            if self.dedup == DEDUP_SKIP:
+                continue
+            new_content, new_context, new_embedding = self._combine_duplicates(
+                content, context, embedding, existing_content, existing_metadata.get("context", ""), existing_embedding)
+            collection.update(
+                ids=[existing_id],
+                documents=[new_content],
+                embeddings=[list(new_embedding)],
+                metadatas=[{**existing_metadata, "user_id": self.user_id, "context": new_context}],
+            )
+            updated_ids.append(existing_id)
+            payload = {"content": new_content, "context": new_context}
+            hot_tier.add(self._cache_scope, [existing_id], [new_embedding], [payload])
+            index = lexical_index_registry.peek(self._cache_scope)
+            if index is not None:
+                index.add(existing_id, new_content, payload)
+        if updated_ids:
+            query_cache.bump(self._cache_scope)
+            invalidate_vector_file(self.user_id, self.collection_name)
+        return keep_contents, keep_contexts, keep_embeddings, updated_ids
+
+    def _combine_duplicates(self, content: str, context: str, embedding: List[float], existing_content: str,
+                            existing_context: str, existing_embedding: List[float]) -> Tuple[str, str, List[float]]:
+        """Returns the (content, context, embedding) a new memory and its near-duplicate are stored as."""
+        if self.dedup == DEDUP_UPDATE:
+            return content, context, embedding
+        # Merge: keep the more detailed text (and its embedding) and both contexts.
+        if len(content) > len(existing_content):
+            new_content, new_embedding = content, embedding
+        else:
+            new_content, new_embedding = existing_content, existing_embedding
+        new_context = existing_context if context in (existing_context, "") else \
+            "; ".join(part for part in (existing_context, context) if part)
+        return new_content, new_context, new_embedding
+
+    def _add_embedded(self, ids: List[str], contents: List[str], embeddings: List[List[float]],
+                      metadatas: List[Dict[str, str]]) -> None:
+        """Adds pre-embedded documents, chunked to the Chroma client's maximum batch size."""
+        if not ids:
+            return
+        collection = self.vector_store._collection
+        batch_size = getattr(self.vector_store._client, "max_batch_size", None) or len(ids)
+        with metrics.timer(OPERATION_SECONDS, operation="add", **self.metric_labels):
+            for start in range(0, len(ids), batch_size):
+                end = start + batch_size
+                collection.add(
+                    ids=ids[start:end],
+                    documents=contents[start:end],
+                    embeddings=embeddings[start:end],
+                    metadatas=metadatas[start:end],
+                )
+        metrics.inc(ITEMS_TOTAL, len(ids), stage="add", **self.metric_labels)
+        query_cache.bump(self._cache_scope)
+        invalidate_vector_file(self.user_id, self.collection_name)
+        payloads = [
+            {"content": content, "context": metadata.get("context", "No context provided.")}
+            for content, metadata in zip(contents, metadatas)
+        ]
+        hot_tier.add(self._cache_scope, ids, embeddings, payloads)
+        index = lexical_index_registry.peek(self._cache_scope)
+        if index is not None:
+            index.add_many(zip(ids, contents, payloads))
+        self._schedule_eviction()
+
+    def retrieve_memories(self, query: str, k: int = 3, mode: Optional[str] = None) -> List[Dict[str, str]]:
         """
         Retrieves relevant memories based on a query for the current user.
         Args:
             query (str): The query string to search for relevant memories.
             k (int): The number of top relevant memories to retrieve.
+            mode (str): "vector", "lexical" or "hybrid". Defaults to the store's retrieval_mode.
         Returns:
             List[Dict[str, str]]: A list of dictionaries, each representing a retrieved memory.
         """
-        print(f"Retrieving memories for user {self.user_id} with query: '{query}'")
-        results = self.vector_store.similarity_search(query, k=k, filter={"user_id": self.user_id})
+        hits = self._retrieve_hits(query, k, mode or self.retrieval_mode)
+        self._record_access(hits)
+        return [memory for _, memory in hits]
 
-        memories = []
-        for doc in results:
-            memories.append({
-                "content": doc.page_content,
-                "context": doc.metadata.get("context", "No context provided.")
-            })
-        print(f"Retrieved {len(memories)} memories.")
-        return memories
+    def _retrieve_hits(self, query: str, k: int, mode: str) -> List[Tuple[str, Dict[str, str]]]:
+        """retrieve_memories without marking the memories as accessed; returns (id, memory) pairs."""
+        logger.debug("Retrieving memories", extra={"user_id": self.user_id, "collection": self.collection_name,
+                                                   "mode": mode, "k": k})
+        with metrics.timer(OPERATION_SECONDS, operation="retrieve", **self.metric_labels):
+            self._wait_for_writes()
+            generation = query_cache.generation(self._cache_scope)
+            cached = self._cached_results(query, k, mode)
+            if cached is not None:
+                return cached
+            # Users with no memories need neither an embedding call nor a search.
+            if not self._has_memories():
+                return []
+            if mode == RETRIEVAL_LEXICAL:
+                hits = self._lexical_search(query, k)
+            elif mode == RETRIEVAL_HYBRID:
+                depth = k * HYBRID_CANDIDATE_FACTOR
+                # Both run on the calling thread: this method itself runs on _chroma_executor for
+                # async callers, and waiting there on a task queued to the same pool can deadlock.
+                vector_hits = self._vector_search(self._embed_query(query), depth)
+                hits = _fuse(vector_hits, self._lexical_search(query, depth), k)
+            else:
+                hits = self._vector_search(self._embed_query(query), k)
+            if self.use_query_cache:
+                query_cache.put(self._cache_scope, query, k, self._search_filter, hits, generation, mode)
+            return hits
+
+    def prefetch_memories(self, query: str, k: int = 3, mode: Optional[str] = None) -> "MemoryPrefetch":
+        """
+        Starts retrieve_memories in the background, before the caller knows whether it needs the
+        result, e.g. while an LLM decides how to handle the turn.
+        Args:
+            query (str): The query string to search for relevant memories.
+            k (int): The number of top relevant memories to retrieve.
+            mode (str): "vector", "lexical" or "hybrid". Defaults to the store's retrieval_mode.
+        Returns:
+            MemoryPrefetch: Call result() to use the memories or cancel() to discard them.
+        """
+        return MemoryPrefetch(self, query, k, mode or self.retrieval_mode)
+
+    def _record_access(self, hits: List[Tuple[str, Dict[str, str]]]) -> None:
+        """Marks retrieved memories as used now; the new access times are written in batches."""
+        if hits:
+            access_log.record(self.collection_name, self.use_embedding_cache, [doc_id for doc_id, _ in hits],
+                              self.metric_labels)
+
+    def _cached_results(self, query: str, k: int, mode: str) -> Optional[List[Tuple[str, Dict[str, str]]]]:
+        """Returns this query's (id, memory) results from the shared query cache, if enabled and current."""
+        if not self.use_query_cache:
+            return None
+        cached = query_cache.get(self._cache_scope, query, k, self._search_filter, mode)
+        metrics.inc(QUERY_CACHE_TOTAL, result="miss" if cached is None else "hit", **self.metric_labels)
+        return cached
+
+    def _vector_search(self, query_embedding: List[float], k: int) -> List[Tuple[str, Dict[str, str]]]:
+        """Runs the vector search for an already-embedded query and returns (id, memory) pairs."""
+        with metrics.timer(OPERATION_SECONDS, operation="search", **self.metric_labels):
+            source, hits = self._search_tiers(query_embedding, k)
+        metrics.inc(SEARCH_SOURCE_TOTAL, source=source, **self.metric_labels)
+        return hits
+
+    def _search_tiers(self, query_embedding: List[float], k: int) -> Tuple[str, List[Tuple[str, Dict[str, str]]]]:
+        """Answers a vector search from the fastest tier holding the user and names the tier used."""
+        if self.use_hot_tier:
+            vectors = hot_tier.get(self._cache_scope)
+            if vectors is not None:
+                if vectors.quantized:
+                    hits = self._rescore(query_embedding, vectors.search(query_embedding, k * RESCORE_FACTOR), k)
+                else:
+                    hits = vectors.search(query_embedding, k)
+                return "hot_tier", [(doc_id, dict(vectors.payload(doc_id))) for doc_id, _ in hits]
+            self._schedule_hot_tier_load()
+        mapped = self._mapped_vectors()
+        if mapped is not None:
+            if mapped.quantized:
+                rows = {mapped.id_at(i): (i, score) for i, score in mapped.search(query_embedding, k * RESCORE_FACTOR)}
+                candidates = [(doc_id, score) for doc_id, (_, score) in rows.items()]
+                hits = [(rows[doc_id][0], score) for doc_id, score in self._rescore(query_embedding, candidates, k)]
+            else:
+                hits = mapped.search(query_embedding, k)
+            return "vector_file", [(doc_id, {"content": content, "context": context})
+                                   for doc_id, content, context in (mapped.record_at(i) for i, _ in hits)]
+        results = self.vector_store._collection.query(
+            query_embeddings=[query_embedding], n_results=k, where=self._search_filter,
+            include=["documents", "metadatas"],
+        )
+        return "chroma", [
+            (doc_id, {"content": document, "context": (metadata or {}).get("context", "No context provided.")})
+            for doc_id, document, metadata in zip(results["ids"][0], results["documents"][0], results["metadatas"][0])
+        ]
+
+    def _mapped_vectors(self) -> Optional[MappedUserVectors]:
+        """Returns this user's memory-mapped vector file if serving from it is enabled and it exists."""
+        if not self.serve_from_vector_file:
+            return None
+        path = vector_file_path(self.user_id, self.collection_name)
+        mapped = vector_file_registry.peek(path)
+        if mapped is not None:
+            if mapped.is_current():
+                return mapped
+            # Another process deleted or rewrote the file since it was mapped.
+            vector_file_registry.discard(path)
+        if not os.path.exists(path):
+            return None
+        try:
+            return vector_file_registry.get(path, lambda: MappedUserVectors(path))
+        except (OSError, ValueError) as e:
+            logger.warning("Could not open vector file", extra={"path": path, "error": str(e)})
+            return None
+
+    def export_vector_file(self, path: Optional[str] = None, dtype: str = "float32",
+                           page_size: int = DEFAULT_PAGE_SIZE) -> str:
+        """
+        Writes the current user's memories and embeddings to a memory-mapped vector file.
+        Args:
+            path (str): Destination file. Defaults to the user's file under VECTOR_FILE_DIRECTORY,
+                        which is where serve_from_vector_file looks.
+            dtype (str): How vectors are stored: "float32", "float16" or "int8".
+            page_size (int): Number of memories fetched from the vector store per round trip.
+        Returns:
+            str: The path written.
+        """
+        self._wait_for_writes()
+        path = path or vector_file_path(self.user_id, self.collection_name)
+        ids, vectors, contents, contexts = [], [], [], []
+        offset = 0
+        while True:
+            page = self.vector_store._collection.get(
+                where={"user_id": self.user_id}, limit=page_size, offset=offset,
+                include=["documents", "metadatas", "embeddings"],
+            )
+            ids.extend(page["ids"])
+            vectors.extend(page["embeddings"])
+            contents.extend(page["documents"])
+            contexts.extend((metadata or {}).get("context", "No context provided.") for metadata in page["metadatas"])
+            if len(page["ids"]) < page_size:
+                break
+            offset += page_size
+        vector_file_registry.discard(path)
+        write_vector_file(path, ids, vectors, contents, contexts, dtype=dtype)
+        logger.info("Exported vector file", extra={"user_id": self.user_id, "collection": self.collection_name,
+                                                   "count": len(ids), "path": path, "dtype": dtype})
+        return path
+
+    def _rescore(self, query_embedding: List[float], candidates: List[Tuple[str, float]],
+                 k: int) -> List[Tuple[str, float]]:
+        """Re-ranks quantized hot-tier candidates using the full-precision vectors kept in Chroma."""
+        ids = [doc_id for doc_id, _ in candidates]
+        if len(ids) <= k:
+            return candidates
+        page = self.vector_store._collection.get(ids=ids, include=["embeddings"])
+        return rescore(query_embedding, page["ids"], page["embeddings"], k)
+
+    def _schedule_hot_tier_load(self) -> None:
+        """Loads this user's vectors into the hot tier in the background; this query uses Chroma."""
+        with _hot_tier_loads_lock:
+            if self._cache_scope in _hot_tier_loads:
+                return
+            _hot_tier_loads.add(self._cache_scope)
+        _chroma_executor.submit(self._load_hot_tier)
+
+    def _load_hot_tier(self) -> None:
+        try:
+            generation = query_cache.generation(self._cache_scope)
+            if self.count_memories() > hot_tier.max_vectors_per_user:
+                return
+            page = self.vector_store._collection.get(
+                where={"user_id": self.user_id}, include=["documents", "metadatas", "embeddings"]
+            )
+            payloads = [
+                {"content": document, "context": (metadata or {}).get("context", "No context provided.")}
+                for document, metadata in zip(page["documents"], page["metadatas"])
+            ]
+            if query_cache.generation(self._cache_scope) != generation:
+                return
+            hot_tier.load(self._cache_scope, page["ids"], page["embeddings"], payloads)
+            # A write that landed while loading would be missing from the matrix; drop it and retry later.
+            if query_cache.generation(self._cache_scope) != generation:
+                hot_tier.discard(self._cache_scope)
+        except Exception:
+            logger.exception("Error loading hot tier", extra={"user_id": self.user_id, "collection": self.collection_name})
+        finally:
+            with _hot_tier_loads_lock:
+                _hot_tier_loads.discard(self._cache_scope)
+
+    def _lexical_search(self, query: str, k: int) -> List[Tuple[str, Dict[str, str]]]:
+        """Runs a BM25 search over the user's memories and returns (id, memory) pairs."""
+        with metrics.timer(OPERATION_SECONDS, operation="lexical_search", **self.metric_labels):
+            index = self._lexical_index()
+            return [(doc_id, dict(index.payload(doc_id))) for doc_id, _ in index.search(query, k)]
+
+    def _lexical_index(self) -> BM25Index:
+        """
+        Returns this user's BM25 index, building it from the vector store on first use. The index
+        only follows this process's writes, so it is rebuilt once it is older than the query cache TTL.
+        """
+        index = lexical_index_registry.peek(self._cache_scope)
+        if index is not None:
+            if query_cache.ttl_s is None or time.monotonic() - index.created_at <= query_cache.ttl_s:
+                return index
+            lexical_index_registry.discard(self._cache_scope)
+        # Build outside the registry lock: reading pages may wait on queued writes, which
+        # themselves update any registered index.
+        generation = query_cache.generation(self._cache_scope)
+        index = BM25Index()
+        index.add_many(
+            (record.id, record.content, record.to_dict()) for record in self.iter_memories(page_size=1000)
+        )
+        if query_cache.generation(self._cache_scope) != generation:
+            # A write landed while building; serve this query but let the next one rebuild.
+            return index
+        return lexical_index_registry.get(self._cache_scope, lambda: index)
 
     def get_all_memories(self) -> List[Dict[str, str]]:
         """
         Retrieves all memories for the current user. Useful for debugging/visualization.
+        Prefer iter_memories or get_memories_page for users with many memories.
         Returns:
             List[Dict[str, str]]: A list of dictionaries, each representing a retrieved memory.
         """
-        print(f"Retrieving all memories for user {self.user_id} for debugging.")
-        all_docs = self.vector_store.get(where={"user_id": self.user_id}, include=['documents', 'metadatas'])
-
-        memories = []
-        if all_docs and all_docs.get('documents') and all_docs.get('metadatas'):
-            for i in range(len(all_docs['documents'])):
-                memories.append({
-                    "content": all_docs['documents'][i],
-                    "context": all_docs['metadatas'][i].get("context", "No context provided.")
-                })
-        print(f"Retrieved {len(memories)} total memories for display.")
+        with metrics.timer(OPERATION_SECONDS, operation="get_all", **self.metric_labels):
+            memories = [record.to_dict() for record in self.iter_memories()]
+        metrics.inc(ITEMS_TOTAL, len(memories), stage="get_all", **self.metric_labels)
+        logger.debug("Retrieved all memories", extra={"user_id": self.user_id, "collection": self.collection_name,
+                                                      "count": len(memories)})
         return memories
 
-class SaveMemorySchema(BaseModel):
-    content: str = Field(..., description="The information to be stored.")
-    context: str = Field("", description="Additional context related to the memory.")
+    def iter_memories(self, page_size: int = DEFAULT_PAGE_SIZE,
+                      fields: Tuple[str, ...] = MEMORY_FIELDS) -> Iterator[MemoryRecord]:
+        """
+        Streams all memories for the current user one page at a time.
+        Args:
+            page_size (int): Number of memories fetched per round trip.
+            fields (Tuple[str, ...]): Which of "content" and "context" to fetch. Embeddings are never fetched.
+        Yields:
+            MemoryRecord: One record per stored memory.
+        """
+        offset = 0
+        while True:
+            page = self.get_memories_page(limit=page_size, offset=offset, fields=fields)
+            yield from page
+            if len(page) < page_size:
+                return
+            offset += page_size
+
+    def get_memories_page(self, limit: int = DEFAULT_PAGE_SIZE, offset: int = 0,
+                          fields: Tuple[str, ...] = MEMORY_FIELDS) -> List[MemoryRecord]:
+        """
+        Retrieves one page of the current user's memories.
+        Args:
+            limit (int): Maximum number of memories to return.
+            offset (int): Number of memories to skip.
+            fields (Tuple[str, ...]): Which of "content" and "context" to fetch. Embeddings are never fetched.
+        Returns:
+            List[MemoryRecord]: The memories on this page.
+        """
+        self._wait_for_writes()
+        mapped = self._mapped_vectors()
+        if mapped is not None:
+            return [MemoryRecord(*record) for record in mapped.iter_records(offset, offset + limit)]
+        include = []
+        if "content" in fields:
+            include.append("documents")
+        if "context" in fields:
+            include.append("metadatas")
+        page = self.vector_store._collection.get(
+            where={"user_id": self.user_id}, limit=limit, offset=offset, include=include
+        )
+        documents = page.get("documents") or [None] * len(page["ids"])
+        metadatas = page.get("metadatas") or [None] * len(page["ids"])
+        return [
+            MemoryRecord(doc_id, document,
+                         metadata.get("context", "No context provided.") if metadata is not None else None)
+            for doc_id, document, metadata in zip(page["ids"], documents, metadatas)
+        ]
+
+    def _has_memories(self) -> bool:
+        """Whether the current user has any memories: the cached count if known, else a one-id lookup."""
+        count = query_cache.get_count(self._cache_scope)
+        if count is not None:
+            return count > 0
+        # A full count fetches every id the user has; an emptiness test only needs one.
+        return bool(self.vector_store._collection.get(where=self._search_filter, limit=1, include=[])["ids"])
+
+    def count_memories(self) -> int:
+        """Returns how many memories the current user has, without fetching their contents."""
+        self._wait_for_writes()
+        count = query_cache.get_count(self._cache_scope)
+        if count is not None:
+            return count
+        generation = query_cache.generation(self._cache_scope)
+        collection = self.vector_store._collection
+        if self.partitioning == PARTITION_USER:
+            count = collection.count()
+        else:
+            count = len(collection.get(where={"user_id": self.user_id}, include=[])["ids"])
+        query_cache.put_count(self._cache_scope, count, generation)
+        return count
+
+class MemoryPrefetch:
+    """
+    A retrieve_memories call running speculatively on its own small thread pool.
+
+    Exactly one of result() or cancel() settles it, and its outcome is counted in
+    memory_prefetch_total: used, stale (memories changed while it ran, so it was
+    recomputed), wasted (discarded after it started), cancelled (discarded before
+    it started) or failed.
+    """
+    def __init__(self, store: "MemoryStore", query: str, k: int, mode: str):
+        self.store = store
+        self.query = query
+        self.k = k
+        self.mode = mode
+        self._generation = query_cache.generation(store._cache_scope)
+        # Memories only count as accessed if the prefetch is used (see result()).
+        self._future = _prefetch_executor.submit(store._retrieve_hits, query, k, mode)
+        self._settled = False
+        self._lock = threading.Lock()
+
+    def matches(self, store: "MemoryStore", query: str, k: int, mode: Optional[str] = None) -> bool:
+        """Whether this prefetch answers store.retrieve_memories(query, k, mode)."""
+        return (store is self.store and query == self.query and k == self.k
+                and (mode or store.retrieval_mode) == self.mode)
+
+    def result(self, timeout: Optional[float] = None) -> List[Dict[str, str]]:
+        """
+        Waits for the prefetched memories; recomputes them if the user's memories changed
+        meanwhile, or if the prefetch failed, since a speculative search is only an optimisation.
+        """
+        try:
+            with metrics.timer(OPERATION_SECONDS, operation="prefetch_wait", **self.store.metric_labels):
+                hits = self._future.result(timeout)
+        except Exception as e:
+            self._future.cancel()
+            self._settle(PREFETCH_FAILED)
+            logger.warning("Prefetch failed, retrieving again",
+                           extra={"user_id": self.store.user_id, "error": repr(e)})
+            return self.store.retrieve_memories(self.query, self.k, self.mode)
+        if self.store.generation != self._generation:
+            self._settle(PREFETCH_STALE)
+            return self.store.retrieve_memories(self.query, self.k, self.mode)
+        self._settle(PREFETCH_USED)
+        self.store._record_access(hits)
+        return [memory for _, memory in hits]
+
+    def cancel(self) -> None:
+        """Discards the prefetch. A retrieval that has already started runs to completion and is ignored."""
+        self._settle(PREFETCH_CANCELLED if self._future.cancel() else PREFETCH_WASTED)
+
+    def _settle(self, outcome: str) -> None:
+        with self._lock:
+            if self._settled:
+                return
+            self._settled = True
+        metrics.inc(PREFETCH_TOTAL, outcome=outcome, **self.store.metric_labels)
+        logger.debug("Prefetch settled", extra={"user_id": self.store.user_id, "outcome": outcome})
+
+class AccessLog:
+    """
+    Buffers when memories were last retrieved and writes the times to Chroma in batches,
+    so a retrieval costs a dictionary update instead of a metadata write. A flush runs on
+    the maintenance thread once ACCESS_FLUSH_BATCH memories are pending or
+    ACCESS_FLUSH_INTERVAL_S has passed since the previous one, and at exit.
+    """
+    def __init__(self, flush_batch: int = ACCESS_FLUSH_BATCH, flush_interval_s: float = ACCESS_FLUSH_INTERVAL_S):
+        self.flush_batch = flush_batch
+        self.flush_interval_s = flush_interval_s
+        # vector_store_registry key of the collection -> {memory id: access time}
+        self._pending: Dict[Tuple[str, str, str, bool], Dict[str, float]] = {}
+        self._labels: Dict[Tuple[str, str, str, bool], Dict[str, str]] = {}
+        # (persist directory, collection name) of collections discarded as a whole, i.e. dropped.
+        self._dropped: Set[Tuple[str, str]] = set()
+        self._count = 0
+        self._flush_scheduled = False
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        """Number of memories whose access time has not been written yet."""
+        return self._count
+
+    def record(self, collection_name: str, use_cache: bool, ids: List[str],
+               labels: Optional[Dict[str, str]] = None) -> None:
+        """Notes that ids in collection_name were retrieved now; labels are the store's metric labels."""
+        now = time.time()
+        with self._lock:
+            key = vector_store_key(collection_name, use_cache)
+            self._labels[key] = labels or {"collection": collection_name}
+            pending = self._pending.setdefault(key, {})
+            for doc_id in ids:
+                self._count += doc_id not in pending
+                pending[doc_id] = now
+            due = not self._flush_scheduled and (
+                self._count >= self.flush_batch or time.monotonic() - self._last_flush >= self.flush_interval_s)
+            if due:
+                self._flush_scheduled = True
+        if due:
+            _maintenance_executor.submit(self.flush)
+
+    def discard(self, collection_name: str, ids: Optional[Iterable[str]] = None) -> None:
+        """
+        Forgets pending access times of deleted memories, or of a whole collection when ids is None,
+        which also stops later flushes from reopening (and so recreating) that collection.
+        """
+        with self._lock:
+            if ids is None:
+                self._dropped.add((PERSIST_DIRECTORY, collection_name))
+            for key in [key for key in self._pending if key[:2] == (PERSIST_DIRECTORY, collection_name)]:
+                if ids is None:
+                    self._count -= len(self._pending.pop(key))
+                    self._labels.pop(key, None)
+                    continue
+                pending = self._pending[key]
+                for doc_id in ids:
+                    self._count -= pending.pop(doc_id, None) is not None
+
+    def clear(self) -> None:
+        """Forgets every pending access time without writing it."""
+        with self._lock:
+            self._pending.clear()
+            self._labels.clear()
+            self._dropped.clear()
+            self._count = 0
+
+    def flush(self) -> int:
+        """Writes every pending access time now. Returns how many memories were updated."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            labels, self._labels = self._labels, {}
+            dropped = set(self._dropped)
+            self._count = 0
+            self._flush_scheduled = False
+            self._last_flush = time.monotonic()
+        written = 0
+        for key, accesses in pending.items():
+            collection_name = key[1]
+            metric_labels = labels.get(key) or {"collection": collection_name}
+            # Reopening a dropped collection would recreate it just to update memories that no
+            # longer exist; one that is open again was recreated since. Any other handle may
+            # merely have been evicted from the registry.
+            if not accesses or (key[:2] in dropped and vector_store_registry.peek(key) is None):
+                continue
+            if key[:2] in dropped:
+                with self._lock:
+                    self._dropped.discard(key[:2])
+            try:
+                collection = get_vector_store(collection_name, key[3])._collection
+                ids = list(accesses)
+                with metrics.timer(OPERATION_SECONDS, operation="access_flush", **metric_labels):
+                    for start in range(0, len(ids), self.flush_batch):
+                        batch = ids[start:start + self.flush_batch]
+                        # Chroma merges partial metadata, so only the access time is sent.
+                        collection.update(ids=batch, metadatas=[{"last_accessed_at": accesses[i]} for i in batch])
+                metrics.inc(ITEMS_TOTAL, len(ids), stage="access_flush", **metric_labels)
+                written += len(ids)
+            except Exception:
+                logger.exception("Error writing access times", extra={"collection": collection_name})
+        return written
+
+class AsyncMemoryStore(MemoryStore):
+    """
+    MemoryStore with asyncio-native counterparts of its public methods.
+
+    Embedding goes through the embedder's async API; blocking Chroma calls run on
+    a bounded thread pool shared by every store, so the event loop is never blocked.
+    """
+    async def asave_memory(self, content: str, context: str = "") -> None:
+        """Async version of save_memory."""
+        await self.asave_memories([(content, context)])
+
+    async def asave_memories(self, memories: Iterable[Tuple[str, str]]) -> int:
+        """Async version of save_memories."""
+        memories = list(memories)
+        if not memories:
+            return 0
+        logger.debug("Saving memories", extra={"user_id": self.user_id, "collection": self.collection_name,
+                                               "count": len(memories), "queued": self._writer is not None})
+        if self._writer is not None:
+            for content, context in memories:
+                self._writer.enqueue(content, context)
+            return len(memories)
+        contents = [content for content, _ in memories]
+        contexts = [context for _, context in memories]
+        embeddings = await self._aembed_contents(contents)
+        return len(await run_blocking(self._store_embedded, contents, contexts, embeddings))
+
+    async def aretrieve_memories(self, query: str, k: int = 3, mode: Optional[str] = None) -> List[Dict[str, str]]:
+        """Async version of retrieve_memories."""
+        mode = mode or self.retrieval_mode
+        logger.debug("Retrieving memories", extra={"user_id": self.user_id, "collection": self.collection_name,
+                                                   "mode": mode, "k": k})
+        with metrics.timer(OPERATION_SECONDS, operation="retrieve", **self.metric_labels):
+            await self._await_writes()
+            generation = query_cache.generation(self._cache_scope)
+            cached = self._cached_results(query, k, mode)
+            if cached is not None:
+                self._record_access(cached)
+                return [memory for _, memory in cached]
+            count = query_cache.get_count(self._cache_scope)
+            if count == 0 or (count is None and not await run_blocking(self._has_memories)):
+                return []
+            if mode == RETRIEVAL_LEXICAL:
+                hits = await run_blocking(self._lexical_search, query, k)
+            elif mode == RETRIEVAL_HYBRID:
+                depth = k * HYBRID_CANDIDATE_FACTOR
+                vector_hits, lexical_hits = await asyncio.gather(
+                    self._avector_search(query, depth), run_blocking(self._lexical_search, query, depth)
+                )
+                hits = _fuse(vector_hits, lexical_hits, k)
+            else:
+                hits = await self._avector_search(query, k)
+            if self.use_query_cache:
+                query_cache.put(self._cache_scope, query, k, self._search_filter, hits, generation, mode)
+            self._record_access(hits)
+            return [memory for _, memory in hits]
+
+    async def _avector_search(self, query: str, k: int) -> List[Tuple[str, Dict[str, str]]]:
+        with metrics.timer(OPERATION_SECONDS, operation="embed_query", **self.metric_labels):
+            query_embedding = await self.embeddings.aembed_query(query)
+        return await run_blocking(self._vector_search, query_embedding, k)
+
+    async def aget_all_memories(self) -> List[Dict[str, str]]:
+        """Async version of get_all_memories."""
+        await self._await_writes()
+        return await run_blocking(self.get_all_memories)
+
+    async def aget_memories_page(self, limit: int = DEFAULT_PAGE_SIZE, offset: int = 0,
+                                 fields: Tuple[str, ...] = MEMORY_FIELDS) -> List[MemoryRecord]:
+        """Async version of get_memories_page."""
+        return await run_blocking(self.get_memories_page, limit, offset, fields)
+
+    async def acount_memories(self) -> int:
+        """Async version of count_memories."""
+        count = query_cache.get_count(self._cache_scope)
+        if count is not None:
+            return count
+        return await run_blocking(self.count_memories)
+
+    async def aflush(self) -> None:
+        """Async version of flush."""
+        await run_blocking(self.flush)
+
+    async def _await_writes(self) -> None:
+        if self._writer is not None and self._writer.pending:
+            await run_blocking(self._wait_for_writes)
+
+    async def _aembed_contents(self, contents: List[str]) -> List[List[float]]:
+        batches = [contents[start:start + EMBEDDING_BATCH_SIZE] for start in range(0, len(contents), EMBEDDING_BATCH_SIZE)]
+        with metrics.timer(OPERATION_SECONDS, operation="embed", **self.metric_labels):
+            results = await asyncio.gather(*(self.embeddings.aembed_documents(batch) for batch in batches))
+        metrics.inc(ITEMS_TOTAL, len(contents), stage="embed", **self.metric_labels)
+        return [embedding for batch in results for embedding in batch]
+
+# Users whose hot-tier load is in flight, so concurrent queries schedule it only once.
+_hot_tier_loads = set()
+_hot_tier_loads_lock = threading.Lock()
+# Bounded pool for blocking Chroma calls made from async code.
+_chroma_executor = ThreadPoolExecutor(max_workers=CHROMA_EXECUTOR_WORKERS, thread_name_prefix="chroma")
+# Separate from _chroma_executor so speculative retrievals never hold up async callers' Chroma calls.
+_prefetch_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="memory-prefetch")
+
+async def run_blocking(func: Callable, *args):
+    """Runs a blocking vector store call on the bounded Chroma thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_chroma_executor, functools.partial(func, *args))
+
+@functools.lru_cache(maxsize=None)
+def _tool_schemas():
+    """Builds the tools' pydantic argument schemas on first use, so importing this module does not load pydantic."""
+    from pydantic import BaseModel, Field
+
+    class SaveMemorySchema(BaseModel):
+        content: str = Field(..., description="The information to be stored.")
+        context: str = Field("", description="Additional context related to the memory.")
+
+    class SaveMemoriesSchema(BaseModel):
+        memories: List[SaveMemorySchema] = Field(..., description="The memories to be stored, each with content and optional context.")
+
+    return SaveMemorySchema, SaveMemoriesSchema
+
+def __getattr__(name: str):
+    # Keeps `from memory_tool import SaveMemorySchema` working while the schemas are built lazily.
+    if name == "SaveMemorySchema":
+        return _tool_schemas()[0]
+    if name == "SaveMemoriesSchema":
+        return _tool_schemas()[1]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 class MemoryTools:
-    def __init__(self, user_id: str):
-        self.memory_store = MemoryStore(user_id=user_id)
+    def __init__(self, user_id: str, memory_store: MemoryStore = None):
+        self.memory_store = memory_store or AsyncMemoryStore(user_id=user_id)
 
     def save_user_memory(self, content: str, context: str = "") -> str:
         """
@@ -108,27 +1345,89 @@ class MemoryTools:
         except Exception as e:
             return f"Failed to save memory: {e}"
 
-    def retrieve_user_memories(self, query: str, k: int = 3) -> List[Dict[str, str]]:
+    async def asave_user_memory(self, content: str, context: str = "") -> str:
+        """Async version of save_user_memory."""
+        try:
+            if isinstance(self.memory_store, AsyncMemoryStore):
+                await self.memory_store.asave_memory(content=content, context=context)
+            else:
+                await run_blocking(self.memory_store.save_memory, content, context)
+            return f"Memory '{content}' saved successfully."
+        except Exception as e:
+            return f"Failed to save memory: {e}"
+
+    def save_user_memories(self, memories: List["SaveMemorySchema"]) -> str:
+        """
+        Saves several pieces of information to the long-term memory for a specific user in one batch.
+        """
+        try:
+            count = self.memory_store.save_memories(_memory_pairs(memories))
+            return f"{count} memories saved successfully."
+        except Exception as e:
+            return f"Failed to save memories: {e}"
+
+    async def asave_user_memories(self, memories: List["SaveMemorySchema"]) -> str:
+        """Async version of save_user_memories."""
+        try:
+            if isinstance(self.memory_store, AsyncMemoryStore):
+                count = await self.memory_store.asave_memories(_memory_pairs(memories))
+            else:
+                count = await run_blocking(self.memory_store.save_memories, _memory_pairs(memories))
+            return f"{count} memories saved successfully."
+        except Exception as e:
+            return f"Failed to save memories: {e}"
+
+    def retrieve_user_memories(self, query: str, k: int = 3,
+                               prefetch: Optional[MemoryPrefetch] = None) -> List[Dict[str, str]]:
         """
         Retrieves relevant memories from the long-term memory for a specific user based on a query.
+        A matching prefetch (see MemoryStore.prefetch_memories) is used instead of searching again.
         """
         try:
-            memories = self.memory_store.retrieve_memories(query=query, k=k)
-            if memories:
-                formatted_memories = "\n".join([
-                    f"- Content: {m['content']} (Context: {m['context']})" for m in memories
-                ])
-                return f"Retrieved memories:\n{formatted_memories}"
+            if prefetch is not None and prefetch.matches(self.memory_store, query, k):
+                return _format_memories(query, prefetch.result())
+            if prefetch is not None:
+                prefetch.cancel()
+            return _format_memories(query, self.memory_store.retrieve_memories(query=query, k=k))
+        except Exception as e:
+            return f"Failed to retrieve memories: {e}"
+
+    async def aretrieve_user_memories(self, query: str, k: int = 3) -> List[Dict[str, str]]:
+        """Async version of retrieve_user_memories."""
+        try:
+            if isinstance(self.memory_store, AsyncMemoryStore):
+                memories = await self.memory_store.aretrieve_memories(query=query, k=k)
             else:
-                return f"No relevant memories found for query '{query}'."
+                memories = await run_blocking(self.memory_store.retrieve_memories, query, k)
+            return _format_memories(query, memories)
         except Exception as e:
             return f"Failed to retrieve memories: {e}"
 
-def get_tools(user_id: str):
-    memory_tools = MemoryTools(user_id)
+def _memory_pairs(memories: List["SaveMemorySchema"]) -> List[Tuple[str, str]]:
+    pairs = []
+    for memory in memories:
+        if isinstance(memory, dict):
+            memory = _tool_schemas()[0](**memory)
+        pairs.append((memory.content, memory.context))
+    return pairs
+
+def _format_memories(query: str, memories: List[Dict[str, str]]) -> str:
+    if memories:
+        formatted_memories = "\n".join([
+            f"- Content: {m['content']} (Context: {m['context']})" for m in memories
+        ])
+        return f"Retrieved memories:\n{formatted_memories}"
+    return f"No relevant memories found for query '{query}'."
+
+def get_tools(user_id: str, memory_store: MemoryStore = None):
+    from langchain_core.tools import StructuredTool, Tool
+
+    SaveMemorySchema, SaveMemoriesSchema = _tool_schemas()
+    memory_tools = MemoryTools(user_id, memory_store=memory_store)
     tools = [
         StructuredTool.from_function(
             func=memory_tools.save_user_memory,
+            coroutine=memory_tools.asave_user_memory,
             name="save_user_memory",
             description="Saves a significant piece of information or user preference to the long-term memory for a specific user.",
             args_schema=SaveMemorySchema,
@@ -136,30 +1435,153 @@ def get_tools(user_id: str):
         Tool(
             name="retrieve_user_memories",
             func=memory_tools.retrieve_user_memories,
+            coroutine=memory_tools.aretrieve_user_memories,
             description="Retrieves relevant memories from the long-term memory for a specific user based on a query.",
         ),
+        StructuredTool.from_function(
+            func=memory_tools.save_user_memories,
+            coroutine=memory_tools.asave_user_memories,
+            name="save_user_memories",
+            description="Saves several pieces of information or user preferences to the long-term memory for a specific user in one batch.",
+            args_schema=SaveMemoriesSchema,
+        ),
     ]
     return tools
 
-def clear_user_memories(user_id: str, collection_name: str = "user_memories"):
+# Runs long maintenance jobs (large clears) off the caller's thread, one at a time.
+_maintenance_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory-maintenance")
+# Users with an eviction check queued on the maintenance thread, so saves schedule it only once.
+_scheduled_evictions = set()
+_scheduled_evictions_lock = threading.Lock()
+# Shared by every MemoryStore in the process.
+access_log = AccessLog()
+atexit.register(access_log.flush)
+
+def clear_user_memories(user_id: str, collection_name: str = "user_memories",
+                        batch_size: int = CLEAR_BATCH_SIZE,
+                        progress_callback: Optional[Callable[[int], None]] = None,
+                        partitioning: str = PARTITION_SHARED, num_buckets: int = DEFAULT_NUM_BUCKETS) -> int:
     """
     Clears all memories for a specific user from the ChromaDB collection.
+    Only this user's documents are deleted, in batches of batch_size, so other users'
+    memories and the shared index are left untouched.
     WARNING: This will permanently delete all memories for the specified user.
+    Args:
+        user_id (str): The user whose memories are deleted.
+        collection_name (str): The name of the ChromaDB collection.
+        batch_size (int): Number of documents fetched and deleted per round trip.
+        progress_callback (Callable[[int], None]): Called with the running total after each batch.
+        partitioning (str): The partitioning mode the user's MemoryStore uses.
+        num_buckets (int): Number of hash buckets in "bucket" mode.
+    Returns:
+        int: The number of memories deleted.
     """
-    print(f"Attempting to clear memories for user: {user_id} from collection: {collection_name}")
+    metric_labels = {"collection": collection_name, "partitioning": partitioning}
+    collection_name = partition_collection_name(user_id, collection_name, partitioning, num_buckets)
+    deleted = 0
     try:
-        embeddings = GoogleGenerativeAIEmbeddings(model="text-embedding-004", google_api_key=GOOGLE_API_KEY)
-        vector_store = Chroma(
-            collection_name=collection_name,
-            embedding_function=embeddings,
-            persist_directory="./chroma_db_data"
-        )
-        vector_store.delete_collection()
-        Chroma(
-            collection_name=collection_name,
-            embedding_function=embeddings,
-            persist_directory="./chroma_db_data"
-        )
-        print(f"All memories for user {user_id} in collection {collection_name} have been cleared.")
-    except Exception as e:
-        print(f"Error clearing memories: {e}")
+        vector_store = get_vector_store(collection_name)
+        collection = vector_store._collection
+        while True:
+            # Deleted ids drop out of the result, so the next page always starts at offset 0.
+            page = collection.get(where={"user_id": user_id}, limit=batch_size, include=[])
+            ids = page["ids"]
+            if not ids:
+                break
+            access_log.discard(collection_name, ids)
+            with metrics.timer(OPERATION_SECONDS, operation="delete", **metric_labels):
+                collection.delete(ids=ids)
+            _invalidate_user_caches(user_id, collection_name)
+            deleted += len(ids)
+            if progress_callback:
+                progress_callback(deleted)
+        with metrics.timer(OPERATION_SECONDS, operation="persist", **metric_labels):
+            vector_store.persist()
+        logger.info("Cleared memories", extra={"user_id": user_id, "collection": collection_name, "count": deleted})
+    except Exception:
+        logger.exception("Error clearing memories", extra={"user_id": user_id, "collection": collection_name})
+    return deleted
+
+def clear_user_memories_in_background(user_id: str, collection_name: str = "user_memories",
+                                      batch_size: int = CLEAR_BATCH_SIZE,
+                                      progress_callback: Optional[Callable[[int], None]] = None,
+                                      partitioning: str = PARTITION_SHARED,
+                                      num_buckets: int = DEFAULT_NUM_BUCKETS) -> Future:
+    """
+    Runs clear_user_memories on a background maintenance thread.
+    Returns:
+        Future: Resolves to the number of memories deleted.
+    """
+    return _maintenance_executor.submit(
+        clear_user_memories, user_id, collection_name, batch_size, progress_callback, partitioning, num_buckets
+    )
+
+def compact_vector_store() -> None:
+    """
+    Reclaims disk space left behind by deleted memories by vacuuming Chroma's SQLite file.
+    Run this after large clears, ideally while the store is not under heavy write load.
+    """
+    db_path = os.path.join(PERSIST_DIRECTORY, "chroma.sqlite3")
+    if not os.path.exists(db_path):
+        return
+    before = os.path.getsize(db_path)
+    connection = sqlite3.connect(db_path)
+    try:
+        connection.execute("VACUUM")
+    finally:
+        connection.close()
+    logger.info("Compacted vector store", extra={"path": db_path, "bytes_before": before,
+                                                 "bytes_after": os.path.getsize(db_path)})
+
+def migrate_to_partitions(collection_name: str = "user_memories", partitioning: str = PARTITION_USER,
+                          num_buckets: int = DEFAULT_NUM_BUCKETS, batch_size: int = CLEAR_BATCH_SIZE,
+                          delete_source: bool = False) -> int:
+    """
+    Splits a shared collection into per-user or per-bucket collections.
+    Documents keep their ids and stored embeddings, so nothing is re-embedded.
+    Args:
+        collection_name (str): The shared collection to split.
+        partitioning (str): "user" or "bucket".
+        num_buckets (int): Number of hash buckets in "bucket" mode.
+        batch_size (int): Number of documents copied per round trip.
+        delete_source (bool): Whether to delete each copied batch from the shared collection.
+    Returns:
+        int: The number of memories migrated.
+    """
+    if partitioning == PARTITION_SHARED:
+        raise ValueError("Target partitioning must be 'user' or 'bucket'.")
+    source = get_vector_store(collection_name)
+    migrated = 0
+    offset = 0
+    while True:
+        page = source._collection.get(limit=batch_size, offset=offset,
+                                      include=["documents", "metadatas", "embeddings"])
+        if not page["ids"]:
+            break
+        by_collection: Dict[str, Dict[str, list]] = {}
+        users: Dict[str, str] = {}  # user id -> target collection
+        for doc_id, document, metadata, embedding in zip(page["ids"], page["documents"],
+                                                        page["metadatas"], page["embeddings"]):
+            user_id = (metadata or {}).get("user_id", "")
+            target_name = partition_collection_name(user_id, collection_name, partitioning, num_buckets)
+            target = by_collection.setdefault(target_name, {"ids": [], "documents": [], "metadatas": [], "embeddings": []})
+            target["ids"].append(doc_id)
+            target["documents"].append(document)
+            target["metadatas"].append(metadata)
+            target["embeddings"].append(embedding)
+            users[user_id] = target_name
+        for target_name, batch in by_collection.items():
+            get_vector_store(target_name)._collection.upsert(**batch)
+        if delete_source:
+            access_log.discard(collection_name, page["ids"])
+            source._collection.delete(ids=page["ids"])
+        else:
+            offset += len(page["ids"])
+        for user_id, target_name in users.items():
+            _invalidate_user_caches(user_id, target_name)
+            if delete_source:
+                _invalidate_user_caches(user_id, collection_name)
+        migrated += len(page["ids"])
+        logger.info("Migrated memories", extra={"collection": collection_name, "count": migrated})
+    source.persist()
+    return migrated
@@ -0,0 +1,380 @@
+"""
+Streaming bulk export and import of memories as JSONL (optionally gzipped) or Parquet.
+
+Exports page through a collection, optionally filtered to one user, and write each
+memory's id, user id, content, metadata and (optionally) embedding as they are read.
+Imports read the file in batches, reuse exported embeddings when they come from the
+configured embedding model, upsert by id (so replaying a batch is harmless) and record
+a checkpoint after every batch, so an interrupted import resumes where it stopped.
+Memory use is bounded by the batch size, not the file size. Examples:
+
+    python memory_transfer.py export backup.jsonl.gz --embeddings
+    python memory_transfer.py export alice.parquet --user-id alice --embeddings
+    python memory_transfer.py import backup.jsonl.gz --batch-size 2000
+"""
+import argparse
+import gzip
+import itertools
+import json
+import os
+import time
+import uuid
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from hot_tier import hot_tier
+from memory_tool import (DEFAULT_MAX_MEMORIES, DEFAULT_NUM_BUCKETS, DEFAULT_TTL_S, EMBEDDING_BATCH_SIZE,
+                         EMBEDDING_MODEL, PARTITION_BUCKET, PARTITION_MODES, PARTITION_SHARED, PARTITION_USER,
+                         MemoryStore, get_embeddings, get_vector_store, invalidate_vector_file,
+                         partition_collection_name)
+from metrics import ITEMS_TOTAL, OPERATION_SECONDS, metrics
+from query_cache import query_cache
+from registry import lexical_index_registry
+from structured_logging import configure_logging, get_logger
+
+logger = get_logger(__name__)
+
+FORMAT_JSONL = "jsonl"
+FORMAT_PARQUET = "parquet"
+FORMATS = (FORMAT_JSONL, FORMAT_PARQUET)
+# Memories read from Chroma per round trip when exporting.
+EXPORT_BATCH_SIZE = 1000
+# Memories embedded (when needed), upserted and checkpointed together when importing.
+IMPORT_BATCH_SIZE = 1000
+
+
+def detect_format(path: str) -> str:
+    """Infers the file format from its extension: .parquet is Parquet, anything else JSONL."""
+    return FORMAT_PARQUET if path.lower().endswith(".parquet") else FORMAT_JSONL
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("Parquet import/export needs pyarrow: pip install pyarrow") from e
+    return pyarrow
+
+
+def _open_text(path: str, mode: str, compressed: Optional[bool] = None):
+    """Opens a JSONL file, transparently (de)compressing .gz paths (or any path if compressed)."""
+    if compressed if compressed is not None else path.lower().endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _batched(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def iter_collection(collection_name: str = "user_memories", user_id: Optional[str] = None,
+                    include_embeddings: bool = False, batch_size: int = EXPORT_BATCH_SIZE,
+                    metric_label: Optional[str] = None) -> Iterator[List[Dict]]:
+    """
+    Streams a collection's memories (or one user's) as batches of export records.
+    metric_label names the collection in metrics; pass the base name for partition collections.
+    Yields:
+        List[Dict]: Records with "id", "user_id", "content", "metadata" and, if requested,
+                    "embedding" and the "model" that produced it.
+    """
+    collection = get_vector_store(collection_name)._collection
+    include = ["documents", "metadatas"] + (["embeddings"] if include_embeddings else [])
+    offset = 0
+    while True:
+        with metrics.timer(OPERATION_SECONDS, operation="export_read", collection=metric_label or collection_name):
+            page = collection.get(where={"user_id": user_id} if user_id is not None else None,
+                                  limit=batch_size, offset=offset, include=include)
+        if not page["ids"]:
+            return
+        embeddings = page.get("embeddings") if include_embeddings else None
+        records = []
+        for i, (doc_id, document, metadata) in enumerate(zip(page["ids"], page["documents"], page["metadatas"])):
+            metadata = dict(metadata or {})
+            record = {"id": doc_id, "user_id": metadata.pop("user_id", user_id), "content": document,
+                      "metadata": metadata}
+            if embeddings is not None:
+                record["embedding"] = [float(value) for value in embeddings[i]]
+                record["model"] = EMBEDDING_MODEL
+            records.append(record)
+        offset += len(page["ids"])
+        yield records
+
+
+def partition_collections(collection_name: str = "user_memories", partitioning: str = PARTITION_SHARED) -> List[str]:
+    """Returns the names of the existing collections that hold a base collection's memories under a partitioning mode."""
+    if partitioning not in PARTITION_MODES:
+        raise ValueError(f"Unknown partitioning '{partitioning}'. Expected one of {PARTITION_MODES}.")
+    if partitioning == PARTITION_SHARED:
+        return [collection_name]
+    # Must match the names partition_collection_name produces.
+    prefix = f"{collection_name}_u_" if partitioning == PARTITION_USER else f"{collection_name}_b_"
+    client = get_vector_store(collection_name)._client
+    return sorted(collection.name for collection in client.list_collections() if collection.name.startswith(prefix))
+
+
+def export_memories(path: str, user_id: Optional[str] = None, collection_name: str = "user_memories",
+                    fmt: Optional[str] = None, include_embeddings: bool = False,
+                    batch_size: int = EXPORT_BATCH_SIZE, partitioning: str = PARTITION_SHARED,
+                    num_buckets: int = DEFAULT_NUM_BUCKETS) -> int:
+    """
+    Exports memories to a JSONL or Parquet file, streaming one batch at a time.
+    The file is written under a temporary name and renamed when complete, so a reader
+    never sees a partial export.
+    Args:
+        path (str): The output file. ".parquet" selects Parquet; ".gz" compresses JSONL.
+        user_id (str): Export only this user's memories. Defaults to every user's, which under
+                       "user" or "bucket" partitioning means every partition collection.
+        collection_name (str): The collection to export (the base name when partitioned).
+        fmt (str): "jsonl" or "parquet"; defaults to detect_format(path).
+        include_embeddings (bool): Whether to export stored embeddings so an import can skip re-embedding.
+        batch_size (int): Memories read and written per round trip.
+        partitioning (str): The partitioning mode the MemoryStores use.
+        num_buckets (int): Number of hash buckets in "bucket" mode.
+    Returns:
+        int: The number of memories exported.
+    """
+    fmt = fmt or detect_format(path)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}'. Expected one of {FORMATS}.")
+    if user_id is not None:
+        names = [partition_collection_name(user_id, collection_name, partitioning, num_buckets)]
+    else:
+        names = partition_collections(collection_name, partitioning)
+    batches = (records for name in names
+               for records in iter_collection(name, user_id, include_embeddings, batch_size, collection_name))
+    temporary_path = f"{path}.tmp"
+    if fmt == FORMAT_PARQUET:
+        exported = _write_parquet(temporary_path, batches, collection_name)
+    else:
+        exported = 0
+        with _open_text(temporary_path, "w", compressed=path.lower().endswith(".gz")) as f:
+            for records in batches:
+                f.writelines(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+                exported += len(records)
+                metrics.inc(ITEMS_TOTAL, len(records), stage="export", collection=collection_name)
+                logger.info("Exported memories", extra={"collection": collection_name, "count": exported})
+    os.replace(temporary_path, path)
+    return exported
+
+
+def _write_parquet(path: str, batches: Iterable[List[Dict]], collection_name: str) -> int:
+    pyarrow = _import_pyarrow()
+    schema = pyarrow.schema([
+        ("id", pyarrow.string()),
+        ("user_id", pyarrow.string()),
+        ("content", pyarrow.string()),
+        ("metadata", pyarrow.string()),  # JSON: Chroma metadata keys vary from memory to memory.
+        ("embedding", pyarrow.list_(pyarrow.float32())),
+        ("model", pyarrow.string()),
+    ])
+    exported = 0
+    with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+        for records in batches:
+            columns = {
+                "id": [record["id"] for record in records],
+                "user_id": [record["user_id"] for record in records],
+                "content": [record["content"] for record in records],
+                "metadata": [json.dumps(record["metadata"], ensure_ascii=False) for record in records],
+                "embedding": [record.get("embedding") for record in records],
+                "model": [record.get("model") for record in records],
+            }
+            # One row group per batch keeps both the writer and later readers bounded.
+            writer.write_table(pyarrow.Table.from_pydict(columns, schema=schema))
+            exported += len(records)
+            metrics.inc(ITEMS_TOTAL, len(records), stage="export", collection=collection_name)
+            logger.info("Exported memories", extra={"collection": collection_name, "count": exported})
+    return exported
+
+
+def iter_records(path: str, fmt: Optional[str] = None, skip: int = 0) -> Iterator[Dict]:
+    """Streams the records of an export file, skipping the first skip of them."""
+    fmt = fmt or detect_format(path)
+    if fmt == FORMAT_PARQUET:
+        parquet_file = _import_pyarrow().parquet.ParquetFile(path)
+        seen = 0
+        for batch in parquet_file.iter_batches(batch_size=EXPORT_BATCH_SIZE):
+            if seen + batch.num_rows <= skip:
+                seen += batch.num_rows
+                continue
+            for row in batch.to_pylist()[max(0, skip - seen):]:
+                row["metadata"] = json.loads(row["metadata"]) if row.get("metadata") else {}
+                yield row
+            seen += batch.num_rows
+        return
+    with _open_text(path, "r") as f:
+        # skip counts records, as the checkpoint does, so blank lines must not count towards it.
+        yield from itertools.islice((json.loads(line) for line in f if line.strip()), skip, None)
+
+
+def _load_checkpoint(checkpoint_path: str, path: str) -> int:
+    """Returns how many records of path a previous, interrupted import already wrote."""
+    if not os.path.exists(checkpoint_path):
+        return 0
+    with open(checkpoint_path, encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("source") != os.path.abspath(path) or checkpoint.get("size") != os.path.getsize(path):
+        raise ValueError(f"Checkpoint {checkpoint_path} belongs to a different file; delete it or pass restart=True.")
+    return int(checkpoint["records"])
+
+
+def _save_checkpoint(checkpoint_path: str, path: str, records: int) -> None:
+    temporary_path = f"{checkpoint_path}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as f:
+        json.dump({"source": os.path.abspath(path), "size": os.path.getsize(path), "records": records}, f)
+    os.replace(temporary_path, checkpoint_path)
+
+
+def import_memories(path: str, user_id: Optional[str] = None, collection_name: str = "user_memories",
+                    fmt: Optional[str] = None, batch_size: int = IMPORT_BATCH_SIZE,
+                    checkpoint_path: Optional[str] = None, restart: bool = False, reembed: bool = False,
+                    partitioning: str = PARTITION_SHARED, num_buckets: int = DEFAULT_NUM_BUCKETS,
+                    max_memories: Optional[int] = DEFAULT_MAX_MEMORIES, ttl_s: Optional[float] = DEFAULT_TTL_S) -> int:
+    """
+    Imports memories from a JSONL or Parquet export in batches.
+    Each batch is embedded only where the file has no embedding from the configured model,
+    upserted by memory id and persisted before the checkpoint advances, so rerunning after an
+    interruption resumes at the first unwritten batch and never duplicates memories.
+    Args:
+        path (str): The export file.
+        user_id (str): Import every memory for this user instead of the user recorded in the file.
+                       Memories of other users are copied under new ids, never taken over.
+        collection_name (str): The target collection (the base name when partitioned).
+        fmt (str): "jsonl" or "parquet"; defaults to detect_format(path).
+        batch_size (int): Memories embedded, written and checkpointed together.
+        checkpoint_path (str): Where progress is recorded. Defaults to "<path>.checkpoint".
+        restart (bool): Ignore an existing checkpoint and import from the first record.
+        reembed (bool): Embed every memory again even if the file carries usable embeddings.
+        partitioning (str): The partitioning mode of the target MemoryStores.
+        num_buckets (int): Number of hash buckets in "bucket" mode.
+        max_memories (int): Per-user capacity enforced (in the background) after each batch, as after a save.
+        ttl_s (float): Per-user TTL enforced the same way.
+    Returns:
+        int: The number of memories imported by this call (excluding ones skipped on resume).
+    """
+    if partitioning not in PARTITION_MODES:
+        raise ValueError(f"Unknown partitioning '{partitioning}'. Expected one of {PARTITION_MODES}.")
+    checkpoint_path = checkpoint_path or f"{path}.checkpoint"
+    done = 0 if restart else _load_checkpoint(checkpoint_path, path)
+    if done:
+        logger.info("Resuming import", extra={"path": path, "skipped": done})
+    imported = 0
+    for records in _batched(iter_records(path, fmt, skip=done), batch_size):
+        with metrics.timer(OPERATION_SECONDS, operation="import_batch", collection=collection_name,
+                           partitioning=partitioning):
+            _import_batch(records, user_id, collection_name, reembed, partitioning, num_buckets, max_memories, ttl_s)
+        done += len(records)
+        imported += len(records)
+        _save_checkpoint(checkpoint_path, path, done)
+        logger.info("Imported memories", extra={"path": path, "count": done})
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return imported
+
+
+def _import_batch(records: List[Dict], user_id: Optional[str], collection_name: str, reembed: bool,
+                  partitioning: str, num_buckets: int, max_memories: Optional[int], ttl_s: Optional[float]) -> None:
+    labels = {"collection": collection_name, "partitioning": partitioning}
+    # Embed only the memories without a reusable embedding, in provider-sized requests.
+    missing = [i for i, record in enumerate(records)
+               if reembed or not record.get("embedding") or record.get("model") != EMBEDDING_MODEL]
+    reused = set(range(len(records))) - set(missing)
+    embeddings = [record["embedding"] if i in reused else None for i, record in enumerate(records)]
+    if missing:
+        embedder = get_embeddings()
+        with metrics.timer(OPERATION_SECONDS, operation="embed", **labels):
+            for start in range(0, len(missing), EMBEDDING_BATCH_SIZE):
+                chunk = missing[start:start + EMBEDDING_BATCH_SIZE]
+                for i, embedding in zip(chunk, embedder.embed_documents([records[i]["content"] for i in chunk])):
+                    embeddings[i] = embedding
+        metrics.inc(ITEMS_TOTAL, len(missing), stage="embed", **labels)
+    metrics.inc(ITEMS_TOTAL, len(records) - len(missing), stage="import_reused_embedding", **labels)
+
+    now = time.time()
+    stores: Dict[str, MemoryStore] = {}
+    by_collection: Dict[str, Dict[str, list]] = {}
+    for record, embedding in zip(records, embeddings):
+        source_owner = record.get("user_id") or ""
+        owner = user_id if user_id is not None else source_owner
+        if record.get("id") is None:
+            # A stable id, so a replayed batch overwrites rather than duplicates.
+            doc_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"{owner}\n{record['content']}"))
+        elif owner != source_owner:
+            # Importing another user's memories copies them; reusing their ids would take them over.
+            doc_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"{owner}\n{record['id']}"))
+        else:
+            doc_id = record["id"]
+        if owner not in stores:
+            stores[owner] = MemoryStore(owner, collection_name, partitioning=partitioning, num_buckets=num_buckets,
+                                        max_memories=max_memories, ttl_s=ttl_s)
+        store = stores[owner]
+        metadata = {**(record.get("metadata") or {}), "user_id": owner}
+        # Memories from files without eviction bookkeeping start out as if saved now.
+        metadata.setdefault("created_at", now)
+        metadata.setdefault("last_accessed_at", now)
+        if "importance" not in metadata:
+            metadata["importance"] = float(store.importance_fn(record["content"], metadata.get("context", "")))
+        target = by_collection.setdefault(store.collection_name, {"ids": [], "documents": [], "metadatas": [],
+                                                                  "embeddings": []})
+        target["ids"].append(doc_id)
+        target["documents"].append(record["content"])
+        target["metadatas"].append(metadata)
+        target["embeddings"].append(list(embedding))
+    for target_name, batch in by_collection.items():
+        vector_store = get_vector_store(target_name)
+        with metrics.timer(OPERATION_SECONDS, operation="add", **labels):
+            vector_store._collection.upsert(**batch)
+        metrics.inc(ITEMS_TOTAL, len(batch["ids"]), stage="import", **labels)
+        with metrics.timer(OPERATION_SECONDS, operation="persist", **labels):
+            vector_store.persist()
+    for owner, store in stores.items():
+        query_cache.bump(store._cache_scope)
+        lexical_index_registry.discard(store._cache_scope)
+        hot_tier.discard(store._cache_scope)
+        invalidate_vector_file(owner, store.collection_name)
+        # Imports go straight to Chroma, so each user's limits are applied afterwards, as after a save.
+        store._schedule_eviction()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name in ("export", "import"):
+        command = commands.add_parser(name)
+        command.add_argument("path", help="The .jsonl, .jsonl.gz or .parquet file.")
+        command.add_argument("--format", choices=FORMATS, help="Defaults to the file extension.")
+        command.add_argument("--user-id", help="Export only this user / import everything as this user.")
+        command.add_argument("--collection", default="user_memories")
+        command.add_argument("--partitioning", choices=[PARTITION_SHARED, PARTITION_USER, PARTITION_BUCKET],
+                             default=PARTITION_SHARED)
+        command.add_argument("--num-buckets", type=int, default=DEFAULT_NUM_BUCKETS)
+        command.add_argument("--batch-size", type=int,
+                             default=EXPORT_BATCH_SIZE if name == "export" else IMPORT_BATCH_SIZE)
+        if name == "export":
+            command.add_argument("--embeddings", action="store_true",
+                                 help="Include stored embeddings so imports can skip re-embedding.")
+        else:
+            command.add_argument("--checkpoint", help="Progress file; defaults to <path>.checkpoint.")
+            command.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint.")
+            command.add_argument("--reembed", action="store_true", help="Embed every memory again.")
+    args = parser.parse_args()
+    configure_logging()
+
+    if args.command == "export":
+        count = export_memories(args.path, user_id=args.user_id, collection_name=args.collection, fmt=args.format,
+                                include_embeddings=args.embeddings, batch_size=args.batch_size,
+                                partitioning=args.partitioning, num_buckets=args.num_buckets)
+        print(f"Done. {count} memories exported to {args.path}.")
+    else:
+        count = import_memories(args.path, user_id=args.user_id, collection_name=args.collection, fmt=args.format,
+                                batch_size=args.batch_size, checkpoint_path=args.checkpoint, restart=args.restart,
+                                reembed=args.reembed, partitioning=args.partitioning, num_buckets=args.num_buckets)
+        print(f"Done. {count} memories imported from {args.path}.")
+
+
+if __name__ == "__main__":
+    main()
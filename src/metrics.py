@@ -0,0 +1,174 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Latency histogram bucket upper bounds in seconds, from sub-millisecond cache hits
+# up to multi-second embedding API calls.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _errors_name(name: str) -> str:
+    return f"{name[:-len('_seconds')] if name.endswith('_seconds') else name}_errors_total"
+
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class MetricsRegistry:
+    """
+    Thread-safe in-process counters and latency histograms with labels.
+
+    Metrics are created on first use. snapshot() returns the current values for
+    viewing in-process; to_prometheus() renders them in the Prometheus text
+    exposition format so they can be served from any HTTP endpoint.
+    """
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, _Histogram]] = {}
+        self._help: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, help_text: str) -> None:
+        """Sets the HELP line shown for a metric in the Prometheus output."""
+        self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1.0, **labels: str) -> None:
+        """Adds value to a counter."""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, seconds: float, **labels: str) -> None:
+        """Records one latency observation in a histogram."""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(len(self.buckets))
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram.counts[i] += 1
+                    break
+            histogram.sum += seconds
+            histogram.count += 1
+
+    @contextmanager
+    def timer(self, name: str, **labels: str) -> Iterator[None]:
+        """Times the enclosed block into a histogram; failures also count in <name minus _seconds>_errors_total."""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc(_errors_name(name), **labels)
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def counter_value(self, name: str, **labels: str) -> float:
+        return self._counters.get(name, {}).get(_label_key(labels), 0.0)
+
+    def snapshot(self) -> Dict[str, List[Dict[str, object]]]:
+        """
+        Returns every metric as plain data, e.g. for logging or a debug page.
+        Histograms report count, sum, mean and approximate p50/p95/p99 from their buckets.
+        """
+        with self._lock:
+            result: Dict[str, List[Dict[str, object]]] = {}
+            for name, series in self._counters.items():
+                result[name] = [{"labels": dict(key), "value": value} for key, value in series.items()]
+            for name, series in self._histograms.items():
+                result[name] = [
+                    {
+                        "labels": dict(key),
+                        "count": histogram.count,
+                        "sum": histogram.sum,
+                        "mean": histogram.sum / histogram.count if histogram.count else 0.0,
+                        "p50": self._quantile(histogram, 0.50),
+                        "p95": self._quantile(histogram, 0.95),
+                        "p99": self._quantile(histogram, 0.99),
+                    }
+                    for key, histogram in series.items()
+                ]
+            return result
+
+    def _quantile(self, histogram: _Histogram, quantile: float) -> float:
+        """Upper bound of the bucket holding the quantile (+Inf bucket reports the largest bound)."""
+        if not histogram.count:
+            return 0.0
+        target = quantile * histogram.count
+        running = 0
+        for bound, count in zip(self.buckets, histogram.counts):
+            running += count
+            if running >= target:
+                return bound
+        return self.buckets[-1]
+
+    def to_prometheus(self) -> str:
+        """Renders every metric in the Prometheus text exposition format (version 0.0.4)."""
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {value:g}")
+            for name, series in sorted(self._histograms.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in series.items():
+                    running = 0
+                    for bound, count in zip(self.buckets, histogram.counts):
+                        running += count
+                        lines.append(f"{name}_bucket{_format_labels(key, ('le', f'{bound:g}'))} {running}")
+                    lines.append(f"{name}_bucket{_format_labels(key, ('le', '+Inf'))} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum:g}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+# Metric names used by MemoryStore.
+OPERATION_SECONDS = "memory_operation_seconds"
+ITEMS_TOTAL = "memory_items_total"
+QUERY_CACHE_TOTAL = "memory_query_cache_total"
+SEARCH_SOURCE_TOTAL = "memory_search_source_total"
+PREFETCH_TOTAL = "memory_prefetch_total"
+
+# Shared by every module in the process so one scrape sees all of them.
+metrics = MetricsRegistry()
+metrics.describe(OPERATION_SECONDS, "Latency of MemoryStore stages (embed, add, persist, search, get_all, ...).")
+metrics.describe(_errors_name(OPERATION_SECONDS), "MemoryStore stages that raised.")
+metrics.describe(ITEMS_TOTAL, "Memories embedded, added or returned, by stage.")
+metrics.describe(QUERY_CACHE_TOTAL, "Query cache lookups by result.")
+metrics.describe(SEARCH_SOURCE_TOTAL, "Vector searches by the tier that answered them.")
+metrics.describe(PREFETCH_TOTAL, "Speculative retrievals by outcome (used, stale, wasted, cancelled, failed).")
@@ -0,0 +1,29 @@
+import argparse
+
+from memory_tool import DEFAULT_NUM_BUCKETS, PARTITION_BUCKET, PARTITION_USER, migrate_to_partitions
+from structured_logging import configure_logging
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Split the shared memory collection into per-user or per-bucket collections.")
+    parser.add_argument("--collection", default="user_memories", help="The shared collection to split.")
+    parser.add_argument("--partitioning", choices=[PARTITION_USER, PARTITION_BUCKET], default=PARTITION_USER)
+    parser.add_argument("--num-buckets", type=int, default=DEFAULT_NUM_BUCKETS)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--delete-source", action="store_true",
+                        help="Delete memories from the shared collection once copied.")
+    args = parser.parse_args()
+    configure_logging()
+
+    migrated = migrate_to_partitions(
+        collection_name=args.collection,
+        partitioning=args.partitioning,
+        num_buckets=args.num_buckets,
+        batch_size=args.batch_size,
+        delete_source=args.delete_source,
+    )
+    print(f"Done. {migrated} memories migrated.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+A fixed-layout binary file holding one user's (or shard's) embeddings, opened with mmap.
+
+Layout (little-endian, every section aligned to 64 bytes):
+
+    header      magic "MEMVEC01", version, dtype code, count, dimensions and the
+                offsets of each section below
+    ids         uint64 offsets[count + 1] followed by the UTF-8 id bytes
+    contents    uint64 offsets[count + 1] followed by the UTF-8 memory contents
+    contexts    uint64 offsets[count + 1] followed by the UTF-8 memory contexts
+    vectors     count x dimensions rows of float32, float16 or int8 (L2-normalised)
+    scales      float32[count], only for int8
+
+Vectors are viewed straight out of the page cache with np.frombuffer, so opening
+a file costs a header read and searches and scans only page in what they touch.
+Many processes mapping the same file share one copy in memory.
+"""
+import mmap
+import os
+import struct
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from hot_tier import DTYPE_FLOAT16, DTYPE_FLOAT32, DTYPE_INT8
+
+MAGIC = b"MEMVEC01"
+VERSION = 1
+_HEADER = struct.Struct("<8sIIQI4xQQQQQQ")
+_ALIGNMENT = 64
+_DTYPE_CODES = {DTYPE_FLOAT32: 0, DTYPE_FLOAT16: 1, DTYPE_INT8: 2}
+_DTYPE_NAMES = {code: name for name, code in _DTYPE_CODES.items()}
+_NUMPY_DTYPES = {DTYPE_FLOAT32: np.float32, DTYPE_FLOAT16: np.float16, DTYPE_INT8: np.int8}
+
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def _string_table(values: Sequence[str]) -> bytes:
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return offsets.tobytes() + b"".join(encoded)
+
+
+def write_vector_file(path: str, ids: Sequence[str], vectors: Sequence[Sequence[float]],
+                      contents: Sequence[str], contexts: Sequence[str], dtype: str = DTYPE_FLOAT32) -> None:
+    """
+    Writes a vector file atomically (to a temporary file that is then renamed over path).
+    Args:
+        path (str): Destination file.
+        ids (Sequence[str]): Memory ids.
+        vectors (Sequence[Sequence[float]]): One embedding per id.
+        contents (Sequence[str]): Memory contents, in the same order.
+        contexts (Sequence[str]): Memory contexts, in the same order.
+        dtype (str): "float32", "float16" or "int8".
+    """
+    if dtype not in _DTYPE_CODES:
+        raise ValueError(f"Unknown vector dtype '{dtype}'. Expected one of {tuple(_DTYPE_CODES)}.")
+    count = len(ids)
+    matrix = np.asarray(vectors, dtype=np.float32).reshape(count, -1) if count else np.zeros((0, 0), np.float32)
+    dimensions = matrix.shape[1]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+    scales = None
+    if dtype == DTYPE_INT8:
+        scales = (np.abs(matrix).max(axis=1) / 127.0).astype("<f4") if count else np.zeros(0, "<f4")
+        scales[scales == 0] = 1.0
+        stored = np.round(matrix / scales[:, None]).astype(np.int8)
+    else:
+        stored = matrix.astype(np.dtype(_NUMPY_DTYPES[dtype]).newbyteorder("<"))
+
+    sections = [_string_table(ids), _string_table(contents), _string_table(contexts), stored.tobytes(),
+                scales.tobytes() if scales is not None else b""]
+    offsets = []
+    position = _align(_HEADER.size)
+    for section in sections:
+        offsets.append(position)
+        position = _align(position + len(section))
+
+    header = _HEADER.pack(MAGIC, VERSION, _DTYPE_CODES[dtype], count, dimensions, *offsets, position)
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        for offset, section in zip(offsets, sections):
+            f.seek(offset)
+            f.write(section)
+        f.truncate(position)
+    os.replace(tmp_path, path)
+
+
+def _file_identity(stat: os.stat_result) -> Tuple[int, int, int, int]:
+    return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+class MappedUserVectors:
+    """A read-only, zero-copy view of a vector file written by write_vector_file."""
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._identity = _file_identity(os.fstat(f.fileno()))
+        (magic, version, dtype_code, self.count, self.dimensions, ids_offset, contents_offset,
+         contexts_offset, vectors_offset, scales_offset, _) = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a version {VERSION} memory vector file.")
+        self.dtype = _DTYPE_NAMES[dtype_code]
+        self._ids = self._open_string_table(ids_offset)
+        self._contents = self._open_string_table(contents_offset)
+        self._contexts = self._open_string_table(contexts_offset)
+        numpy_dtype = np.dtype(_NUMPY_DTYPES[self.dtype]).newbyteorder("<")
+        self.vectors = np.frombuffer(self._mmap, dtype=numpy_dtype, count=self.count * self.dimensions,
+                                     offset=vectors_offset).reshape(self.count, self.dimensions)
+        self.scales = None
+        if self.dtype == DTYPE_INT8:
+            self.scales = np.frombuffer(self._mmap, dtype="<f4", count=self.count, offset=scales_offset)
+
+    def _open_string_table(self, offset: int) -> Tuple[np.ndarray, int]:
+        offsets = np.frombuffer(self._mmap, dtype="<u8", count=self.count + 1, offset=offset)
+        return offsets, offset + offsets.nbytes
+
+    def _string(self, table: Tuple[np.ndarray, int], index: int) -> str:
+        offsets, base = table
+        return self._mmap[base + int(offsets[index]):base + int(offsets[index + 1])].decode("utf-8")
+
+    def __len__(self) -> int:
+        return self.count
+
+    def is_current(self) -> bool:
+        """Whether path still holds the file that was mapped (it is deleted or replaced, never edited, on writes)."""
+        try:
+            return _file_identity(os.stat(self.path)) == self._identity
+        except FileNotFoundError:
+            return False
+
+    @property
+    def quantized(self) -> bool:
+        return self.dtype != DTYPE_FLOAT32
+
+    def id_at(self, index: int) -> str:
+        return self._string(self._ids, index)
+
+    def record_at(self, index: int) -> Tuple[str, str, str]:
+        """Returns (id, content, context) for a row."""
+        return self.id_at(index), self._string(self._contents, index), self._string(self._contexts, index)
+
+    def iter_records(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[str, str, str]]:
+        """Yields (id, content, context) for rows start..stop without touching the vectors."""
+        for index in range(start, min(stop if stop is not None else self.count, self.count)):
+            yield self.record_at(index)
+
+    def search(self, query: Sequence[float], k: int, block_rows: int = 4096) -> List[Tuple[int, float]]:
+        """Returns up to k (row index, cosine similarity) pairs, best first. Approximate when quantized."""
+        if not self.count:
+            return []
+        query = np.asarray(query, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+        scores = np.empty(self.count, dtype=np.float32)
+        for start in range(0, self.count, block_rows):
+            end = min(start + block_rows, self.count)
+            scores[start:end] = self.vectors[start:end].astype(np.float32, copy=False) @ query
+        if self.scales is not None:
+            scores *= self.scales
+        k = min(k, self.count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def close(self) -> None:
+        # NumPy views keep the buffer exported; drop them before closing the map.
+        self.vectors = None
+        self.scales = None
+        self._ids = self._contents = self._contexts = None
+        self._mmap.close()
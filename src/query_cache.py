@@ -0,0 +1,141 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+
+Scope = Tuple[str, str]  # (collection_name, user_id)
+Hit = Tuple[str, Dict[str, str]]  # (memory id, memory)
+
+# Cached results and counts are trusted for at most this many seconds. Generations only see
+# writes made by this process, so the TTL bounds how stale a cache can be after a write by
+# another worker process or a bulk import.
+DEFAULT_TTL_S = float(os.getenv("MEMORY_QUERY_CACHE_TTL_S", "30"))
+
+
+def normalize_query(query: str) -> str:
+    """Lower-cases a query, collapses whitespace and drops trailing punctuation."""
+    return " ".join(query.lower().split()).rstrip("?!.")
+
+
+class QueryResultCache:
+    """
+    Bounded LRU of retrieval results ((id, memory) pairs), invalidated by per-user write generations.
+
+    Every save or clear for a (collection, user) scope bumps that scope's
+    generation; cached results and counts remember the generation they were
+    computed at and are ignored once it moves on. This makes invalidation exact
+    for writes made in this process without having to find and delete the affected
+    entries; entries also expire after ttl_s to pick up writes made elsewhere.
+    At most max_scopes scopes are tracked: when a scope is dropped, least recently
+    used first, its cached results and count go with it.
+    """
+    def __init__(self, max_entries: int = 4096, ttl_s: Optional[float] = DEFAULT_TTL_S, max_scopes: int = 100_000):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.max_scopes = max_scopes
+        # key -> (generation, time cached, results)
+        self._results: "OrderedDict[Hashable, Tuple[int, float, List[Hit]]]" = OrderedDict()
+        self._generations: "OrderedDict[Scope, int]" = OrderedDict()
+        # scope -> (generation, time counted, count)
+        self._counts: Dict[Scope, Tuple[int, float, int]] = {}
+        self._scope_keys: Dict[Scope, Set[Hashable]] = {}
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "stale": 0, "expired": 0, "evictions": 0}
+
+    def generation(self, scope: Scope) -> int:
+        """Returns the current write generation of a scope."""
+        return self._generations.get(scope, 0)
+
+    def bump(self, scope: Scope) -> None:
+        """Invalidates every cached result and count for a scope."""
+        with self._lock:
+            self._generations[scope] = self._generations.get(scope, 0) + 1
+            self._track(scope)
+            self._counts.pop(scope, None)
+
+    @staticmethod
+    def _key(scope: Scope, query: str, k: int, filters: Optional[Dict[str, Any]], mode: str) -> Hashable:
+        filter_key = tuple(sorted(filters.items())) if filters else ()
+        return (scope, normalize_query(query), k, filter_key, mode)
+
+    def _expired(self, cached_at: float) -> bool:
+        return self.ttl_s is not None and time.monotonic() - cached_at > self.ttl_s
+
+    def get(self, scope: Scope, query: str, k: int, filters: Optional[Dict[str, Any]] = None,
+            mode: str = "vector") -> Optional[List[Hit]]:
+        """Returns the cached results for a query, or None on a miss."""
+        key = self._key(scope, query, k, filters, mode)
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            generation, cached_at, results = entry
+            if generation != self._generations.get(scope, 0) or self._expired(cached_at):
+                self._remove(key)
+                self.stats["stale" if generation != self._generations.get(scope, 0) else "expired"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._results.move_to_end(key)
+            self.stats["hits"] += 1
+            return [(doc_id, dict(memory)) for doc_id, memory in results]
+
+    def put(self, scope: Scope, query: str, k: int, filters: Optional[Dict[str, Any]],
+            results: List[Hit], generation: int, mode: str = "vector") -> None:
+        """
+        Caches results computed at the given generation. Results computed before a
+        concurrent write are dropped instead of being cached as current.
+        """
+        key = self._key(scope, query, k, filters, mode)
+        with self._lock:
+            if generation != self._generations.get(scope, 0):
+                return
+            self._track(scope)
+            self._results[key] = (generation, time.monotonic(), [(doc_id, dict(memory)) for doc_id, memory in results])
+            self._results.move_to_end(key)
+            self._scope_keys.setdefault(scope, set()).add(key)
+            while len(self._results) > self.max_entries:
+                self._remove(next(iter(self._results)))
+                self.stats["evictions"] += 1
+
+    def get_count(self, scope: Scope) -> Optional[int]:
+        """Returns the cached memory count for a scope, or None if unknown."""
+        entry = self._counts.get(scope)
+        if entry is None or entry[0] != self._generations.get(scope, 0) or self._expired(entry[1]):
+            return None
+        return entry[2]
+
+    def put_count(self, scope: Scope, count: int, generation: int) -> None:
+        with self._lock:
+            if generation == self._generations.get(scope, 0):
+                self._track(scope)
+                self._counts[scope] = (generation, time.monotonic(), count)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._results.clear()
+            self._counts.clear()
+            self._scope_keys.clear()
+
+    def _track(self, scope: Scope) -> None:
+        """Marks a scope as recently used, dropping the least recently used scopes beyond max_scopes."""
+        self._generations.setdefault(scope, 0)
+        self._generations.move_to_end(scope)
+        while len(self._generations) > self.max_scopes:
+            dropped, _ = self._generations.popitem(last=False)
+            self._counts.pop(dropped, None)
+            for key in self._scope_keys.pop(dropped, ()):
+                self._results.pop(key, None)
+
+    def _remove(self, key: Hashable) -> None:
+        self._results.pop(key, None)
+        keys = self._scope_keys.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._scope_keys[key[0]]
+
+
+# Shared by every MemoryStore in the process so all handles for a user see the same generations.
+query_cache = QueryResultCache()
@@ -0,0 +1,87 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+
+class ResourceRegistry:
+    """
+    A process-wide, thread-safe map from a key to a lazily created shared resource.
+
+    Used to hand out one embedder per model and one vector store handle per
+    (persist_directory, collection_name, model) instead of building new ones
+    for every MemoryStore, tool set or session. When max_items is set, the least
+    recently used resources are dropped once the registry grows past it.
+    Resources are built outside the registry lock, so a slow build (say, opening a
+    Chroma collection) only holds up callers waiting for that same key.
+    """
+    def __init__(self, name: str, max_items: Optional[int] = None):
+        self.name = name
+        self.max_items = max_items
+        self._items: "OrderedDict[Hashable, Any]" = OrderedDict()
+        # Builds in progress; concurrent callers for the same key wait on its future.
+        self._building: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """
+        Returns the resource registered under key, creating it with factory on first use.
+        Args:
+            key (Hashable): Identifies the resource.
+            factory (Callable): Builds the resource. Called at most once per key.
+        """
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                self._items.move_to_end(key)
+                return item
+            building = self._building.get(key)
+            if building is None:
+                building = self._building[key] = Future()
+                builder = True
+            else:
+                builder = False
+        if not builder:
+            return building.result()
+        try:
+            item = factory()
+        except BaseException as e:
+            with self._lock:
+                del self._building[key]
+            building.set_exception(e)
+            raise
+        with self._lock:
+            del self._building[key]
+            self._items[key] = item
+            if self.max_items is not None:
+                while len(self._items) > self.max_items:
+                    self._items.popitem(last=False)
+        building.set_result(item)
+        return item
+
+    def peek(self, key: Hashable) -> Any:
+        """Returns the resource under key if it has already been created, otherwise None."""
+        with self._lock:
+            return self._items.get(key)
+
+    def discard(self, key: Hashable) -> None:
+        """Forgets the resource under key so the next get() builds a fresh one."""
+        with self._lock:
+            self._items.pop(key, None)
+
+    def keys(self) -> List[Hashable]:
+        with self._lock:
+            return list(self._items)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+embedder_registry = ResourceRegistry("embedders")
+# Bounded because per-user partitioning opens one collection handle per active user.
+vector_store_registry = ResourceRegistry("vector_stores", max_items=1024)
+# Per-user BM25 indexes, built lazily from the vector store and dropped least recently used first.
+lexical_index_registry = ResourceRegistry("lexical_indexes", max_items=1024)
+# Open memory-mapped vector files, keyed by path.
+vector_file_registry = ResourceRegistry("vector_files", max_items=1024)
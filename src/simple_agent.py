@@ -1,6 +1,7 @@
 import os
 from dotenv import load_dotenv
 from memory_tool import get_tools, clear_user_memories
+from intent_router import IntentRouter, INTENT_SAVE, INTENT_RETRIEVE, intent_from_llm_response
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain.chains import LLMChain
@@ -52,14 +53,24 @@ def run_agent_test():
     # --- Create the LLMChain ---
     chain = LLMChain(llm=llm, prompt=prompt)
 
+    # --- Route locally, asking the LLM only when the router is unsure ---
+    router = IntentRouter()
+
+    def decide(user_input):
+        decision = router.route(user_input)
+        print(f"Router: {decision}")
+        if decision.confident:
+            return decision.intent
+        response = chain.run(input=user_input)
+        print(f"LLM output: {response}")
+        return intent_from_llm_response(response)
 
     # Scenario 1: Agent learns and saves a memory
     print("\n--- Scenario 1: Agent learns and saves a memory ---")
     user_input_1 = "Hi, my name is Alice and my favorite color is blue."
     print(f"\nUser: {user_input_1}")
-    response_1 = chain.run(input=user_input_1)
-    print(f"LLM output: {response_1}")
-    if "save_user_memory" in response_1:
+    intent_1 = decide(user_input_1)
+    if intent_1 == INTENT_SAVE:
         save_user_memory.func(content="Alice's favorite color is blue.", context="user preference")
         print("Memory saved.")
     else:
@@ -70,9 +81,8 @@ def run_agent_test():
     print("\n--- Scenario 2: Agent recalls a memory ---")
     user_input_2 = "What is my favorite color?"
     print(f"\nUser: {user_input_2}")
-    response_2 = chain.run(input=user_input_2)
-    print(f"LLM output: {response_2}")
-    if "retrieve_user_memories" in response_2:
+    intent_2 = decide(user_input_2)
+    if intent_2 == INTENT_RETRIEVE:
         memories = retrieve_user_memories.func(query="favorite color")
         print(f"Retrieved memories: {memories}")
     else:
@@ -83,9 +93,8 @@ def run_agent_test():
     print("\n--- Scenario 3: Agent uses memory in a follow-up ---")
     user_input_3 = "And what was my name again?"
     print(f"\nUser: {user_input_3}")
-    response_3 = chain.run(input=user_input_3)
-    print(f"LLM output: {response_3}")
-    if "retrieve_user_memories" in response_3:
+    intent_3 = decide(user_input_3)
+    if intent_3 == INTENT_RETRIEVE:
         memories = retrieve_user_memories.func(query="name")
         print(f"Retrieved memories: {memories}")
     else:
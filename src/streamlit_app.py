@@ -6,17 +6,22 @@ except RuntimeError:
 
 import streamlit as st
 import os
+import threading
+import time
 from dotenv import load_dotenv
-from memory_tool import get_tools, clear_user_memories, MemoryStore
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import ChatPromptTemplate
-from langchain.chains import LLMChain
+from memory_tool import get_tools, clear_user_memories, warm_up, MemoryStore, DEDUP_SKIP
+from consolidation import ConsolidationJob
+from intent_router import IntentRouter, INTENT_SAVE, INTENT_RETRIEVE, intent_from_llm_response
+from metrics import metrics
+from structured_logging import configure_logging, get_logger
 from langchain_core.messages import HumanMessage, AIMessage
 
 # --- Configuration and Initialization ---
 
 # Load environment variables (GOOGLE_API_KEY)
 load_dotenv()
+configure_logging()
+logger = get_logger("streamlit_app")
 
 # Get Google API Key from environment variables
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
@@ -26,22 +31,97 @@ if not GOOGLE_API_KEY:
 
 # Define LLM model for Google Gemini
 LLM_MODEL = "gemini-1.5-flash"
+# Number of memories shown per page in the sidebar.
+SIDEBAR_PAGE_SIZE = 25
+# Latency of streamed answers as the user sees it, per turn and by intent.
+RESPONSE_FIRST_TOKEN_SECONDS = "chat_response_first_token_seconds"
+RESPONSE_SECONDS = "chat_response_seconds"
+metrics.describe(RESPONSE_FIRST_TOKEN_SECONDS, "Time from sending a prompt to the LLM to its first streamed token.")
+metrics.describe(RESPONSE_SECONDS, "Time from sending a prompt to the LLM to its last streamed token.")
+# When the intent router defers to the LLM, start retrieving memories while it decides
+# (opt-in; the retrieval is wasted whenever the LLM does not pick retrieve_user_memories).
+SPECULATIVE_PREFETCH = os.getenv("MEMORY_SPECULATIVE_PREFETCH", "").lower() in ("1", "true", "yes", "on")
+# Sessions idle for longer than this have their MemoryStore closed and their tools dropped.
+SESSION_IDLE_TIMEOUT_S = 30 * 60
+
+
+class SessionResources:
+    """The per-user objects a session reuses across reruns: its MemoryStore and memory tools."""
+    def __init__(self, user_id: str):
+        # The app saves whole prompts, so skip ones that nearly repeat an existing memory.
+        self.memory_store = MemoryStore(user_id=user_id, dedup=DEDUP_SKIP)
+        self._tools = None
+        self.last_seen = time.monotonic()
+
+    @property
+    def tools(self):
+        """(save_user_memory, retrieve_user_memories), built on first use."""
+        if self._tools is None:
+            tools = get_tools(user_id=self.memory_store.user_id, memory_store=self.memory_store)
+            self._tools = (tools[0], tools[1])
+        return self._tools
+
+    def close(self) -> None:
+        self.memory_store.close()
+
+
+class SessionRegistry:
+    """
+    Process-wide map from a session's user id to its SessionResources.
+
+    Streamlit has no session-end callback, so sessions are closed once they have been
+    idle for SESSION_IDLE_TIMEOUT_S; a returning session transparently gets new ones.
+    """
+    def __init__(self, idle_timeout_s: float = SESSION_IDLE_TIMEOUT_S):
+        self.idle_timeout_s = idle_timeout_s
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str) -> SessionResources:
+        with self._lock:
+            resources = self._sessions.get(user_id)
+            if resources is None:
+                resources = self._sessions[user_id] = SessionResources(user_id)
+                logger.info("Session resources created", extra={"user_id": user_id})
+            resources.last_seen = time.monotonic()
+            expired = [(key, value) for key, value in self._sessions.items()
+                       if time.monotonic() - value.last_seen > self.idle_timeout_s]
+            for key, _ in expired:
+                del self._sessions[key]
+        for key, value in expired:
+            value.close()
+            logger.info("Idle session resources closed", extra={"user_id": key})
+        return resources
+
+
+# No spinner: this runs before set_page_config, which must be the first element on the page.
+@st.cache_resource(show_spinner=False)
+def get_session_registry() -> SessionRegistry:
+    return SessionRegistry()
+
+
+@st.cache_resource(show_spinner=False)
+def start_warm_up():
+    """
+    Opens Chroma and the embedder on a background thread, once per process, so the page
+    renders immediately and the first memory lookup does not pay for the imports.
+    """
+    return warm_up()
+
+
+start_warm_up()
 
 # --- Session State Management ---
 if "user_id" not in st.session_state:
     st.session_state.user_id = os.urandom(16).hex()
-    st.session_state.memory_store = MemoryStore(user_id=st.session_state.user_id)
-    print(f"New session started with User ID: {st.session_state.user_id}")
+    logger.info("New session started", extra={"user_id": st.session_state.user_id})
 
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
 
-# --- LangChain Setup ---
-llm = ChatGoogleGenerativeAI(model=LLM_MODEL, temperature=0, google_api_key=GOOGLE_API_KEY)
-tools = get_tools(user_id=st.session_state.user_id)
-save_user_memory = tools[0]
-retrieve_user_memories = tools[1]
+session = get_session_registry().get(st.session_state.user_id)
 
+# --- LangChain Setup ---
 prompt_template = """You are a helpful AI assistant. You have access to two tools: `save_user_memory` and `retrieve_user_memories`.
 Decide which tool to use based on the user's input.
 If the user is providing new information, use `save_user_memory`.
@@ -50,9 +130,89 @@ If you don't know the answer, just say "I don't know".
 
 User input: {input}
 Your decision:"""
-prompt = ChatPromptTemplate.from_template(prompt_template)
 
-chain = LLMChain(llm=llm, prompt=prompt)
+answer_template = """You are a helpful AI assistant with long-term memory of the user. Provide concise and helpful responses.
+{memories}
+User: {input}
+Assistant:"""
+
+
+@st.cache_resource
+def get_llm():
+    """
+    Builds the Gemini client once per process, on the first message, so the page renders
+    without waiting for LangChain and the Gemini client to import. It holds no user state,
+    so every session shares it.
+    """
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    return ChatGoogleGenerativeAI(model=LLM_MODEL, temperature=0, google_api_key=GOOGLE_API_KEY)
+
+
+@st.cache_resource
+def get_chain():
+    """The LLM decision chain, used when the intent router is unsure."""
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain.chains import LLMChain
+
+    return LLMChain(llm=get_llm(), prompt=ChatPromptTemplate.from_template(prompt_template))
+
+
+@st.cache_resource
+def get_answer_chain():
+    """The chain that writes the reply; a runnable, so its tokens can be streamed."""
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.output_parsers import StrOutputParser
+
+    return ChatPromptTemplate.from_template(answer_template) | get_llm() | StrOutputParser()
+
+
+def stream_answer(prompt: str, intent: str, memories: str = ""):
+    """
+    Yields the reply to prompt token by token as the LLM produces it, optionally grounded
+    in retrieved memories. Time to first token and total time are recorded per turn.
+    """
+    start = time.perf_counter()
+    first_token_s = None
+    try:
+        for chunk in get_answer_chain().stream({"input": prompt, "memories": memories}):
+            if first_token_s is None and chunk:
+                first_token_s = time.perf_counter() - start
+                metrics.observe(RESPONSE_FIRST_TOKEN_SECONDS, first_token_s, intent=intent)
+            yield chunk
+    finally:
+        total_s = time.perf_counter() - start
+        metrics.observe(RESPONSE_SECONDS, total_s, intent=intent)
+        logger.info("Answer streamed", extra={"intent": intent, "first_token_s": first_token_s, "total_s": total_s})
+
+
+@st.cache_resource(show_spinner=False)
+def get_consolidation_job() -> ConsolidationJob:
+    """Background job that merges near-duplicate memories of users who saved something recently."""
+    return ConsolidationJob()
+
+
+@st.cache_resource(show_spinner=False)
+def get_router() -> IntentRouter:
+    """The local intent router, trained once per process on the bundled labeled examples."""
+    return IntentRouter()
+
+
+def sidebar_page(memory_store: MemoryStore, requested_page: int):
+    """
+    Returns (total, page, records) for the sidebar, recomputed only when the user's memories
+    have changed since the last rerun or a different page is requested. The page is clamped
+    to the last one, e.g. after memories were cleared.
+    """
+    key = (memory_store.generation, requested_page)
+    cached = st.session_state.get("sidebar_page")
+    if cached is None or cached[0] != key:
+        total = memory_store.count_memories()
+        page = max(1, min(requested_page, (total + SIDEBAR_PAGE_SIZE - 1) // SIDEBAR_PAGE_SIZE))
+        offset = (page - 1) * SIDEBAR_PAGE_SIZE
+        records = memory_store.get_memories_page(limit=SIDEBAR_PAGE_SIZE, offset=offset) if total else []
+        cached = st.session_state.sidebar_page = (key, total, page, records)
+    return cached[1:]
 
 
 # --- UI Layout ---
@@ -87,15 +247,25 @@ with st.sidebar:
     st.markdown("---")
     st.subheader("Current Stored Memories:")
 
-    current_memories = st.session_state.memory_store.get_all_memories()
-    if current_memories:
-        for i, mem in enumerate(current_memories):
-            st.markdown(f"**{i+1}.** **Content:** `{mem['content']}`")
-            st.markdown(f"   **Context:** `{mem['context']}`")
+    memory_store = session.memory_store
+    total_memories, page, records = sidebar_page(memory_store, st.session_state.get("sidebar_page_number", 1))
+    if total_memories:
+        page_count = (total_memories + SIDEBAR_PAGE_SIZE - 1) // SIDEBAR_PAGE_SIZE
+        if page_count > 1:
+            st.session_state.sidebar_page_number = page
+            st.number_input("Page", min_value=1, max_value=page_count, step=1, key="sidebar_page_number")
+        offset = (page - 1) * SIDEBAR_PAGE_SIZE
+        st.caption(f"Showing {offset + 1}-{min(offset + SIDEBAR_PAGE_SIZE, total_memories)} of {total_memories} memories")
+        for i, mem in enumerate(records, start=offset):
+            st.markdown(f"**{i+1}.** **Content:** `{mem.content}`")
+            st.markdown(f"   **Context:** `{mem.context}`")
             st.markdown("---")
     else:
         st.write("No memories stored yet.")
 
+    with st.expander("Performance Metrics"):
+        st.json(metrics.snapshot())
+
 # --- Main Chat Interface ---
 for message in st.session_state.chat_history:
     if isinstance(message, HumanMessage):
@@ -112,23 +282,44 @@ if prompt := st.chat_input("Type your message here..."):
         st.markdown(prompt)
 
     with st.chat_message("assistant"):
-        with st.spinner("AI is thinking..."):
-            try:
-                response = chain.run(input=prompt)
-                ai_response_content = ""
-                if "save_user_memory" in response:
-                    save_user_memory.func(content=prompt, context="user preference")
-                    ai_response_content = "I've saved that for you."
-                elif "retrieve_user_memories" in response:
-                    memories = retrieve_user_memories.func(query=prompt)
-                    ai_response_content = memories
+        try:
+            with st.spinner("AI is thinking..."):
+                # Clear-cut turns are routed locally; only uncertain ones pay for an LLM call.
+                decision = get_router().route(prompt)
+                prefetch = None
+                if decision.confident:
+                    intent = decision.intent
                 else:
-                    ai_response_content = response
+                    if SPECULATIVE_PREFETCH:
+                        # Hides the query embedding and search behind the routing LLM call.
+                        prefetch = session.memory_store.prefetch_memories(prompt)
+                    try:
+                        intent = intent_from_llm_response(get_chain().run(input=prompt))
+                    except Exception:
+                        if prefetch is not None:
+                            prefetch.cancel()
+                        raise
+                logger.debug("Turn routed", extra={"intent": intent, "confidence": decision.confidence,
+                                                   "source": decision.source if decision.confident else "llm"})
+                save_user_memory, retrieve_user_memories = session.tools
+                memories = ""
+                if intent == INTENT_RETRIEVE:
+                    memories = retrieve_user_memories.func(query=prompt, prefetch=prefetch)
+                elif prefetch is not None:
+                    prefetch.cancel()
+                if intent == INTENT_SAVE:
+                    save_user_memory.func(content=prompt, context="user preference")
+                    get_consolidation_job().schedule(session.memory_store)
 
+            if intent == INTENT_SAVE:
+                ai_response_content = "I've saved that for you."
                 st.markdown(ai_response_content)
-                st.session_state.chat_history.append(AIMessage(content=ai_response_content))
-            except Exception as e:
-                st.error(f"An error occurred: {e}")
-                st.session_state.chat_history.append(AIMessage(content="Oops! Something went wrong. Please try again."))
+            else:
+                # Tokens are rendered as they arrive instead of after the whole answer.
+                ai_response_content = st.write_stream(stream_answer(prompt, intent, memories))
+            st.session_state.chat_history.append(AIMessage(content=ai_response_content))
+        except Exception as e:
+            st.error(f"An error occurred: {e}")
+            st.session_state.chat_history.append(AIMessage(content="Oops! Something went wrong. Please try again."))
 
     st.experimental_rerun()
\ No newline at end of file
@@ -0,0 +1,73 @@
+import json
+import logging
+import os
+import sys
+from typing import Optional
+
+# Every module logs under this namespace so applications can configure them together.
+LOGGER_NAMESPACE = "memory_agent"
+LOG_FORMAT_TEXT = "text"
+LOG_FORMAT_JSON = "json"
+
+# Attributes every LogRecord has; anything else was passed through extra= and is a structured field.
+_STANDARD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Returns the logger for a module, e.g. get_logger(__name__) -> "memory_agent.memory_tool"."""
+    return logging.getLogger(f"{LOGGER_NAMESPACE}.{name}")
+
+
+def _fields(record: logging.LogRecord) -> dict:
+    return {key: value for key, value in vars(record).items() if key not in _STANDARD_ATTRIBUTES}
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats each record as one JSON object per line, including fields passed via extra=."""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **_fields(record),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class KeyValueFormatter(logging.Formatter):
+    """Human-readable lines with structured fields appended as key=value pairs."""
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = _fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+def configure_logging(level: Optional[str] = None, log_format: Optional[str] = None) -> logging.Logger:
+    """
+    Sends memory_agent logs to stderr. Safe to call more than once.
+    Args:
+        level (str): Log level name. Defaults to MEMORY_LOG_LEVEL, or INFO.
+        log_format (str): "text" or "json". Defaults to MEMORY_LOG_FORMAT, or text.
+    Returns:
+        logging.Logger: The namespace logger.
+    """
+    level = (level or os.getenv("MEMORY_LOG_LEVEL") or "INFO").upper()
+    log_format = log_format or os.getenv("MEMORY_LOG_FORMAT") or LOG_FORMAT_TEXT
+    logger = logging.getLogger(LOGGER_NAMESPACE)
+    logger.setLevel(level)
+    handler = next((h for h in logger.handlers if getattr(h, "_memory_agent", False)), None)
+    if handler is None:
+        handler = logging.StreamHandler(sys.stderr)
+        handler._memory_agent = True
+        logger.addHandler(handler)
+        logger.propagate = False
+    handler.setFormatter(JsonFormatter() if log_format == LOG_FORMAT_JSON else KeyValueFormatter())
+    return logger
@@ -0,0 +1,155 @@
+import atexit
+import queue
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+from structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+# Durability modes for WriteBehindQueue.
+DURABILITY_ALWAYS = "always"      # Write and persist every memory on its own.
+DURABILITY_GROUP = "group"        # Coalesce writes for up to flush_interval_ms, then write and persist once.
+DURABILITY_SHUTDOWN = "shutdown"  # Write in batches, persist only on flush() or shutdown.
+DURABILITY_MODES = (DURABILITY_ALWAYS, DURABILITY_GROUP, DURABILITY_SHUTDOWN)
+
+
+class _FlushRequest:
+    def __init__(self, persist: bool):
+        self.persist = persist
+        self.done = threading.Event()
+
+
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """
+    Moves memory writes off the caller's thread.
+
+    Saves are enqueued and acknowledged immediately; a single worker thread
+    coalesces pending writes into batches and hands them to write_fn, persisting
+    according to the chosen durability mode.
+    """
+    def __init__(self, write_fn: Callable[[List[str], List[str]], None], persist_fn: Callable[[], None],
+                 durability: str = DURABILITY_GROUP, batch_size: int = 100, flush_interval_ms: int = 50):
+        """
+        Args:
+            write_fn (Callable): Writes a batch of (contents, contexts) to the vector store without persisting.
+            persist_fn (Callable): Persists the vector store to disk.
+            durability (str): One of "always", "group" or "shutdown".
+            batch_size (int): Maximum number of memories written in one batch.
+            flush_interval_ms (int): How long the worker waits for more writes before flushing a batch.
+        """
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode '{durability}'. Expected one of {DURABILITY_MODES}.")
+        self.write_fn = write_fn
+        self.persist_fn = persist_fn
+        self.durability = durability
+        self.batch_size = 1 if durability == DURABILITY_ALWAYS else batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.errors: List[Exception] = []
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="memory-write-behind", daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    @property
+    def pending(self) -> int:
+        """Number of memories enqueued but not yet written to the vector store."""
+        return self._pending
+
+    def on_worker_thread(self) -> bool:
+        """Whether the caller is this queue's worker, which must never wait for its own queue."""
+        return threading.current_thread() is self._worker
+
+    def enqueue(self, content: str, context: str = "") -> None:
+        """Queues a memory for writing and returns immediately."""
+        if self._closed:
+            raise RuntimeError("WriteBehindQueue is closed.")
+        with self._pending_lock:
+            self._pending += 1
+        self._queue.put((content, context))
+
+    def flush(self, persist: bool = True, timeout: Optional[float] = None) -> None:
+        """
+        Blocks until every memory enqueued so far has been written.
+        Args:
+            persist (bool): Whether to also persist the vector store once written.
+            timeout (float): Maximum number of seconds to wait. None waits forever.
+        """
+        if not self._worker.is_alive():
+            return
+        request = _FlushRequest(persist)
+        self._queue.put(request)
+        if not request.done.wait(timeout):
+            raise TimeoutError("Timed out waiting for pending memories to be written.")
+        if self.errors:
+            errors, self.errors = self.errors, []
+            raise RuntimeError(f"{len(errors)} memory write batch(es) failed; first error: {errors[0]}")
+
+    def close(self) -> None:
+        """Writes and persists everything pending, then stops the worker thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._worker.join()
+
+    def _run(self) -> None:
+        batch: List[Tuple[str, str]] = []
+        while True:
+            if batch:
+                timeout = max(0.0, deadline - time.monotonic())
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    self._write(batch)
+                    batch = []
+                    continue
+            else:
+                item = self._queue.get()
+                deadline = time.monotonic() + self.flush_interval
+
+            if item is _STOP:
+                self._write(batch)
+                self._persist()
+                return
+            if isinstance(item, _FlushRequest):
+                self._write(batch)
+                batch = []
+                if item.persist:
+                    self._persist()
+                item.done.set()
+                continue
+
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                batch = []
+
+    def _write(self, batch: List[Tuple[str, str]]) -> None:
+        if not batch:
+            return
+        try:
+            self.write_fn([content for content, _ in batch], [context for _, context in batch])
+            if self.durability != DURABILITY_SHUTDOWN:
+                self._persist()
+        except Exception as e:
+            logger.exception("Error writing queued memories", extra={"count": len(batch)})
+            self.errors.append(e)
+        finally:
+            with self._pending_lock:
+                self._pending -= len(batch)
+
+    def _persist(self) -> None:
+        try:
+            self.persist_fn()
+        except Exception as e:
+            logger.exception("Error persisting queued memories")
+            self.errors.append(e)
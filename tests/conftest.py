@@ -0,0 +1,39 @@
+import os
+import sys
+
+# Tests run fully offline: the hashing embedder needs no API key or network.
+os.environ.setdefault("MEMORY_EMBEDDING_BACKEND", "local")
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")))
+
+import time  # noqa: E402
+
+import pytest  # noqa: E402
+
+import memory_tool  # noqa: E402
+from hot_tier import hot_tier  # noqa: E402
+from query_cache import query_cache  # noqa: E402
+from registry import lexical_index_registry, vector_file_registry, vector_store_registry  # noqa: E402
+
+
+def _reset_shared_state() -> None:
+    # Let background work from the previous test land in its own directory first.
+    memory_tool._maintenance_executor.submit(lambda: None).result()
+    while memory_tool._hot_tier_loads:
+        time.sleep(0.01)
+    memory_tool.access_log.clear()
+    vector_store_registry.clear()
+    lexical_index_registry.clear()
+    vector_file_registry.clear()
+    hot_tier.clear()
+    query_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def persist_directory(tmp_path, monkeypatch):
+    """Gives every test its own Chroma directory and fresh process-wide caches."""
+    directory = str(tmp_path / "chroma_db_data")
+    monkeypatch.setattr(memory_tool, "PERSIST_DIRECTORY", directory)
+    monkeypatch.setattr(memory_tool, "VECTOR_FILE_DIRECTORY", os.path.join(directory, "vectors"))
+    _reset_shared_state()
+    yield directory
+    _reset_shared_state()
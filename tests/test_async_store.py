@@ -0,0 +1,30 @@
+import asyncio
+
+from memory_tool import RETRIEVAL_HYBRID, AsyncMemoryStore, get_tools
+
+
+def test_async_store_saves_counts_and_retrieves():
+    async def run():
+        store = AsyncMemoryStore("alice")
+        assert await store.asave_memories([("I have a cat named Miso", "pets"), ("I live in Lisbon", "")]) == 2
+        await store.asave_memory("I play the cello", "music")
+        assert await store.acount_memories() == 3
+        vector = await store.aretrieve_memories("cat named Miso", k=1)
+        hybrid = await store.aretrieve_memories("cello", k=1, mode=RETRIEVAL_HYBRID)
+        page = await store.aget_memories_page(limit=2)
+        return vector, hybrid, page
+
+    vector, hybrid, page = asyncio.run(run())
+    assert vector == [{"content": "I have a cat named Miso", "context": "pets"}]
+    assert hybrid == [{"content": "I play the cello", "context": "music"}]
+    assert len(page) == 2
+
+
+def test_async_tools_round_trip():
+    save_memory, retrieve_memories, _ = get_tools("alice")
+
+    async def run():
+        await save_memory.ainvoke({"content": "My name is Alice", "context": "identity"})
+        return await retrieve_memories.ainvoke("What is my name?")
+
+    assert "My name is Alice" in asyncio.run(run())
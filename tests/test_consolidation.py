@@ -0,0 +1,69 @@
+from consolidation import ConsolidationJob, consolidate_memories, merge_distinct
+from memory_tool import MemoryStore
+
+
+def contents(store):
+    return sorted(memory["content"] for memory in store.get_all_memories())
+
+
+def test_merge_distinct_drops_restatements_and_keeps_new_details():
+    assert merge_distinct(["I live in Lisbon, Portugal", "I live in Lisbon"]) == "I live in Lisbon, Portugal"
+    assert merge_distinct(["I live in Lisbon", "I live in Lisbon, Portugal"]) == "I live in Lisbon, Portugal"
+    assert merge_distinct(["I have a dog named Rex", "My sister plays cello in an orchestra"]) == \
+        "I have a dog named Rex; My sister plays cello in an orchestra"
+
+
+def test_merge_distinct_folds_rephrasings_and_spelling_variants():
+    restatements = ["blue is my favourite", "I like blue", "my favorite color is blue"]
+    assert merge_distinct(restatements) == "my favorite color is blue"
+    assert merge_distinct(restatements[::-1]) == "my favorite color is blue"
+    assert merge_distinct(["My favourite colour is blue.", "my favorite colors: blue"]) == "My favourite colour is blue."
+
+
+def test_merge_distinct_refuses_to_choose_between_conflicting_values():
+    assert merge_distinct(["My favorite color is red.", "My favorite color is blue."]) is None
+
+
+def test_consolidation_never_reverts_a_newer_fact():
+    store = MemoryStore("alice")
+    store.save_memory("My favorite color is blue.")
+    store.save_memory("My favorite color is red.")
+    result, _ = consolidate_memories(store, threshold=0.75)
+    assert result.clusters_merged == 0 and result.clusters_skipped == 1
+    assert contents(store) == ["My favorite color is blue.", "My favorite color is red."]
+
+
+def test_consolidation_merges_restatements_into_the_most_detailed_one():
+    store = MemoryStore("alice")
+    store.save_memory("I live in Lisbon, Portugal")
+    store.save_memory("I live in Lisbon")
+    store.save_memory("I play the piano on weekends")
+    result, _ = consolidate_memories(store, threshold=0.75)
+    assert result.clusters_merged == 1 and result.memories_removed == 1
+    assert contents(store) == ["I live in Lisbon, Portugal", "I play the piano on weekends"]
+
+
+def test_consolidation_merges_the_ways_of_stating_one_preference():
+    store = MemoryStore("alice")
+    for content in ("my favorite color is blue", "I like blue", "blue is my favourite"):
+        store.save_memory(content)
+    store.save_memory("I play the piano on weekends")
+    result, _ = consolidate_memories(store, threshold=0.25)
+    assert result.clusters_merged == 1 and result.memories_removed == 2
+    assert contents(store) == ["I play the piano on weekends", "my favorite color is blue"]
+
+
+def test_job_skips_users_whose_memories_have_not_changed():
+    store = MemoryStore("alice")
+    store.save_memory("I live in Lisbon, Portugal")
+    store.save_memory("I live in Lisbon, Portugal.")
+    job = ConsolidationJob(threshold=0.75, max_merges_per_second=1000)
+    job.schedule(store)
+    results = job.run_pending()
+    job.schedule(store)
+    results += job.run_pending()
+    job.schedule(store)
+    results += job.run_pending()
+    job.close()
+    assert [result.memories_removed for result in results] == [1, 0]
+    assert store.count_memories() == 1
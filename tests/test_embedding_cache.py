@@ -0,0 +1,78 @@
+import asyncio
+import threading
+import time
+
+import embedding_cache
+from embedding_cache import CachedEmbeddings
+from local_embedder import HashingEmbeddings
+
+
+class CountingEmbeddings(HashingEmbeddings):
+    def __init__(self):
+        super().__init__(dimensions=32)
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += len(texts)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        self.calls += 1
+        return super().embed_query(text)
+
+
+def test_repeated_texts_hit_memory_then_disk(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    model = CountingEmbeddings()
+    cache = CachedEmbeddings(model, cache_path=path)
+    first = cache.embed_documents(["I like jazz", "I like jazz", "I play tennis"])
+    assert model.calls == 2
+    assert cache.embed_documents(["I like jazz"]) == [first[0]]
+    assert model.calls == 2 and cache.stats["memory_hits"] == 1
+
+    restarted = CachedEmbeddings(model, cache_path=path)
+    assert restarted.embed_documents(["I play tennis"]) == [first[2]]
+    assert model.calls == 2 and restarted.stats["disk_hits"] == 1
+    # Queries and documents are cached separately.
+    restarted.embed_query("I play tennis")
+    assert model.calls == 3
+
+
+def test_disk_eviction_keeps_keys_that_are_hot_in_memory(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "TOUCH_BATCH_SIZE", 1)
+    path = str(tmp_path / "cache.sqlite3")
+    cache = CachedEmbeddings(CountingEmbeddings(), cache_path=path, max_disk_entries=3)
+    for text in ("a", "b", "c"):
+        cache.embed_documents([text])
+        time.sleep(0.01)
+    cache.embed_documents(["a"])  # a memory hit, refreshed on disk
+    time.sleep(0.01)
+    cache.embed_documents(["d"])
+    assert cache.stats["disk_evictions"] == 1
+    assert cache._disk_count == 3
+
+    model = CountingEmbeddings()
+    cold = CachedEmbeddings(model, cache_path=path, max_disk_entries=3)
+    cold.embed_documents(["a", "c", "d"])
+    assert model.calls == 0
+    cold.embed_documents(["b"])
+    assert model.calls == 1
+
+
+def test_async_paths_keep_sqlite_off_the_event_loop(tmp_path, monkeypatch):
+    cache = CachedEmbeddings(CountingEmbeddings(), cache_path=str(tmp_path / "cache.sqlite3"))
+    threads = []
+    lookup = cache._lookup
+
+    def recording_lookup(keys):
+        threads.append(threading.current_thread())
+        return lookup(keys)
+    monkeypatch.setattr(cache, "_lookup", recording_lookup)
+
+    async def embed():
+        return await cache.aembed_documents(["I like jazz"]), await cache.aembed_query("jazz")
+
+    documents, query = asyncio.run(embed())
+    assert documents == cache.embed_documents(["I like jazz"])
+    assert query == cache.embed_query("jazz")
+    assert len(threads) == 4 and all(thread is not threading.main_thread() for thread in threads[:2])
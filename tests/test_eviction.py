@@ -0,0 +1,95 @@
+import time
+
+import memory_tool
+from memory_tool import PINNED_IMPORTANCE, MemoryStore, access_log, clear_user_memories, vector_store_key
+from registry import vector_store_registry
+
+
+def wait_for_maintenance():
+    memory_tool._maintenance_executor.submit(lambda: None).result()
+
+
+def ids_of(store):
+    return [record.id for record in store.iter_memories()]
+
+
+def test_capacity_limit_evicts_down_to_target_in_background():
+    store = MemoryStore("alice", max_memories=10)
+    store.save_memories([(f"memory number {i}", "") for i in range(12)])
+    wait_for_maintenance()
+    assert store.count_memories() == 9  # EVICTION_TARGET_RATIO of the limit
+
+
+def test_capacity_eviction_keeps_important_and_recently_used_memories():
+    store = MemoryStore("alice", max_memories=4)
+    store.save_memories([("My name is Alice", ""), ("I like jazz", ""), ("I like rock", ""),
+                         ("I like opera", ""), ("I like salsa", "")])
+    wait_for_maintenance()
+    remaining = {memory["content"] for memory in store.get_all_memories()}
+    assert "My name is Alice" in remaining
+    assert len(remaining) == 3
+
+
+def test_ttl_expires_unused_memories_but_not_pinned_ones():
+    store = MemoryStore("alice", ttl_s=60)
+    store.save_memories([("I like jazz", ""), ("I am allergic to peanuts", "")])
+    pinned = ids_of(store)[1:]
+    store.set_importance(pinned, PINNED_IMPORTANCE)
+    assert store.evict_memories(now=time.time() + 3600) == 1
+    assert ids_of(store) == pinned
+
+
+def test_retrieval_refreshes_access_time(monkeypatch):
+    store = MemoryStore("alice", ttl_s=60)
+    now = time.time()
+    with monkeypatch.context() as patch:
+        patch.setattr(time, "time", lambda: now - 50)
+        store.save_memories([("I like jazz", ""), ("I play tennis", "")])
+    store.retrieve_memories("jazz", k=1)
+    access_log.flush()
+    # Only the retrieved memory was used recently enough to outlive the TTL.
+    assert store.evict_memories(now=now + 30) == 1
+    assert [memory["content"] for memory in store.get_all_memories()] == ["I like jazz"]
+
+
+def test_deleted_memories_drop_their_pending_access_times():
+    store = MemoryStore("alice")
+    store.save_memories([("I like jazz", ""), ("I play tennis", "")])
+    store.retrieve_memories("jazz", k=2)
+    assert access_log.pending == 2
+    clear_user_memories("alice")
+    assert access_log.pending == 0
+    assert access_log.flush() == 0
+
+
+def test_flush_reopens_collections_evicted_from_the_registry():
+    store = MemoryStore("alice", partitioning="user")
+    store.save_memory("I like jazz")
+    store.retrieve_memories("jazz", k=1)
+    vector_store_registry.discard(vector_store_key(store.collection_name))
+    assert access_log.flush() == 1
+
+
+def test_flush_skips_dropped_collections():
+    store = MemoryStore("alice", partitioning="user")
+    store.save_memory("I like jazz")
+    store.retrieve_memories("jazz", k=1)
+    client = store.vector_store._client
+    access_log.discard(store.collection_name)
+    client.delete_collection(store.collection_name)
+    vector_store_registry.discard(vector_store_key(store.collection_name))
+    access_log.record(store.collection_name, True, ["raced-with-the-drop"])
+    assert access_log.flush() == 0
+    assert store.collection_name not in [collection.name for collection in client.list_collections()]
+
+
+def test_unused_prefetch_does_not_count_as_access():
+    store = MemoryStore("alice")
+    store.save_memory("I like jazz")
+    prefetch = store.prefetch_memories("jazz", k=1)
+    prefetch._future.result()
+    prefetch.cancel()
+    assert access_log.pending == 0
+    prefetch = store.prefetch_memories("jazz", k=1)
+    assert prefetch.result() == [{"content": "I like jazz", "context": ""}]
+    assert access_log.pending == 1
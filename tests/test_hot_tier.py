@@ -0,0 +1,91 @@
+import time
+
+import numpy as np
+import pytest
+
+import memory_tool
+from hot_tier import DTYPE_FLOAT16, DTYPE_FLOAT32, DTYPE_INT8, DTYPES, HotTier, UserVectors, hot_tier, rescore
+from memory_tool import MemoryStore
+from metrics import SEARCH_SOURCE_TOTAL, metrics
+from query_cache import query_cache
+
+
+def wait_for_hot_tier_loads():
+    while memory_tool._hot_tier_loads:
+        time.sleep(0.01)
+
+
+def test_user_vectors_search_is_exact_cosine_top_k():
+    vectors = UserVectors(dimensions=3, capacity=1)
+    vectors.add(["x", "y", "xy"], [[1, 0, 0], [0, 2, 0], [1, 1, 0]], [{}, {}, {}])
+    assert [doc_id for doc_id, _ in vectors.search([3, 0.1, 0], k=2)] == ["x", "xy"]
+    vectors.add(["x"], [[0, 0, 1]], [{"content": "moved"}])
+    assert len(vectors) == 3 and vectors.payload("x") == {"content": "moved"}
+    assert vectors.search([0, 0, 1], k=1)[0][0] == "x"
+
+
+def test_hot_tier_evicts_least_recently_used_users_over_budget():
+    row_bytes = 4 * 4
+    tier = HotTier(max_bytes=2 * 2 * row_bytes, max_vectors_per_user=2)
+    for user in ("alice", "bob", "carol"):
+        tier.load(user, ["a", "b"], np.eye(2, 4).tolist(), [{}, {}])
+        tier.get("alice")
+    assert tier.get("bob") is None and tier.get("alice") is not None
+    assert tier.load("dave", ["a", "b", "c"], np.eye(3, 4).tolist(), [{}, {}, {}]) is None
+
+
+def test_searches_move_to_the_hot_tier_and_see_new_saves():
+    store = MemoryStore("alice")
+    store.save_memories([("I like jazz", ""), ("I live in Lisbon", "")])
+    metrics.reset()
+    store.retrieve_memories("jazz", k=1)
+    wait_for_hot_tier_loads()
+    assert hot_tier.get(store._cache_scope) is not None
+    store.save_memory("I have a cat named Miso", "pets")
+    assert store.retrieve_memories("cat named Miso", k=1) == [{"content": "I have a cat named Miso", "context": "pets"}]
+    assert metrics.counter_value(SEARCH_SOURCE_TOTAL, source="chroma", **store.metric_labels) == 1
+    assert metrics.counter_value(SEARCH_SOURCE_TOTAL, source="hot_tier", **store.metric_labels) == 1
+
+
+def test_quantized_vectors_are_smaller_and_rank_like_float32():
+    rng = np.random.default_rng(0)
+    data = rng.standard_normal((200, 64)).astype(np.float32)
+    ids = [str(i) for i in range(len(data))]
+    stored = {}
+    for dtype in DTYPES:
+        stored[dtype] = UserVectors(dimensions=64, capacity=len(ids), dtype=dtype)
+        stored[dtype].add(ids, data, [{}] * len(ids))
+    assert stored[DTYPE_INT8].nbytes < stored[DTYPE_FLOAT16].nbytes < stored[DTYPE_FLOAT32].nbytes
+    for query in data[:10]:
+        exact = stored[DTYPE_FLOAT32].search(query, k=3)
+        candidates = [doc_id for doc_id, _ in stored[DTYPE_INT8].search(query, k=12)]
+        rescored = rescore(query, candidates, [data[int(doc_id)] for doc_id in candidates], k=3)
+        assert [doc_id for doc_id, _ in rescored] == [doc_id for doc_id, _ in exact]
+    with pytest.raises(ValueError):
+        UserVectors(dimensions=64, dtype="int4")
+
+
+def test_store_rescores_quantized_hot_tier_hits(monkeypatch):
+    monkeypatch.setattr(memory_tool, "hot_tier", HotTier(dtype=DTYPE_INT8))
+    store = MemoryStore("alice")
+    store.save_memories([("I like jazz", ""), ("I live in Lisbon", ""), ("I have a cat named Miso", "pets")])
+    store.retrieve_memories("jazz", k=1)
+    wait_for_hot_tier_loads()
+    assert memory_tool.hot_tier.get(store._cache_scope).quantized
+    assert store.retrieve_memories("cat named Miso", k=1) == [{"content": "I have a cat named Miso", "context": "pets"}]
+
+
+def test_hot_tier_expires_so_writes_from_another_process_show_up(monkeypatch):
+    monkeypatch.setattr(query_cache, "ttl_s", 0.05)
+    monkeypatch.setattr(hot_tier, "ttl_s", 0.05)
+    store = MemoryStore("alice")
+    store.save_memory("I like jazz")
+    store.retrieve_memories("jazz", k=5)
+    wait_for_hot_tier_loads()
+    assert hot_tier.get(store._cache_scope) is not None
+    # Another worker's save reaches Chroma but not this process's hot tier.
+    store.vector_store._collection.add(ids=["from-another-worker"], documents=["I like opera"],
+                                       embeddings=[store.embeddings.embed_query("I like opera")],
+                                       metadatas=[{"user_id": "alice", "context": ""}])
+    time.sleep(0.1)
+    assert len(store.retrieve_memories("music", k=5)) == 2
@@ -0,0 +1,40 @@
+import os
+
+import pytest
+
+from intent_router import (DEFAULT_EXAMPLES_PATH, INTENT_CHAT, INTENT_RETRIEVE, INTENT_SAVE, IntentRouter,
+                           intent_from_llm_response, load_examples)
+
+EVAL_PATH = os.path.join(os.path.dirname(DEFAULT_EXAMPLES_PATH), "intent_eval.jsonl")
+
+
+@pytest.fixture(scope="module")
+def router():
+    return IntentRouter()
+
+
+@pytest.mark.parametrize("text, intent", [
+    ("My name is Jordan.", INTENT_SAVE),
+    ("Remember that I am allergic to peanuts", INTENT_SAVE),
+    ("What is my name?", INTENT_RETRIEVE),
+    ("Do I like hiking?", INTENT_RETRIEVE),
+    ("Tell me a joke", INTENT_CHAT),
+])
+def test_clear_turns_are_routed_locally(router, text, intent):
+    decision = router.route(text)
+    assert decision.intent == intent and decision.confident
+
+
+def test_confident_decisions_are_accurate_on_held_out_turns(router):
+    decisions = [(router.route(text), intent) for text, intent in load_examples(EVAL_PATH)]
+    confident = [(decision, intent) for decision, intent in decisions if decision.confident]
+    assert len(confident) >= 0.8 * len(decisions)
+    assert sum(decision.intent == intent for decision, intent in confident) >= 0.95 * len(confident)
+
+
+def test_unsure_decisions_defer_to_the_llm():
+    router = IntentRouter(examples=[("i like tea", INTENT_SAVE), ("what do i like", INTENT_RETRIEVE)], threshold=0.99)
+    assert not router.route("zebra").confident
+    assert intent_from_llm_response("I will use retrieve_user_memories") == INTENT_RETRIEVE
+    assert intent_from_llm_response("save_user_memory") == INTENT_SAVE
+    assert intent_from_llm_response("Hello there") == INTENT_CHAT
@@ -0,0 +1,14 @@
+import os
+import subprocess
+import sys
+
+SRC_DIRECTORY = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+LAZY_PACKAGES = ["chromadb", "langchain", "langchain_community", "langchain_google_genai", "pydantic"]
+
+
+def test_importing_memory_tool_defers_heavy_packages():
+    code = ("import sys, memory_tool; "
+            f"print(','.join(name for name in {LAZY_PACKAGES!r} if name in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code], cwd=SRC_DIRECTORY, capture_output=True, text=True,
+                            env=dict(os.environ, MEMORY_EMBEDDING_BACKEND="local"), check=True)
+    assert result.stdout.strip() == ""
@@ -0,0 +1,29 @@
+import numpy as np
+
+from local_embedder import HashingEmbeddings
+
+TEXTS = [f"memory number {i} about hiking and jazz" for i in range(64)]
+
+
+def test_vectors_are_deterministic_and_normalised():
+    first, second = HashingEmbeddings(dimensions=64), HashingEmbeddings(dimensions=64)
+    vectors = first.embed_array(TEXTS[:3])
+    assert np.allclose(vectors, second.embed_array(TEXTS[:3]))
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+    assert first.embed_query(TEXTS[0]) == first.embed_documents([TEXTS[0]])[0]
+
+
+def test_similar_texts_are_closer_than_unrelated_ones():
+    embedder = HashingEmbeddings()
+    jazz, jazz_again, tax = embedder.embed_array(["I love jazz music", "I really love jazz", "file the tax return"])
+    assert jazz @ jazz_again > jazz @ tax
+
+
+def test_large_batches_use_a_spawned_process_pool():
+    embedder = HashingEmbeddings(dimensions=64, max_workers=2, parallel_threshold=16)
+    try:
+        parallel = embedder.embed_array(TEXTS)
+        assert embedder._pool._mp_context.get_start_method() == "spawn"
+    finally:
+        embedder._pool.shutdown()
+    assert np.allclose(parallel, HashingEmbeddings(dimensions=64).embed_array(TEXTS))
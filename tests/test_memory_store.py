@@ -0,0 +1,72 @@
+from memory_tool import DEDUP_MERGE, DEDUP_SKIP, DEDUP_UPDATE, OPERATION_SECONDS, MemoryStore, clear_user_memories
+from metrics import metrics
+
+
+def operation_count(operation):
+    return sum(series["count"] for series in metrics.snapshot().get(OPERATION_SECONDS, [])
+               if series["labels"].get("operation") == operation)
+
+
+def test_save_memories_embeds_in_one_batch_and_persists_once():
+    store = MemoryStore("alice")
+    metrics.reset()
+    assert store.save_memories([(f"memory number {i}", "bulk") for i in range(50)]) == 50
+    assert operation_count("embed") == 1
+    assert operation_count("persist") == 1
+    assert store.count_memories() == 50
+    assert store.save_memories([]) == 0
+
+
+def test_clear_user_memories_deletes_only_that_user_in_batches():
+    alice, bob = MemoryStore("alice"), MemoryStore("bob")
+    alice.save_memories([(f"alice memory {i}", "") for i in range(7)])
+    bob.save_memories([("bob memory", "")])
+    assert alice.count_memories() == 7
+    progress = []
+    assert clear_user_memories("alice", batch_size=3, progress_callback=progress.append) == 7
+    assert progress == [3, 6, 7]
+    assert alice.count_memories() == 0
+    assert alice.retrieve_memories("alice memory") == []
+    assert bob.get_all_memories() == [{"content": "bob memory", "context": ""}]
+
+
+def test_memories_are_paged_and_streamed_as_records():
+    store = MemoryStore("alice")
+    store.save_memories([(f"memory number {i}", "paged") for i in range(7)])
+    pages = [store.get_memories_page(limit=3, offset=offset) for offset in (0, 3, 6, 9)]
+    assert [len(page) for page in pages] == [3, 3, 1, 0]
+    records = list(store.iter_memories(page_size=2))
+    assert sorted(record.content for record in records) == sorted(f"memory number {i}" for i in range(7))
+    assert {record.id for page in pages for record in page} == {record.id for record in records}
+    contents_only = store.get_memories_page(limit=1, fields=("content",))[0]
+    assert contents_only.context is None and contents_only.content.startswith("memory number")
+    assert contents_only.to_dict() == {"content": contents_only.content, "context": None}
+
+
+def test_near_duplicate_saves_are_skipped_updated_or_merged():
+    skip = MemoryStore("alice", dedup=DEDUP_SKIP, dedup_threshold=0.85)
+    skip.save_memories([("My favorite color is blue", "colors"), ("I live in Lisbon", "")])
+    skip.save_memory("My favorite color is deep blue", "update")
+    assert skip.count_memories() == 2
+
+    update = MemoryStore("bob", dedup=DEDUP_UPDATE, dedup_threshold=0.85)
+    update.save_memory("My favorite color is deep blue", "colors")
+    update.save_memory("My favorite color is blue", "update")
+    assert update.get_all_memories() == [{"content": "My favorite color is blue", "context": "update"}]
+
+    merge = MemoryStore("carol", dedup=DEDUP_MERGE, dedup_threshold=0.85)
+    merge.save_memory("My favorite color is deep blue", "colors")
+    merge.save_memory("My favorite color is blue", "chat")
+    assert merge.get_all_memories() == [{"content": "My favorite color is deep blue", "context": "colors; chat"}]
+    assert merge.retrieve_memories("favorite color", k=3) == merge.get_all_memories()
+
+
+def test_near_duplicates_within_one_batch_are_suppressed():
+    skip = MemoryStore("alice", dedup=DEDUP_SKIP)
+    assert skip.save_memories([("My favorite color is blue", ""), ("My favorite color is blue", ""),
+                               ("I live in Lisbon", "")]) == 2
+    assert skip.count_memories() == 2
+
+    merge = MemoryStore("bob", dedup=DEDUP_MERGE, dedup_threshold=0.85)
+    merge.save_memories([("My favorite color is blue", "chat"), ("My favorite color is deep blue", "colors")])
+    assert merge.get_all_memories() == [{"content": "My favorite color is deep blue", "context": "chat; colors"}]
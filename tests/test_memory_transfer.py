@@ -0,0 +1,111 @@
+import gzip
+import json
+
+import pytest
+
+import memory_tool
+import memory_transfer
+from memory_tool import MemoryStore
+from memory_transfer import export_memories, import_memories
+
+
+def contents(store):
+    return sorted(memory["content"] for memory in store.get_all_memories())
+
+
+def save_facts(user_id, count, **kwargs):
+    store = MemoryStore(user_id, **kwargs)
+    store.save_memories([(f"{user_id} fact number {i}", "ctx") for i in range(count)])
+    return store
+
+
+def test_round_trip_reuses_exported_embeddings(tmp_path, monkeypatch):
+    alice = save_facts("alice", 5)
+    path = str(tmp_path / "backup.jsonl.gz")
+    assert export_memories(path, include_embeddings=True, batch_size=2) == 5
+    with gzip.open(path, "rt") as f:
+        assert {"id", "user_id", "content", "metadata", "embedding", "model"} <= set(json.loads(f.readline()))
+
+    def no_embedding(texts):
+        raise AssertionError("exported embeddings should have been reused")
+    monkeypatch.setattr(memory_tool.get_embeddings(), "embed_documents", no_embedding)
+    assert import_memories(path, collection_name="restored", batch_size=2) == 5
+    restored = MemoryStore("alice", collection_name="restored")
+    assert contents(restored) == contents(alice)
+
+
+def test_interrupted_import_resumes_from_checkpoint(tmp_path, monkeypatch):
+    save_facts("alice", 7)
+    path = str(tmp_path / "backup.jsonl")
+    export_memories(path)
+    calls = []
+    import_batch = memory_transfer._import_batch
+
+    def failing_import_batch(*args):
+        calls.append(1)
+        if len(calls) == 3:
+            raise RuntimeError("interrupted")
+        import_batch(*args)
+    monkeypatch.setattr(memory_transfer, "_import_batch", failing_import_batch)
+    with pytest.raises(RuntimeError):
+        import_memories(path, collection_name="restored", batch_size=2)
+    monkeypatch.setattr(memory_transfer, "_import_batch", import_batch)
+    assert import_memories(path, collection_name="restored", batch_size=2) == 3
+    assert MemoryStore("alice", collection_name="restored").count_memories() == 7
+    assert not (tmp_path / "backup.jsonl.checkpoint").exists()
+
+
+def test_resume_counts_records_not_lines(tmp_path, monkeypatch):
+    path = tmp_path / "handwritten.jsonl"
+    records = [{"id": f"id-{i}", "user_id": "alice", "content": f"alice fact number {i}", "metadata": {}}
+               for i in range(6)]
+    path.write_text("\n\n".join(json.dumps(record) for record in records) + "\n", encoding="utf-8")
+    import_batch = memory_transfer._import_batch
+
+    def failing_import_batch(records, *args):
+        if records[0]["id"] == "id-4":
+            raise RuntimeError("interrupted")
+        import_batch(records, *args)
+    monkeypatch.setattr(memory_transfer, "_import_batch", failing_import_batch)
+    with pytest.raises(RuntimeError):
+        import_memories(str(path), batch_size=2)
+    monkeypatch.setattr(memory_transfer, "_import_batch", import_batch)
+    assert import_memories(str(path), batch_size=2) == 2
+    assert contents(MemoryStore("alice")) == sorted(record["content"] for record in records)
+
+
+def test_import_as_another_user_copies_instead_of_taking_over(tmp_path):
+    alice = save_facts("alice", 3)
+    path = str(tmp_path / "alice.jsonl")
+    export_memories(path, user_id="alice", include_embeddings=True)
+    import_memories(path, user_id="bob")
+    import_memories(path, user_id="bob", restart=True)  # replaying the import changes nothing
+    bob = MemoryStore("bob")
+    assert alice.count_memories() == 3 and bob.count_memories() == 3
+    assert contents(bob) == contents(alice)
+
+
+def test_export_without_user_covers_every_partition(tmp_path):
+    save_facts("alice", 2, partitioning="user")
+    save_facts("bob", 3, partitioning="user")
+    path = str(tmp_path / "all.jsonl")
+    assert export_memories(path, partitioning="user") == 5
+    assert import_memories(path, collection_name="merged") == 5
+    assert MemoryStore("bob", collection_name="merged").count_memories() == 3
+
+
+def test_import_applies_capacity_limits(tmp_path):
+    save_facts("alice", 12)
+    path = str(tmp_path / "alice.jsonl")
+    export_memories(path)
+    import_memories(path, collection_name="restored", max_memories=10)
+    memory_tool._maintenance_executor.submit(lambda: None).result()
+    assert MemoryStore("alice", collection_name="restored").count_memories() == 9
+
+
+def test_parquet_round_trip(tmp_path):
+    pytest.importorskip("pyarrow.parquet", exc_type=ImportError)
+    save_facts("alice", 3)
+    path = str(tmp_path / "alice.parquet")
+    assert export_memories(path, include_embeddings=True) == 3
+    assert import_memories(path, collection_name="restored") == 3
@@ -0,0 +1,49 @@
+import json
+import logging
+
+import pytest
+
+from memory_tool import MemoryStore, access_log
+from metrics import ITEMS_TOTAL, OPERATION_SECONDS, metrics
+from structured_logging import JsonFormatter, KeyValueFormatter
+
+
+def collection_labels():
+    return {(series["labels"].get("collection"), series["labels"].get("partitioning"))
+            for values in metrics.snapshot().values() for series in values if "collection" in series["labels"]}
+
+
+def test_partitioned_stores_label_metrics_with_base_collection():
+    metrics.reset()
+    for user_id in ("alice", "bob", "carol"):
+        store = MemoryStore(user_id, partitioning="user")
+        store.save_memories([("I like jazz", "")])
+        store.retrieve_memories("music")
+    access_log.flush()
+    assert collection_labels() == {("user_memories", "user")}
+    assert "alice" not in metrics.to_prometheus()
+
+
+def test_timer_records_latency_and_errors():
+    metrics.reset()
+    with metrics.timer(OPERATION_SECONDS, operation="search", collection="user_memories"):
+        pass
+    with pytest.raises(ValueError):
+        with metrics.timer(OPERATION_SECONDS, operation="search", collection="user_memories"):
+            raise ValueError("boom")
+    metrics.inc(ITEMS_TOTAL, 3, stage="add", collection="user_memories")
+    [series] = metrics.snapshot()[OPERATION_SECONDS]
+    assert series["count"] == 2
+    assert metrics.counter_value("memory_operation_errors_total", operation="search", collection="user_memories") == 1
+    text = metrics.to_prometheus()
+    assert 'memory_items_total{collection="user_memories",stage="add"} 3' in text
+    assert "memory_operation_seconds_bucket" in text
+
+
+def test_log_formatters_include_structured_fields():
+    record = logging.LogRecord("memory_agent.memory_tool", logging.INFO, __file__, 1, "Saved", (), None)
+    record.user_id = "alice"
+    record.count = 2
+    entry = json.loads(JsonFormatter().format(record))
+    assert (entry["message"], entry["user_id"], entry["count"]) == ("Saved", "alice", 2)
+    assert KeyValueFormatter().format(record).endswith("Saved user_id=alice count=2")
@@ -0,0 +1,45 @@
+import os
+
+import pytest
+
+from hot_tier import DTYPE_FLOAT32, DTYPE_INT8
+from memory_tool import MemoryStore
+from metrics import SEARCH_SOURCE_TOTAL, metrics
+from mmap_store import MappedUserVectors, write_vector_file
+
+
+@pytest.mark.parametrize("dtype", [DTYPE_FLOAT32, DTYPE_INT8])
+def test_vector_file_round_trip(tmp_path, dtype):
+    path = str(tmp_path / "alice.memvec")
+    write_vector_file(path, ["a", "b", "c"], [[1, 0, 0], [0, 1, 0], [1, 1, 0]],
+                      ["first", "second", "naïve third"], ["", "ctx", ""], dtype=dtype)
+    mapped = MappedUserVectors(path)
+    assert len(mapped) == 3 and mapped.quantized == (dtype != DTYPE_FLOAT32)
+    assert list(mapped.iter_records(1)) == [("b", "second", "ctx"), ("c", "naïve third", "")]
+    assert [mapped.id_at(i) for i, _ in mapped.search([0, 2, 0.1], k=2)] == ["b", "c"]
+    mapped.close()
+
+
+def test_store_serves_from_vector_file_until_the_next_write():
+    store = MemoryStore("alice", use_hot_tier=False, serve_from_vector_file=True)
+    store.save_memories([("I like jazz", ""), ("I have a cat named Miso", "pets")])
+    path = store.export_vector_file()
+    metrics.reset()
+    assert store.retrieve_memories("cat named Miso", k=1) == [{"content": "I have a cat named Miso", "context": "pets"}]
+    assert {record.content for record in store.iter_memories()} == {"I like jazz", "I have a cat named Miso"}
+    assert metrics.counter_value(SEARCH_SOURCE_TOTAL, source="vector_file", **store.metric_labels) == 1
+    store.save_memory("I live in Lisbon")
+    assert not os.path.exists(path)
+    assert store.count_memories() == 3
+
+
+def test_store_drops_mappings_of_files_removed_or_rewritten_elsewhere():
+    store = MemoryStore("alice", use_hot_tier=False, serve_from_vector_file=True)
+    store.save_memories([("I like jazz", ""), ("I have a cat named Miso", "pets")])
+    path = store.export_vector_file()
+    assert len(store.get_memories_page()) == 2
+    # Another process rewrites the file with a third memory, then deletes it.
+    write_vector_file(path, ["a", "b", "c"], [[1, 0], [0, 1], [1, 1]], ["one", "two", "three"], ["", "", ""])
+    assert [record.content for record in store.get_memories_page()] == ["one", "two", "three"]
+    os.remove(path)
+    assert {record.content for record in store.get_memories_page()} == {"I like jazz", "I have a cat named Miso"}
@@ -0,0 +1,43 @@
+import pytest
+
+from memory_tool import (PARTITION_BUCKET, PARTITION_USER, MemoryStore, access_log, clear_user_memories,
+                         migrate_to_partitions, partition_collection_name)
+
+
+def test_partition_collection_names():
+    assert partition_collection_name("alice") == "user_memories"
+    assert partition_collection_name("alice", partitioning=PARTITION_USER).startswith("user_memories_u_")
+    assert partition_collection_name("alice", partitioning=PARTITION_BUCKET, num_buckets=8) in {
+        f"user_memories_b_{i:04d}" for i in range(8)}
+    with pytest.raises(ValueError):
+        partition_collection_name("alice", partitioning="tenant")
+
+
+@pytest.mark.parametrize("partitioning", [PARTITION_USER, PARTITION_BUCKET])
+def test_partitioned_users_are_isolated(partitioning):
+    alice = MemoryStore("alice", partitioning=partitioning, num_buckets=1)
+    bob = MemoryStore("bob", partitioning=partitioning, num_buckets=1)
+    alice.save_memories([("I like jazz", ""), ("I live in Lisbon", "")])
+    bob.save_memories([("I like opera", "")])
+    assert alice.count_memories() == 2
+    assert bob.retrieve_memories("music", k=5) == [{"content": "I like opera", "context": ""}]
+    assert clear_user_memories("bob", partitioning=partitioning, num_buckets=1) == 1
+    assert alice.count_memories() == 2
+
+
+def test_migrate_to_partitions_moves_memories_to_user_collections():
+    shared = MemoryStore("alice")
+    shared.save_memories([("I like jazz", ""), ("I live in Lisbon", "")])
+    MemoryStore("bob").save_memories([("I like opera", "")])
+    # Warm every per-process cache of the shared collection first.
+    assert shared.count_memories() == 2
+    assert len(shared.retrieve_memories("jazz", k=5)) == 2
+    assert len(shared.retrieve_memories("jazz", k=5, mode="lexical")) == 1
+    assert migrate_to_partitions(partitioning=PARTITION_USER, delete_source=True) == 3
+    assert access_log.pending == 0
+    assert shared.count_memories() == 0
+    assert shared.retrieve_memories("jazz", k=5) == []
+    assert shared.retrieve_memories("jazz", k=5, mode="lexical") == []
+    alice = MemoryStore("alice", partitioning=PARTITION_USER)
+    assert {memory["content"] for memory in alice.get_all_memories()} == {"I like jazz", "I live in Lisbon"}
+    assert alice.retrieve_memories("jazz", k=1) == [{"content": "I like jazz", "context": ""}]
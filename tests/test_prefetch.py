@@ -0,0 +1,47 @@
+from memory_tool import (PREFETCH_CANCELLED, PREFETCH_FAILED, PREFETCH_STALE, PREFETCH_TOTAL, PREFETCH_USED,
+                         PREFETCH_WASTED, MemoryStore, MemoryTools)
+from metrics import metrics
+
+
+def test_failed_prefetch_falls_back_to_a_fresh_retrieval():
+    store = MemoryStore("alice")
+    store.save_memories([("I like jazz", "")])
+    metrics.reset()
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("search backend unavailable")
+
+    store._retrieve_hits = fail
+    prefetch = store.prefetch_memories("jazz", k=1)
+    prefetch._future.exception()
+    del store._retrieve_hits
+    assert prefetch.result() == [{"content": "I like jazz", "context": ""}]
+    assert metrics.counter_value(PREFETCH_TOTAL, outcome=PREFETCH_FAILED, **store.metric_labels) == 1
+
+
+def test_prefetch_is_used_or_recomputed_after_a_write():
+    store = MemoryStore("alice")
+    store.save_memories([("I like jazz", "")])
+    metrics.reset()
+    prefetch = store.prefetch_memories("music", k=1)
+    assert prefetch.matches(store, "music", 1) and not prefetch.matches(store, "music", 2)
+    assert prefetch.result() == [{"content": "I like jazz", "context": ""}]
+
+    prefetch = store.prefetch_memories("cat", k=1)
+    prefetch._future.result()
+    store.save_memory("I have a cat named Miso", "pets")
+    assert prefetch.result() == [{"content": "I have a cat named Miso", "context": "pets"}]
+    assert metrics.counter_value(PREFETCH_TOTAL, outcome=PREFETCH_USED, **store.metric_labels) == 1
+    assert metrics.counter_value(PREFETCH_TOTAL, outcome=PREFETCH_STALE, **store.metric_labels) == 1
+
+
+def test_retrieve_tool_uses_a_matching_prefetch_and_cancels_others():
+    store = MemoryStore("alice")
+    store.save_memories([("I like jazz", "")])
+    tools = MemoryTools("alice", memory_store=store)
+    metrics.reset()
+    assert "I like jazz" in tools.retrieve_user_memories("music", prefetch=store.prefetch_memories("music"))
+    assert "I like jazz" in tools.retrieve_user_memories("jazz", prefetch=store.prefetch_memories("music"))
+    assert metrics.counter_value(PREFETCH_TOTAL, outcome=PREFETCH_USED, **store.metric_labels) == 1
+    assert (metrics.counter_value(PREFETCH_TOTAL, outcome=PREFETCH_CANCELLED, **store.metric_labels)
+            + metrics.counter_value(PREFETCH_TOTAL, outcome=PREFETCH_WASTED, **store.metric_labels)) == 1
@@ -0,0 +1,78 @@
+import time
+
+from memory_tool import MemoryStore
+from query_cache import QueryResultCache, query_cache
+
+SCOPE = ("user_memories", "alice")
+HITS = [("id-1", {"content": "I like jazz", "context": ""})]
+
+
+def test_results_are_served_until_the_scope_is_written():
+    cache = QueryResultCache()
+    cache.put(SCOPE, "What music?", 3, None, HITS, cache.generation(SCOPE))
+    assert cache.get(SCOPE, "  what music ", 3) == HITS
+    cache.bump(SCOPE)
+    assert cache.get(SCOPE, "what music", 3) is None
+
+
+def test_results_computed_before_a_write_are_not_cached():
+    cache = QueryResultCache()
+    generation = cache.generation(SCOPE)
+    cache.bump(SCOPE)
+    cache.put(SCOPE, "music", 3, None, HITS, generation)
+    assert cache.get(SCOPE, "music", 3) is None
+
+
+def test_results_and_counts_expire_after_ttl():
+    cache = QueryResultCache(ttl_s=0.05)
+    cache.put(SCOPE, "music", 3, None, HITS, 0)
+    cache.put_count(SCOPE, 0, 0)
+    assert cache.get_count(SCOPE) == 0
+    time.sleep(0.1)
+    assert cache.get(SCOPE, "music", 3) is None
+    assert cache.get_count(SCOPE) is None
+
+
+def test_tracked_scopes_are_bounded():
+    cache = QueryResultCache(max_scopes=2)
+    for user in ("alice", "bob", "carol"):
+        scope = ("user_memories", user)
+        cache.bump(scope)
+        cache.put(scope, "music", 3, None, HITS, cache.generation(scope))
+        cache.put_count(scope, 1, cache.generation(scope))
+    assert len(cache._generations) == 2
+    assert cache.get(("user_memories", "alice"), "music", 3) is None
+    assert cache.get_count(("user_memories", "alice")) is None
+    assert cache.get(("user_memories", "carol"), "music", 3) == HITS
+
+
+def test_writes_from_another_process_show_up_after_ttl(monkeypatch):
+    monkeypatch.setattr(query_cache, "ttl_s", 0.05)
+    store = MemoryStore("alice", use_hot_tier=False)
+    store.save_memory("I like opera")
+    opera = [{"content": "I like opera", "context": ""}]
+    assert store.retrieve_memories("jazz", k=5) == opera
+    # Another worker's save reaches Chroma but not this process's write generations.
+    store.vector_store._collection.add(ids=["from-another-worker"], documents=["I like jazz"],
+                                       embeddings=[store.embeddings.embed_query("I like jazz")],
+                                       metadatas=[{"user_id": "alice", "context": ""}])
+    assert store.retrieve_memories("jazz", k=5) == opera
+    time.sleep(0.1)
+    assert store.retrieve_memories("jazz", k=5)[0] == {"content": "I like jazz", "context": ""}
+
+
+def test_emptiness_check_fetches_at_most_one_id(monkeypatch):
+    store = MemoryStore("alice", use_hot_tier=False)
+    store.save_memories([(f"memory number {i}", "") for i in range(20)])
+    limits = []
+    collection_type = type(store.vector_store._collection)
+    get = collection_type.get
+
+    def recording_get(collection, *args, **kwargs):
+        limits.append(kwargs.get("limit"))
+        return get(collection, *args, **kwargs)
+
+    monkeypatch.setattr(collection_type, "get", recording_get)
+    assert len(store.retrieve_memories("memory number 7", k=2)) == 2
+    assert limits == [1]
+    assert MemoryStore("bob", use_hot_tier=False).retrieve_memories("memory") == []
@@ -0,0 +1,66 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from memory_tool import MemoryStore, get_vector_store, vector_store_key, warm_up
+from registry import ResourceRegistry, vector_store_registry
+
+
+def slow_factory(value, calls):
+    def build():
+        calls.append(value)
+        time.sleep(0.2)
+        return value
+    return build
+
+
+def test_same_key_is_built_once_for_concurrent_callers():
+    registry, calls = ResourceRegistry("test"), []
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: registry.get("key", slow_factory("value", calls)), range(8)))
+    assert results == ["value"] * 8 and calls == ["value"]
+
+
+def test_slow_build_does_not_block_other_keys():
+    registry, calls = ResourceRegistry("test"), []
+    started = threading.Event()
+
+    def blocked_build():
+        started.set()
+        time.sleep(1.0)
+        return "slow"
+    threading.Thread(target=registry.get, args=("slow", blocked_build), daemon=True).start()
+    started.wait()
+    start = time.monotonic()
+    assert registry.get("fast", lambda: "fast") == "fast"
+    assert time.monotonic() - start < 0.5
+
+
+def test_failed_build_is_retried_by_the_next_caller():
+    registry = ResourceRegistry("test")
+
+    def failing():
+        raise RuntimeError("boom")
+    with pytest.raises(RuntimeError):
+        registry.get("key", failing)
+    assert registry.get("key", lambda: "value") == "value"
+
+
+def test_least_recently_used_items_are_dropped():
+    registry = ResourceRegistry("test", max_items=2)
+    for key in ("a", "b", "c"):
+        registry.get(key, lambda key=key: key)
+    assert registry.keys() == ["b", "c"]
+
+
+def test_stores_share_one_vector_store_handle():
+    assert MemoryStore("alice").vector_store is MemoryStore("bob").vector_store is get_vector_store()
+
+
+def test_warm_up_opens_the_shared_vector_store_in_the_background():
+    warm_up().join()
+    warmed = vector_store_registry.peek(vector_store_key("user_memories"))
+    assert warmed is not None
+    assert MemoryStore("alice").vector_store is warmed
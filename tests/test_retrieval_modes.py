@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+from memory_tool import CHROMA_EXECUTOR_WORKERS, MemoryStore, MemoryTools
+from query_cache import query_cache
+
+MEMORIES = [("My dog is called Rex", "pets"), ("I work as a nurse in Porto", "job"),
+            ("My passport number is X1234567", "documents"), ("I enjoy hiking on weekends", "hobbies")]
+
+
+def test_lexical_mode_matches_exact_terms():
+    store = MemoryStore("alice")
+    store.save_memories(MEMORIES)
+    assert store.retrieve_memories("X1234567", k=1, mode="lexical")[0]["content"] == "My passport number is X1234567"
+
+
+def test_hybrid_mode_fuses_both_rankings():
+    store = MemoryStore("alice", retrieval_mode="hybrid")
+    store.save_memories(MEMORIES)
+    memories = store.retrieve_memories("what is my passport number X1234567", k=2)
+    assert memories[0]["content"] == "My passport number is X1234567"
+    assert len(memories) == 2
+
+
+def test_concurrent_async_hybrid_retrievals_do_not_exhaust_the_executor():
+    store = MemoryStore("alice", retrieval_mode="hybrid", use_query_cache=False)
+    store.save_memories(MEMORIES)
+    tools = MemoryTools("alice", memory_store=store)
+
+    async def retrieve_many():
+        calls = [tools.aretrieve_user_memories(f"hiking trip {i}") for i in range(CHROMA_EXECUTOR_WORKERS * 2)]
+        return await asyncio.wait_for(asyncio.gather(*calls), timeout=30)
+
+    results = asyncio.run(retrieve_many())
+    assert all("I enjoy hiking on weekends" in result for result in results)
+
+
+def test_lexical_index_is_rebuilt_after_the_cache_ttl(monkeypatch):
+    monkeypatch.setattr(query_cache, "ttl_s", 0.05)
+    store = MemoryStore("alice")
+    store.save_memories(MEMORIES)
+    assert store.retrieve_memories("X1234567", k=1, mode="lexical")[0]["content"] == "My passport number is X1234567"
+    # Another worker deletes the memory and saves a new one: Chroma changes, this process's index does not.
+    collection = store.vector_store._collection
+    collection.delete(where={"$and": [{"user_id": "alice"}, {"context": "documents"}]})
+    collection.add(ids=["from-another-worker"], documents=["My new passport number is Y7654321"],
+                   embeddings=[store.embeddings.embed_query("My new passport number is Y7654321")],
+                   metadatas=[{"user_id": "alice", "context": "documents"}])
+    time.sleep(0.1)
+    assert [memory["content"] for memory in store.retrieve_memories("passport X1234567 Y7654321", k=2,
+                                                                     mode="lexical")] == [
+        "My new passport number is Y7654321"]
@@ -0,0 +1,91 @@
+import threading
+
+import pytest
+
+from memory_tool import MemoryStore
+from write_behind import DURABILITY_ALWAYS, DURABILITY_GROUP, DURABILITY_SHUTDOWN, WriteBehindQueue
+
+
+def recording_queue(durability, **kwargs):
+    batches, persists = [], []
+    writer = WriteBehindQueue(write_fn=lambda contents, contexts: batches.append(list(contents)),
+                              persist_fn=lambda: persists.append(len(batches)), durability=durability, **kwargs)
+    return writer, batches, persists
+
+
+def test_group_durability_coalesces_writes_into_one_batch():
+    writer, batches, persists = recording_queue(DURABILITY_GROUP, flush_interval_ms=200)
+    for i in range(5):
+        writer.enqueue(f"memory {i}")
+    writer.flush()
+    assert batches == [[f"memory {i}" for i in range(5)]]
+    assert persists[0] == 1
+    writer.close()
+
+
+def test_always_durability_writes_and_persists_each_memory():
+    writer, batches, persists = recording_queue(DURABILITY_ALWAYS)
+    for i in range(3):
+        writer.enqueue(f"memory {i}")
+    writer.flush(persist=False)
+    assert batches == [["memory 0"], ["memory 1"], ["memory 2"]]
+    assert persists == [1, 2, 3]
+    writer.close()
+
+
+def test_shutdown_durability_persists_only_on_flush_or_close():
+    writer, batches, persists = recording_queue(DURABILITY_SHUTDOWN, flush_interval_ms=1)
+    writer.enqueue("memory 0")
+    writer.flush(persist=False)
+    assert batches == [["memory 0"]] and persists == []
+    writer.enqueue("memory 1")
+    writer.close()
+    assert persists == [2]
+    with pytest.raises(RuntimeError):
+        writer.enqueue("memory 2")
+
+
+def test_flush_raises_write_errors():
+    def fail(contents, contexts):
+        raise ValueError("disk full")
+
+    writer = WriteBehindQueue(write_fn=fail, persist_fn=lambda: None)
+    writer.enqueue("memory 0")
+    with pytest.raises(RuntimeError, match="disk full"):
+        writer.flush()
+    assert writer.pending == 0
+    writer.close()
+
+
+def test_write_behind_saves_are_visible_to_reads():
+    store = MemoryStore("alice", write_behind=True)
+    store.save_memories([("I live in Lisbon", ""), ("I have a cat named Miso", "pets")])
+    assert store.count_memories() == 2
+    assert store.retrieve_memories("cat", k=1)[0]["content"] == "I have a cat named Miso"
+    store.close()
+
+
+def test_write_behind_with_dedup_does_not_deadlock():
+    store = MemoryStore("bob", write_behind=True, dedup="skip")
+    done = threading.Event()
+
+    def save_and_flush():
+        store.save_memory("My favorite color is blue.")
+        store.flush()
+        store.save_memory("My favorite color is blue.")
+        store.flush()
+        done.set()
+
+    threading.Thread(target=save_and_flush, daemon=True).start()
+    assert done.wait(10), "save_memory/flush hung with write-behind and dedup enabled"
+    assert store.count_memories() == 1
+    store.close()
+
+
+def test_write_behind_dedup_covers_saves_coalesced_into_one_batch():
+    store = MemoryStore("carol", write_behind=True, dedup="skip", flush_interval_ms=200)
+    store.save_memory("My favorite color is blue.")
+    store.save_memory("My favorite color is blue.")
+    store.flush()
+    assert store.count_memories() == 1
+    store.close()